@@ -0,0 +1,307 @@
+"""
+Benchmark de ponta a ponta do pipeline (PDF -> limpeza -> Argos -> LLM -> Markdown/HTML)
+sem modelos reais: gera um PDF sintético com pymupdf e troca o Argos e o llama.cpp por
+stubs determinísticos com latência configurável. Roda em qualquer máquina Linux de CI.
+
+Uso (a partir da raiz do projeto):
+    python -m benchmarks.benchmark_pipeline --paginas 200 --salvar benchmarks/baseline_pipeline.json
+    python -m benchmarks.benchmark_pipeline --paginas 200 --comparar benchmarks/baseline_pipeline.json
+"""
+import os
+import re
+import sys
+import json
+import time
+import random
+import logging
+import argparse
+import platform
+import tempfile
+import pymupdf
+from src.Services.ExtrairDadosPdfService import ExtrairDadosPdfService
+from src.Services.ProcessadorTraducaoService import ProcessadorTraducaoService
+from src.Services.RefinadorService import RefinadorService
+from src.Services.TraducaoArgosPdfService import TraducaoArgosPdfService
+
+try:
+    import resource
+except ImportError: # Windows
+    resource = None
+
+
+# --- PDF sintético ---
+
+PALAVRAS = (
+    "the system data replication partition log consistency leader follower "
+    "database query index transaction latency throughput storage network "
+    "stream batch schema encoding cluster node failure recovery of and to in is that"
+).split()
+
+def gerar_paragrafo(rng, palavras):
+    frases = []
+    while palavras > 0:
+        n = min(palavras, rng.randint(8, 22))
+        frase = " ".join(rng.choice(PALAVRAS) for _ in range(n))
+        frases.append(frase[0].upper() + frase[1:] + ".")
+        palavras -= n
+    return " ".join(frases)
+
+def gerar_pagina_texto(rng, palavras_por_pagina):
+    paragrafos = []
+    restantes = palavras_por_pagina
+    while restantes > 0:
+        n = min(restantes, rng.randint(40, 120))
+        paragrafos.append(gerar_paragrafo(rng, n))
+        restantes -= n
+    return "Chapter header\n" + "\n\n".join(paragrafos)
+
+def gerar_pagina_codigo(rng):
+    linhas = ["Example listing"]
+    for i in range(rng.randint(12, 30)):
+        linhas.append(f"    int valor_{i} = calcular({i}, {{ limite: {rng.randint(1, 99)} }});")
+    return "\n".join(linhas)
+
+def gerar_pagina_sumario(rng, numero):
+    linhas = ["Table of Contents"]
+    for capitulo in range(1, rng.randint(10, 25)):
+        titulo = " ".join(rng.choice(PALAVRAS) for _ in range(rng.randint(2, 5))).title()
+        linhas.append(f"{numero}.{capitulo} {titulo} {'.' * 20} {capitulo * 7}")
+    return "\n".join(linhas)
+
+def gerar_pdf(caminho, paginas, palavras_por_pagina=350, fracao_codigo=0.1, paginas_sumario=2, semente=42, estrutura=True):
+    rng = random.Random(semente)
+    doc = pymupdf.open()
+    entradas = []
+    for i in range(paginas):
+        if i < paginas_sumario:
+            texto, fonte = gerar_pagina_sumario(rng, i + 1), "helv"
+            # A estrutura (outline) do PDF repete as entradas do sumário impresso
+            for linha in texto.split("\n")[1:]:
+                titulo, pagina_alvo = linha.split(" ...")[0], int(linha.rsplit(" ", 1)[1])
+                entradas.append([1, titulo, min(paginas, pagina_alvo)])
+        elif rng.random() < fracao_codigo:
+            texto, fonte = gerar_pagina_codigo(rng), "cour"
+        else:
+            texto, fonte = gerar_pagina_texto(rng, palavras_por_pagina), "helv"
+
+        pagina = doc.new_page()
+        # Cabeçalho corrente e número de página, como num livro real
+        pagina.insert_text((40, 30), f"Designing Systems | Chapter {i // 20 + 1}", fontsize=7)
+        pagina.insert_text((pagina.rect.width / 2, pagina.rect.height - 20), str(i + 1), fontsize=7)
+        area = pagina.rect + (40, 40, -40, -40)
+        # Um bloco por parágrafo, como num livro real
+        for bloco in texto.split("\n\n"):
+            altura = pagina.insert_textbox(area, bloco, fontsize=7, fontname=fonte)
+            if altura < 0: # Página cheia
+                break
+            area.y0 = area.y1 - altura + 8
+    if estrutura and entradas:
+        doc.set_toc(entradas)
+    doc.save(caminho)
+    doc.close()
+
+
+# --- Stubs determinísticos ---
+
+class MotorStub:
+    """Substitui o Argos: 'traduz' trocando palavras funcionais e dorme proporcionalmente ao texto."""
+
+    requer_pacote_argos = False
+    versao = "stub-1"
+    DICIONARIO = {"the": "o", "of": "de", "and": "e", "to": "para", "in": "em", "is": "é", "that": "que"}
+
+    def __init__(self, latencia_por_frase=0.002, latencia_por_caractere=0.000005):
+        self.latencia_por_frase = latencia_por_frase
+        self.latencia_por_caractere = latencia_por_caractere
+
+    def _traduzir(self, texto):
+        return " ".join(self.DICIONARIO.get(p, p) for p in texto.split(" "))
+
+    def traduzir_lote(self, textos):
+        time.sleep(sum(len(t) for t in textos) * self.latencia_por_caractere)
+        return [self._traduzir(t) for t in textos]
+
+    def traduzir_frases(self, frases):
+        # Em lote, o custo fixo por frase é amortizado
+        time.sleep(self.latencia_por_frase + sum(len(f) for f in frases) * self.latencia_por_caractere)
+        return [self._traduzir(f) for f in frases]
+
+    def fechar(self):
+        pass
+
+
+class LlamaStub:
+    """
+    Substitui o llama_cpp.Llama com a mesma interface usada pelo RefinadorService.
+    Devolve a tradução recebida, token a token (~4 caracteres), com custo de prefill e de decodificação.
+    """
+
+    RE_TRADUCAO = re.compile(r'TRADUÇÃO ATUAL: (.*)<\|eot_id\|>', re.S)
+    RE_SUMARIO = re.compile(r'TEXTO DO SUMÁRIO:\s*(.*)<\|eot_id\|>', re.S)
+
+    def __init__(self, latencia_prefill=0.00005, latencia_token=0.0005, contexto=4096):
+        self.latencia_prefill = latencia_prefill
+        self.latencia_token = latencia_token
+        self.contexto = contexto
+        self._estado = 0
+
+    def tokenize(self, texto, add_bos=True, special=False):
+        return list(range(len(texto) // 4 + (1 if add_bos else 0)))
+
+    def reset(self):
+        self._estado = 0
+
+    def eval(self, tokens):
+        time.sleep(len(tokens) * self.latencia_prefill)
+        self._estado += len(tokens)
+
+    def save_state(self):
+        return self._estado
+
+    def load_state(self, estado):
+        self._estado = estado
+
+    def n_ctx(self):
+        return self.contexto
+
+    def __call__(self, prompt, stream=False, max_tokens=256, **parametros):
+        m = self.RE_TRADUCAO.search(prompt) or self.RE_SUMARIO.search(prompt)
+        resposta = m.group(1).strip() if m else ""
+        tokens = [resposta[i:i + 4] for i in range(0, len(resposta), 4)][:max_tokens]
+        # Prefill do trecho do usuário (o prefixo de sistema vem do estado salvo)
+        time.sleep(len(prompt.split(RefinadorService.MARCADOR_USUARIO)[-1]) // 4 * self.latencia_prefill)
+
+        def gerar():
+            for token in tokens:
+                time.sleep(self.latencia_token)
+                yield {"choices": [{"text": token}]}
+
+        if stream:
+            return gerar()
+        return {"choices": [{"text": "".join(item["choices"][0]["text"] for item in gerar())}]}
+
+
+# --- Execução e relatório ---
+
+def pico_rss_mb():
+    if resource is None:
+        return None
+    proprio = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    filhos = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    # ru_maxrss vem em KB no Linux e em bytes no macOS
+    divisor = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return max(proprio, filhos) / divisor
+
+def executar(args, pasta):
+    caminho_pdf = os.path.join(pasta, "livro_sintetico.pdf")
+    inicio = time.perf_counter()
+    gerar_pdf(caminho_pdf, args.paginas, args.palavras, args.fracao_codigo, args.paginas_sumario, estrutura=not args.sem_estrutura)
+    print(f"PDF sintético: {args.paginas} páginas em {time.perf_counter() - inicio:.1f}s")
+
+    argos = TraducaoArgosPdfService(
+        motor=MotorStub(args.latencia_frase, args.latencia_caractere),
+        caminho_cache=None,
+        modo_segmentacao=args.modo
+    )
+    refinador = RefinadorService(
+        None, caminho_cache=None,
+        llm=LlamaStub(args.latencia_prefill, args.latencia_token)
+    )
+    processador = ProcessadorTraducaoService(
+        argos, refinador, os.path.join(pasta, "traducao.md"),
+        politica_fsync="nunca",
+        concorrencia={"argos": args.threads_argos}
+    )
+
+    inicio = time.perf_counter()
+    paginas = ExtrairDadosPdfService(
+        num_processos=args.processos_extracao, modo_extracao=args.extracao
+    ).extract_text_from_pdf(caminho_pdf)
+    relatorio = processador.processar_livro_incremental(
+        paginas, total_paginas=args.paginas, retomar=False, sumario=ExtrairDadosPdfService.ler_sumario(caminho_pdf)
+    )
+    duracao = time.perf_counter() - inicio
+    argos.fechar()
+
+    return {
+        "parametros": {k: v for k, v in vars(args).items() if k not in ("salvar", "comparar", "tolerancia", "verbose")},
+        "ambiente": {"python": platform.python_version(), "plataforma": platform.platform(), "cpus": os.cpu_count()},
+        "duracao_s": duracao,
+        "paginas_por_segundo": args.paginas / duracao,
+        "pico_rss_mb": pico_rss_mb(),
+        "primeira_pagina_s": processador.tempo_primeira_pagina,
+        "estagios": {
+            nome: {
+                "itens": dados["itens"],
+                "utilizacao": dados["utilizacao"],
+                "latencia_s": dados.get("latencia")
+            }
+            for nome, dados in relatorio.items()
+        }
+    }
+
+def imprimir(resultado):
+    print(f"Throughput: {resultado['paginas_por_segundo']:.2f} páginas/s ({resultado['duracao_s']:.1f}s)")
+    if resultado.get("primeira_pagina_s") is not None:
+        print(f"Primeira página gravada em {resultado['primeira_pagina_s']:.2f}s")
+    if resultado["pico_rss_mb"] is not None:
+        print(f"Pico de RSS: {resultado['pico_rss_mb']:.0f} MB")
+    for nome, dados in resultado["estagios"].items():
+        latencia = dados["latencia_s"]
+        percentis = (
+            " | ".join(f"{p} {v * 1000:7.1f} ms" for p, v in latencia.items()) if latencia else "-"
+        )
+        print(f"   • {nome:<9} {dados['itens']:5d} itens | utilização {dados['utilizacao']:4.0%} | {percentis}")
+
+def comparar(resultado, caminho_baseline, tolerancia):
+    with open(caminho_baseline, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    antes, depois = baseline["paginas_por_segundo"], resultado["paginas_por_segundo"]
+    variacao = depois / antes - 1
+    print(f"Baseline: {antes:.2f} páginas/s -> atual: {depois:.2f} páginas/s ({variacao:+.1%})")
+    if baseline["parametros"] != resultado["parametros"]:
+        print("⚠️ Parâmetros diferentes dos da baseline: a comparação é apenas indicativa.")
+    for nome, dados in resultado["estagios"].items():
+        anterior = baseline["estagios"].get(nome, {}).get("latencia_s")
+        if anterior and dados["latencia_s"]:
+            print(f"   • {nome:<9} p95 {anterior['p95'] * 1000:7.1f} -> {dados['latencia_s']['p95'] * 1000:7.1f} ms")
+    if variacao < -tolerancia:
+        raise SystemExit(f"Regressão de throughput acima da tolerância de {tolerancia:.0%}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de ponta a ponta do pipeline com stubs")
+    parser.add_argument("--paginas", type=int, default=100)
+    parser.add_argument("--palavras", type=int, default=350, help="Palavras por página de texto")
+    parser.add_argument("--fracao-codigo", type=float, default=0.1)
+    parser.add_argument("--paginas-sumario", type=int, default=2)
+    parser.add_argument("--sem-estrutura", action="store_true", help="PDF sem outline: o sumário volta a passar pelo LLM")
+    parser.add_argument("--modo", choices=("chunks", "frases"), default="frases")
+    parser.add_argument("--processos-extracao", type=int, default=1)
+    parser.add_argument("--extracao", choices=("blocos", "layout"), default="blocos")
+    parser.add_argument("--threads-argos", type=int, default=2)
+    parser.add_argument("--latencia-frase", type=float, default=0.002, help="Segundos por lote de frases no stub do Argos")
+    parser.add_argument("--latencia-caractere", type=float, default=0.000005, help="Segundos por caractere no stub do Argos")
+    parser.add_argument("--latencia-prefill", type=float, default=0.00005, help="Segundos por token de prompt no stub do LLM")
+    parser.add_argument("--latencia-token", type=float, default=0.0005, help="Segundos por token gerado no stub do LLM")
+    parser.add_argument("--salvar", help="Grava o resultado como baseline JSON")
+    parser.add_argument("--comparar", help="Compara com uma baseline JSON gravada antes")
+    parser.add_argument("--tolerancia", type=float, default=0.10, help="Queda de throughput aceita na comparação")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING)
+
+    with tempfile.TemporaryDirectory(prefix="bench_pipeline_") as pasta:
+        resultado = executar(args, pasta)
+    imprimir(resultado)
+
+    if args.salvar:
+        with open(args.salvar, "w", encoding="utf-8") as f:
+            json.dump(resultado, f, indent=2, ensure_ascii=False)
+        print(f"Baseline gravada em {args.salvar}")
+    if args.comparar:
+        comparar(resultado, args.comparar, args.tolerancia)
+
+
+if __name__ == "__main__":
+    main()
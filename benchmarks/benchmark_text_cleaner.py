@@ -0,0 +1,142 @@
+"""
+Benchmark do TextCleaner: implementação original (regex recompilados a cada chamada,
+uma passada por frase de marketing) contra a versão compilada.
+
+Uso (a partir da raiz do projeto):
+    python -m benchmarks.benchmark_text_cleaner --mb 20
+"""
+import re
+import time
+import random
+import argparse
+from src.Utils.TextCleaner import TextCleaner
+
+
+# --- Implementação original, congelada como referência ---
+
+def limpar_extracao_pdf_original(texto: str) -> str:
+    if not texto: return ""
+
+    linhas = texto.split('\n')
+    if len(linhas) > 1 and len(linhas[0].strip()) < 50:
+        linhas.pop(0)
+        texto = '\n'.join(linhas)
+
+    texto = re.sub(r'\n\s*\d+\s*\n', '\n', texto)
+    texto = re.sub(r'(\w+)-\s*\n\s*(\w+)', r'\1\2', texto)
+    texto = re.sub(r'\n\s*\n', '[[PARAGRAPH]]', texto)
+    texto = re.sub(r'(?<!\n)\n(?!\n)', ' ', texto)
+    texto = texto.replace('[[PARAGRAPH]]', '\n\n')
+    texto = re.sub(r'[ \t]+', ' ', texto)
+    texto = re.sub(r'[\x00-\x08\x0b\x0c\x0e-\x1f\x7f]', '', texto)
+
+    return texto.strip()
+
+def limpar_sujeira_digital_original(texto: str) -> str:
+    if not texto:
+        return ""
+
+    padrao_url = r'(https?://\S+|www\.\S+|\b\S+\.(?:com|net|org|edu|gov|io|me)\b(/\S*)?)'
+    texto = re.sub(padrao_url, '', texto, flags=re.IGNORECASE)
+
+    padroes_sujeira = [
+        r'click here', r'buy now', r'visit our website',
+        r'available at', r'downloaded from', r'all rights reserved',
+        r'copyright ©', r'free ebook', r'subscribe to',
+        r'scan this qr', r'get more books'
+    ]
+    for padrao in padroes_sujeira:
+        texto = re.sub(rf'\b{padrao}\b', '', texto, flags=re.IGNORECASE)
+
+    texto = re.sub(r' +', ' ', texto)
+    texto = re.sub(r'\n\s*\n', '\n\n', texto)
+
+    return texto.strip()
+
+
+# --- Corpus sintético ---
+
+PALAVRAS = (
+    "the system data replication partition log consistency leader follower "
+    "database query index transaction latency throughput storage network "
+    "stream batch schema encoding cluster node failure recovery"
+).split()
+
+RUIDOS = [
+    "Click Here", "buy now", "VISIT OUR WEBSITE", "available at", "Downloaded from",
+    "All rights reserved", "Copyright © 2017", "free ebook", "subscribe to",
+    "scan this QR", "get more books", "https://example.com/book", "www.oreilly.com",
+    "see foo.io/page", "soft-\n ware", "\n 42 \n", "\x0c", "\t\t", "[[PARAGRAPH]]",
+    "click copyright ©here", "copyright click here©x"
+]
+
+def gerar_pagina(rng):
+    linhas = [" ".join(rng.choice(PALAVRAS) for _ in range(rng.randint(1, 6)))] # cabeçalho curto
+    for _ in range(rng.randint(20, 45)):
+        linha = " ".join(rng.choice(PALAVRAS) for _ in range(rng.randint(6, 14)))
+        if rng.random() < 0.15:
+            linha += " " + rng.choice(RUIDOS)
+        linhas.append(linha)
+        if rng.random() < 0.12:
+            linhas.append(rng.choice(["", "  ", " \t "]))
+    return "\n".join(linhas)
+
+def gerar_corpus(megabytes, semente=42):
+    rng = random.Random(semente)
+    paginas, total = [], 0
+    while total < megabytes * 1024 * 1024:
+        pagina = gerar_pagina(rng)
+        paginas.append(pagina)
+        total += len(pagina.encode("utf-8"))
+    return paginas, total
+
+
+def medir(funcao, paginas, repeticoes):
+    melhor = float("inf")
+    saida = None
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        saida = [funcao(p) for p in paginas]
+        melhor = min(melhor, time.perf_counter() - inicio)
+    return melhor, saida
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de throughput do TextCleaner")
+    parser.add_argument("--mb", type=float, default=10, help="Tamanho do corpus sintético em MB")
+    parser.add_argument("--repeticoes", type=int, default=3)
+    args = parser.parse_args()
+
+    paginas, total_bytes = gerar_corpus(args.mb)
+    mb = total_bytes / (1024 * 1024)
+    print(f"Corpus: {len(paginas)} páginas, {mb:.1f} MB")
+
+    casos = [
+        ("limpar_sujeira_digital", limpar_sujeira_digital_original, TextCleaner.limpar_sujeira_digital),
+        ("limpar_extração_pdf", limpar_extracao_pdf_original, TextCleaner.limpar_extração_pdf),
+    ]
+    for nome, original, compilada in casos:
+        t_antes, saida_antes = medir(original, paginas, args.repeticoes)
+        t_depois, saida_depois = medir(compilada, paginas, args.repeticoes)
+        identica = saida_antes == saida_depois
+        print(
+            f"{nome:<24} antes: {mb / t_antes:7.2f} MB/s | depois: {mb / t_depois:7.2f} MB/s | "
+            f"ganho: {t_antes / t_depois:4.2f}x | saída idêntica: {'sim' if identica else 'NÃO'}"
+        )
+        if not identica:
+            raise SystemExit(f"Saída divergente em {nome}")
+
+    # Pipeline completo por página: antes a limpeza de extração rodava duas vezes
+    def pipeline_antes(p):
+        return limpar_extracao_pdf_original(limpar_sujeira_digital_original(limpar_extracao_pdf_original(p)))
+
+    t_antes, _ = medir(pipeline_antes, paginas, args.repeticoes)
+    t_depois, _ = medir(TextCleaner.limpar_pagina, paginas, args.repeticoes)
+    print(
+        f"{'pipeline por página':<24} antes: {mb / t_antes:7.2f} MB/s | depois: {mb / t_depois:7.2f} MB/s | "
+        f"ganho: {t_antes / t_depois:4.2f}x"
+    )
+
+
+if __name__ == "__main__":
+    main()
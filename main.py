@@ -1,45 +1,212 @@
+import time
+INICIO = time.perf_counter() # Referência do tempo até a primeira página gravada
+
 import os
+import sys
+import json
+import argparse
+import urllib.request
+import urllib.error
 
-# Força o Python a enxergar as pastas do CUDA e do compilador
-cuda_bin = r"C:\Program Files\NVIDIA GPU Computing Toolkit\CUDA\v13.1\bin"
-# O VS 2026 usa ferramentas da v145 ou v150, vamos garantir o acesso
-vs_bin = r"C:\Program Files\Microsoft Visual Studio\18\Community\VC\Tools\MSVC\14.50.35717\bin\Hostx64\x64"
+SERVIDOR_PADRAO = "http://127.0.0.1:8765"
 
-if os.path.exists(cuda_bin):
-    os.add_dll_directory(cuda_bin)
-if os.path.exists(vs_bin):
-    os.add_dll_directory(vs_bin)
+def requisitar(url, dados=None):
+    corpo = json.dumps(dados).encode("utf-8") if dados is not None else None
+    pedido = urllib.request.Request(url, data=corpo, headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(pedido) as resposta:
+        return json.loads(resposta.read().decode("utf-8"))
 
-# Adiciona ao PATH para compatibilidade com versões antigas do Python
-os.environ["PATH"] = cuda_bin + os.pathsep + vs_bin + os.pathsep + os.environ.get("PATH", "")
+def acompanhar(servidor, id_trabalho, intervalo=2.0):
+    """Mostra o progresso do trabalho até ele terminar. Retorna o estado final."""
+    ultimo = None
+    primeira_pagina = None
+    while True:
+        trabalho = requisitar(f"{servidor}/trabalhos/{id_trabalho}")
+        if primeira_pagina is None and trabalho["paginas_concluidas"]:
+            primeira_pagina = time.perf_counter() - INICIO
+            print(f"⏱️ Primeira página pronta {primeira_pagina:.1f}s após o início.", flush=True)
+        total = trabalho["total_paginas"]
+        progresso = f"{trabalho['paginas_concluidas']}/{total}" if total is not None else "-"
+        linha = f"⏳ [{trabalho['estado']}] {progresso} páginas"
+        if linha != ultimo:
+            print(linha, flush=True)
+            ultimo = linha
+        if trabalho["estado"] in ("concluido", "falhou", "interrompido"):
+            return trabalho
+        time.sleep(intervalo)
 
-import logging
-from src.Services.ProcessadorTraducaoService import ProcessadorTraducaoService
-from src.Services.ExtrairDadosPdfService import ExtrairDadosPdfService
-from src.Services.TraducaoArgosPdfService import TraducaoArgosPdfService
-from src.Services.RefinadorService import RefinadorService
-from src.Config.Logging import LoggingConfig
+def carregar_local(args):
+    """Carrega Argos, LLM e memória de tradução neste processo. Retorna (traducao_base, refinador, memoria, extrator)."""
+    import logging
+    from servidor import criar_servicos
+    from src.Config.Logging import LoggingConfig
+    from src.Services.ExtrairDadosPdfService import ExtrairDadosPdfService
+    from src.Utils.MemoriaTraducao import MemoriaTraducao
 
-def main():
     LoggingConfig.configurar_logging()
     logging.getLogger("argostranslate").setLevel(logging.WARNING)
     logging.getLogger("argostranslate.utils").setLevel(logging.WARNING)
-    logger = logging.getLogger("Main")
-
-    # 1. Setup de Dependências
-    caminho_pdf = "E:\\Books\\Book-2Designing-data-intensive-applications.pdf"
-    caminho_llm = "E:\\Projetos\\Models\\Meta-Llama-3.1-8B-Instruct-Q4_K_L.gguf"
-    traducao_base = TraducaoArgosPdfService(from_code="en", to_code="pt")
-    refinador = RefinadorService(caminho_llm)
-    processador = ProcessadorTraducaoService(traducao_base, refinador, "traducao_final.md")
-    
-    # 2. Execução
-    logger.info("Extraindo PDF...")
-    dados = ExtrairDadosPdfService().extract_text_from_pdf(caminho_pdf)
-    logger.info("Iniciando Pipeline de Processamento...")
-    processador.processar_livro_incremental(dados)
-
-    logger.info("Tudo pronto!")
+
+    if args.modelo is None:
+        from servidor import MODELO_PADRAO
+        args.modelo = MODELO_PADRAO
+    # O GGUF carrega em segundo plano enquanto a extração e o Argos começam
+    traducao_base, refinador = criar_servicos(
+        args.modelo, "offline" if args.offline else "auto", args.pasta_modelos, carregar_em_segundo_plano=True
+    )
+    memoria = None if args.sem_memoria else MemoriaTraducao()
+    extrator = ExtrairDadosPdfService(modo_extracao="layout" if args.layout else "blocos")
+    return traducao_base, refinador, memoria, extrator
+
+def fechar_local(traducao_base, refinador, memoria):
+    """Encerra o pool do Argos e as conexões SQLite (caches e memória de tradução)."""
+    traducao_base.fechar()
+    refinador.fechar()
+    if memoria:
+        memoria.fechar()
+
+def processar_local(args):
+    """Sem serviço: carrega os modelos neste processo (paga o custo de inicialização a cada execução)."""
+    from servidor import opcoes_processador
+    from src.Services.ProcessadorTraducaoService import ProcessadorTraducaoService
+
+    traducao_base, refinador, memoria, extrator = carregar_local(args)
+    try:
+        processador = ProcessadorTraducaoService(traducao_base, refinador, args.saida, **opcoes_processador(memoria_traducao=memoria))
+        # Com o total, o progresso mostra "N/total" e a política de refino distribui o orçamento pelas páginas restantes
+        total_pdf = extrator.contar_paginas(args.pdf)
+        fim = min(args.fim, total_pdf) if args.fim is not None else total_pdf
+        dados = extrator.extract_text_from_pdf(args.pdf, args.inicio, fim)
+        processador.processar_livro_incremental(
+            dados, total_paginas=max(0, fim - args.inicio), marco_inicial=INICIO, sumario=extrator.ler_sumario(args.pdf)
+        )
+    finally:
+        fechar_local(traducao_base, refinador, memoria)
+
+def processar_fatia(args, execucao):
+    """Trabalhador de uma fatia: modelos próprios, saída parcial e diário próprios, sem HTML."""
+    from servidor import opcoes_processador
+    from src.Services.ProcessadorTraducaoService import ProcessadorTraducaoService
+
+    traducao_base, refinador, memoria, extrator = carregar_local(args)
+    # Métricas separadas por fatia: vários trabalhadores podem dividir a mesma pasta
+    caminho_metricas = os.path.join("logs", f"metricas_fatia_{args.fatia:03d}.prom")
+
+    def criar_processador(arquivo_saida):
+        return ProcessadorTraducaoService(
+            traducao_base, refinador, arquivo_saida, gerar_html=False,
+            **opcoes_processador(caminho_metricas, memoria_traducao=memoria)
+        )
+
+    try:
+        execucao.executar_fatia(args.fatia, criar_processador, extrator, retomar=not args.sem_retomar)
+    except RuntimeError as e:
+        # Código de saída diferente de zero: a fatia fica pendente e é refeita na próxima execução
+        sys.exit(f"❌ {e}")
+    finally:
+        fechar_local(traducao_base, refinador, memoria)
+
+def comando_trabalhador(args, indice):
+    """Linha de comando de um trabalhador local da fatia 'indice', com as mesmas opções desta execução."""
+    comando = [sys.executable, os.path.abspath(__file__), "--saida", args.saida, "--fatia", str(indice)]
+    for opcao, valor in (("--modelo", args.modelo), ("--pasta-modelos", args.pasta_modelos)):
+        if valor is not None:
+            comando += [opcao, valor]
+    for opcao, ativa in (("--offline", args.offline), ("--sem-memoria", args.sem_memoria),
+                         ("--layout", args.layout), ("--sem-retomar", args.sem_retomar)):
+        if ativa:
+            comando.append(opcao)
+    return comando
+
+def executar_fatiado(args):
+    """
+    --planejar N: só cria o plano; --fatia I: processa uma fatia (ex.: em outra máquina);
+    --fatias N: planeja, roda N processos locais e junta; --juntar: só a junção.
+    """
+    from src.Services.ExecucaoFatiadaService import ExecucaoFatiadaService
+
+    execucao = ExecucaoFatiadaService(args.saida)
+    num_fatias = args.fatias or args.planejar
+    if num_fatias:
+        if not args.pdf:
+            sys.exit("❌ Informe o PDF para planejar as fatias.")
+        from src.Services.ExtrairDadosPdfService import ExtrairDadosPdfService
+        extrator = ExtrairDadosPdfService(modo_extracao="layout" if args.layout else "blocos")
+        plano = execucao.planejar(args.pdf, num_fatias, args.inicio, args.fim, extrator)
+        print(f"🗂️ Plano com {len(plano['fatias'])} fatias em {execucao.pasta}")
+
+    if args.fatia is not None:
+        processar_fatia(args, execucao)
+        return
+
+    if args.fatias:
+        falhas = execucao.executar_local(lambda indice: comando_trabalhador(args, indice))
+        if falhas:
+            sys.exit(f"❌ Fatias com falha: {falhas}. Veja os logs em {execucao.pasta}; rode de novo para retomar.")
+
+    if args.fatias or args.juntar:
+        try:
+            execucao.juntar()
+        except RuntimeError as e:
+            sys.exit(f"❌ {e}")
+        print(f"✨ Pronto! {args.saida}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Envia um PDF para tradução ao serviço local (servidor.py)")
+    parser.add_argument("pdf", nargs="?", help="Caminho do PDF (dispensável com --fatia e --juntar, que usam o plano)")
+    parser.add_argument("--saida", default="traducao_final.md", help="Markdown de saída (o HTML é gerado ao lado)")
+    parser.add_argument("--inicio", type=int, default=0, help="Primeira página (base 0)")
+    parser.add_argument("--fim", type=int, default=None, help="Página final (exclusiva)")
+    parser.add_argument("--servidor", default=SERVIDOR_PADRAO)
+    parser.add_argument("--sem-retomar", action="store_true", help="Ignora o diário de progresso de execuções anteriores")
+    parser.add_argument("--nao-aguardar", action="store_true", help="Só enfileira o trabalho e sai")
+    parser.add_argument("--local", action="store_true", help="Processa neste processo, sem o serviço")
+    parser.add_argument("--modelo", default=None, help="GGUF do LLM (apenas com --local)")
+    parser.add_argument("--offline", action="store_true", help="Nunca acessa a rede para obter pacotes do Argos (apenas com --local)")
+    parser.add_argument("--pasta-modelos", default=None, help="Pasta com arquivos .argosmodel (apenas com --local)")
+    parser.add_argument("--sem-memoria", action="store_true", help="Desativa a memória de tradução (apenas com --local)")
+    parser.add_argument("--layout", action="store_true", help="Extração por layout pelas fontes do PDF (apenas com --local)")
+    fatiamento = parser.add_argument_group("execução fatiada (cada fatia carrega os próprios modelos)")
+    fatiamento.add_argument("--fatias", type=int, default=None, metavar="N", help="Divide o livro em N fatias, roda N processos locais e junta")
+    fatiamento.add_argument("--planejar", type=int, default=None, metavar="N", help="Só cria o plano de N fatias ao lado da saída")
+    fatiamento.add_argument("--fatia", type=int, default=None, metavar="I", help="Processa só a fatia I do plano (ex.: em outra máquina, pasta compartilhada)")
+    fatiamento.add_argument("--juntar", action="store_true", help="Junta as fatias concluídas no Markdown e HTML finais")
+    args = parser.parse_args()
+
+    if args.fatias or args.planejar or args.fatia is not None or args.juntar:
+        executar_fatiado(args)
+        return
+
+    if not args.pdf:
+        parser.error("informe o caminho do PDF")
+
+    if args.local:
+        processar_local(args)
+        return
+
+    # O serviço roda em outra pasta de trabalho: os caminhos vão absolutos
+    pedido = {
+        "caminho_pdf": os.path.abspath(args.pdf),
+        "arquivo_saida": os.path.abspath(args.saida),
+        "pagina_inicial": args.inicio,
+        "pagina_final": args.fim,
+        "retomar": not args.sem_retomar
+    }
+    try:
+        trabalho = requisitar(f"{args.servidor}/trabalhos", pedido)
+    except urllib.error.URLError as e:
+        sys.exit(f"❌ Serviço indisponível em {args.servidor} ({e.reason}). Inicie com: python servidor.py")
+
+    print(f"📥 Trabalho {trabalho['id']} enfileirado.")
+    if args.nao_aguardar:
+        return
+
+    final = acompanhar(args.servidor, trabalho["id"])
+    if final["estado"] == "falhou":
+        sys.exit(f"❌ Falhou: {final['erro']}")
+    if final["estado"] == "interrompido":
+        sys.exit("⏸️ Serviço encerrado no meio do trabalho. Envie de novo para retomar do diário.")
+    print(f"✨ Pronto! {final['arquivo_saida']}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,68 @@
+import argparse
+import logging
+from src.Config.Ambiente import Ambiente
+from src.Config.Logging import LoggingConfig
+
+MODELO_PADRAO = "E:\\Projetos\\Models\\Meta-Llama-3.1-8B-Instruct-Q4_K_L.gguf"
+
+def criar_servicos(caminho_llm, modo_pacotes="auto", pasta_modelos=None, carregar_em_segundo_plano=False):
+    """Carrega o Argos e o LLM uma única vez, com as mesmas opções do processamento local."""
+    Ambiente.configurar_dlls_cuda()
+    from src.Services.TraducaoArgosPdfService import TraducaoArgosPdfService
+    from src.Services.RefinadorService import RefinadorService
+
+    traducao_base = TraducaoArgosPdfService(from_code="en", to_code="pt", modo_pacotes=modo_pacotes, pasta_modelos=pasta_modelos)
+    refinador = RefinadorService(caminho_llm, carregar_em_segundo_plano=carregar_em_segundo_plano)
+    return traducao_base, refinador
+
+def opcoes_processador(caminho_metricas="logs/metricas.prom", memoria_traducao=None):
+    from src.Utils.PoliticaRefinamento import PoliticaRefinamentoPorSinais
+    from src.Utils.ControleAdmissao import ControleAdmissao
+
+    return {
+        # Só páginas em que o Argos deixou a desejar vão ao LLM (teto de 2h de GPU por livro)
+        "politica_refinamento": PoliticaRefinamentoPorSinais(orcamento_gpu_segundos=2 * 3600),
+        "caminho_metricas": caminho_metricas,
+        # Admissão por folga de texto em voo e de memória (RSS do processo e VRAM da GPU)
+        "controle_admissao": ControleAdmissao(max_rss_bytes=12 * 1024**3, max_vram_bytes=7 * 1024**3),
+        # Compartilhada entre os trabalhos: parágrafos de um livro servem aos seguintes (novas edições, etc.)
+        "memoria_traducao": memoria_traducao
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Serviço local de tradução: carrega os modelos uma vez e atende trabalhos via HTTP")
+    parser.add_argument("--modelo", default=MODELO_PADRAO, help="Caminho do GGUF do LLM de refinamento")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--porta", type=int, default=8765)
+    parser.add_argument("--metricas", default="logs/metricas.prom", help="Arquivo de métricas do Prometheus")
+    parser.add_argument("--offline", action="store_true", help="Nunca acessa a rede para obter pacotes do Argos")
+    parser.add_argument("--pasta-modelos", default=None, help="Pasta com arquivos .argosmodel para instalação local")
+    parser.add_argument("--sem-memoria", action="store_true", help="Desativa a memória de tradução de parágrafos")
+    parser.add_argument("--layout", action="store_true", help="Extração por layout: títulos, listas e código pelas fontes do PDF")
+    args = parser.parse_args()
+
+    LoggingConfig.configurar_logging()
+    logging.getLogger("argostranslate").setLevel(logging.WARNING)
+    logging.getLogger("argostranslate.utils").setLevel(logging.WARNING)
+
+    from src.Services.ServidorTraducaoService import ServidorTraducaoService
+    from src.Services.ExtrairDadosPdfService import ExtrairDadosPdfService
+    from src.Utils.MemoriaTraducao import MemoriaTraducao
+
+    traducao_base, refinador = criar_servicos(args.modelo, "offline" if args.offline else "auto", args.pasta_modelos)
+    memoria = None if args.sem_memoria else MemoriaTraducao()
+    servidor = ServidorTraducaoService(
+        traducao_base, refinador, args.host, args.porta,
+        extrator=ExtrairDadosPdfService(modo_extracao="layout" if args.layout else "blocos"),
+        criar_opcoes_processador=lambda: opcoes_processador(args.metricas, memoria)
+    )
+    try:
+        servidor.servir()
+    finally:
+        traducao_base.fechar()
+        refinador.fechar()
+        if memoria:
+            memoria.fechar()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,18 @@
+import os
+
+class Ambiente:
+
+    # Força o Python a enxergar as pastas do CUDA e do compilador
+    CUDA_BIN = r"C:\Program Files\NVIDIA GPU Computing Toolkit\CUDA\v13.1\bin"
+    # O VS 2026 usa ferramentas da v145 ou v150, vamos garantir o acesso
+    VS_BIN = r"C:\Program Files\Microsoft Visual Studio\18\Community\VC\Tools\MSVC\14.50.35717\bin\Hostx64\x64"
+
+    @staticmethod
+    def configurar_dlls_cuda():
+        """Deve rodar antes de importar o llama_cpp (Windows + CUDA)."""
+        for pasta in (Ambiente.CUDA_BIN, Ambiente.VS_BIN):
+            if os.path.exists(pasta):
+                os.add_dll_directory(pasta)
+
+        # Adiciona ao PATH para compatibilidade com versões antigas do Python
+        os.environ["PATH"] = Ambiente.CUDA_BIN + os.pathsep + Ambiente.VS_BIN + os.pathsep + os.environ.get("PATH", "")
@@ -0,0 +1,219 @@
+import os
+import json
+import time
+import logging
+import subprocess
+from src.Services.ExtrairDadosPdfService import ExtrairDadosPdfService
+from src.Services.MarkdownEnhancer import GenericMarkdownEnhancer
+from src.Utils.DiarioProgresso import DiarioProgresso
+
+class ExecucaoFatiadaService:
+    """
+    Execução fatiada de um livro: o intervalo de páginas é dividido em fatias contíguas,
+    processadas por trabalhadores independentes (processos locais ou máquinas com a pasta
+    de saída compartilhada), cada um com o próprio Argos/LLM, saída parcial e diário.
+    A junção monta o Markdown e o HTML finais na ordem das páginas.
+
+    Tudo fica em '<saida>.fatias/': plano.json, o Markdown (e o diário) de cada fatia,
+    o marcador de conclusão e o log de cada trabalhador. A pré-passada de boilerplate e a
+    calibração do layout são feitas uma vez, no plano, sobre o intervalo inteiro: toda fatia
+    filtra e classifica os blocos como uma execução sem fatias.
+    """
+
+    MARCADOR_PAGINA = "\n## Página "
+
+    def __init__(self, arquivo_saida):
+        self.arquivo_saida = arquivo_saida
+        self.pasta = arquivo_saida + ".fatias"
+        self.caminho_plano = os.path.join(self.pasta, "plano.json")
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+    @staticmethod
+    def dividir(inicio, fim, num_fatias):
+        """Intervalos [inicio, fim) contíguos, de tamanhos que diferem em no máximo uma página."""
+        total = max(0, fim - inicio)
+        num_fatias = max(1, min(num_fatias, total))
+        base, sobra = divmod(total, num_fatias)
+        intervalos = []
+        for i in range(num_fatias):
+            tamanho = base + (1 if i < sobra else 0)
+            intervalos.append((inicio, inicio + tamanho))
+            inicio += tamanho
+        return intervalos
+
+    def planejar(self, caminho_pdf, num_fatias, pagina_inicial=0, pagina_final=None, extrator=None):
+        """
+        Cria (ou reaproveita, se idêntico) o plano de fatias. Com um plano igual, fatias já
+        concluídas e diários parciais continuam valendo numa nova execução.
+        O extrator define o modo de extração e faz a pré-passada guardada no plano.
+        """
+        extrator = extrator or ExtrairDadosPdfService()
+        caminho_pdf = os.path.abspath(caminho_pdf)
+        total_pdf = ExtrairDadosPdfService.contar_paginas(caminho_pdf)
+        fim = min(pagina_final, total_pdf) if pagina_final is not None else total_pdf
+
+        fatias = [
+            {"indice": i, "inicio": inicio, "fim": fim_fatia, "arquivo": f"fatia_{i:03d}_{inicio + 1}-{fim_fatia}.md"}
+            for i, (inicio, fim_fatia) in enumerate(self.dividir(pagina_inicial, fim, num_fatias))
+        ]
+        plano = {
+            "caminho_pdf": caminho_pdf, "pagina_inicial": pagina_inicial, "pagina_final": fim, "fatias": fatias,
+            "modo_extracao": extrator.modo_extracao, "remover_boilerplate": extrator.remover_boilerplate
+        }
+
+        anterior = self.carregar_plano() if os.path.exists(self.caminho_plano) else None
+        if anterior and {k: anterior.get(k) for k in plano} == plano:
+            self.logger.info(f"🗂️ Plano existente reaproveitado: {len(fatias)} fatias.")
+            return anterior
+
+        os.makedirs(self.pasta, exist_ok=True)
+        if anterior:
+            # Outro plano: os marcadores antigos não valem mais (os arquivos levam o intervalo no nome)
+            for fatia in anterior["fatias"]:
+                marcador = self._caminho_marcador(fatia)
+                if os.path.exists(marcador):
+                    os.remove(marcador)
+            self.logger.warning("⚠️ Plano anterior substituído por um diferente.")
+
+        plano["extracao"] = extrator.preparar(caminho_pdf, pagina_inicial, fim)
+        plano["criado_em"] = time.time()
+        temporario = self.caminho_plano + ".tmp"
+        with open(temporario, "w", encoding="utf-8") as f:
+            json.dump(plano, f, indent=2, ensure_ascii=False)
+        os.replace(temporario, self.caminho_plano)
+        intervalos = ", ".join(f"{f['inicio'] + 1}-{f['fim']}" for f in fatias)
+        self.logger.info(f"🗂️ Plano: páginas {pagina_inicial + 1}-{fim} em {len(fatias)} fatias ({intervalos})")
+        return plano
+
+    def carregar_plano(self):
+        try:
+            with open(self.caminho_plano, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            raise RuntimeError(f"Plano de fatias não encontrado em {self.caminho_plano}: {e}")
+
+    def caminho_fatia(self, fatia):
+        return os.path.join(self.pasta, fatia["arquivo"])
+
+    def _caminho_marcador(self, fatia):
+        return self.caminho_fatia(fatia) + ".concluida.json"
+
+    def concluida(self, fatia):
+        return os.path.exists(self._caminho_marcador(fatia))
+
+    def executar_fatia(self, indice, criar_processador, extrator=None, retomar=True):
+        """
+        Processa uma fatia do plano neste processo. criar_processador(arquivo_saida) devolve o
+        ProcessadorTraducaoService (sem geração de HTML; só a junção gera o HTML final).
+        O marcador de conclusão só é gravado com todas as páginas da fatia no diário, registradas
+        a partir do texto extraído agora (mesmo hash de origem); senão, RuntimeError (o trabalhador
+        sai com erro e a fatia é refeita, retomando do diário).
+        """
+        plano = self.carregar_plano()
+        fatia = plano["fatias"][indice]
+        extrator = extrator or ExtrairDadosPdfService()
+        if "extracao" not in plano:
+            raise RuntimeError(f"Plano sem a pré-passada de extração ({self.caminho_plano}); planeje as fatias de novo.")
+        # Boilerplate e fonte do corpo do livro inteiro, não só do intervalo da fatia
+        extrator.aplicar_preparo(plano["extracao"])
+        caminho_pdf = plano["caminho_pdf"]
+        self.logger.info(f"🧩 Fatia {indice}: páginas {fatia['inicio'] + 1}-{fatia['fim']} -> {fatia['arquivo']}")
+
+        # Uma fatia reprocessada só volta a contar como concluída quando terminar de novo
+        if self.concluida(fatia):
+            os.remove(self._caminho_marcador(fatia))
+
+        inicio = time.perf_counter()
+        processador = criar_processador(self.caminho_fatia(fatia))
+        hashes_origem = {}
+        processador.processar_livro_incremental(
+            self._observar_hashes(extrator.extract_text_from_pdf(caminho_pdf, fatia["inicio"], fatia["fim"]), hashes_origem),
+            total_paginas=fatia["fim"] - fatia["inicio"], retomar=retomar,
+            sumario=extrator.ler_sumario(caminho_pdf)
+        )
+
+        nao_extraidas = [n for n in range(fatia["inicio"] + 1, fatia["fim"] + 1) if n not in hashes_origem]
+        pendentes = sorted(nao_extraidas + processador.diario.pendentes(hashes_origem))
+        if pendentes:
+            raise RuntimeError(
+                f"Fatia {indice} incompleta: {len(pendentes)} páginas sem registro válido no diário "
+                f"({processador.falhas} falhas): {self._resumir_paginas(pendentes)}."
+            )
+
+        marcador = {
+            "indice": indice,
+            "paginas": fatia["fim"] - fatia["inicio"],
+            "concluidas": processador.concluidas,
+            "retomadas": processador.retomadas,
+            "duracao_s": time.perf_counter() - inicio,
+            "concluido_em": time.time()
+        }
+        with open(self._caminho_marcador(fatia), "w", encoding="utf-8") as f:
+            json.dump(marcador, f, indent=2)
+        self.logger.info(f"🏁 Fatia {indice} concluída em {marcador['duracao_s']:.1f}s.")
+        return marcador
+
+    @staticmethod
+    def _observar_hashes(paginas, hashes_origem):
+        """Repassa as páginas extraídas, guardando o hash do texto de origem de cada uma."""
+        for pagina in paginas:
+            hashes_origem[pagina["numero_pagina"]] = DiarioProgresso.calcular_hash(pagina["conteudo"])
+            yield pagina
+
+    @staticmethod
+    def _resumir_paginas(numeros, limite=20):
+        texto = ", ".join(str(n) for n in numeros[:limite])
+        return texto + (f" e mais {len(numeros) - limite}" if len(numeros) > limite else "")
+
+    def executar_local(self, comando_trabalhador):
+        """
+        Um processo por fatia pendente, todos ao mesmo tempo; comando_trabalhador(indice) devolve
+        a linha de comando do trabalhador. Retorna os índices das fatias que falharam.
+        """
+        plano = self.carregar_plano()
+        processos = []
+        for fatia in plano["fatias"]:
+            if self.concluida(fatia):
+                self.logger.info(f"⏭️ Fatia {fatia['indice']} já concluída.")
+                continue
+            log = open(self.caminho_fatia(fatia) + ".log", "a", encoding="utf-8")
+            processos.append((fatia["indice"], subprocess.Popen(comando_trabalhador(fatia["indice"]), stdout=log, stderr=subprocess.STDOUT), log))
+            self.logger.info(f"🚀 Fatia {fatia['indice']} iniciada (log em {log.name}).")
+
+        falhas = []
+        for indice, processo, log in processos:
+            codigo = processo.wait()
+            log.close()
+            if codigo != 0:
+                self.logger.error(f"❌ Fatia {indice} terminou com código {codigo}.")
+                falhas.append(indice)
+        return falhas
+
+    def juntar(self, gerar_html=True):
+        """Monta o Markdown final (e o HTML) concatenando as fatias na ordem do plano."""
+        plano = self.carregar_plano()
+        pendentes = [f["indice"] for f in plano["fatias"] if not self.concluida(f)]
+        if pendentes:
+            raise RuntimeError(f"Fatias ainda não concluídas: {pendentes}")
+
+        cabecalho = None
+        temporario = self.arquivo_saida + ".tmp"
+        with open(temporario, "w", encoding="utf-8") as saida:
+            for fatia in plano["fatias"]:
+                with open(self.caminho_fatia(fatia), "r", encoding="utf-8") as f:
+                    texto = f.read()
+                # Todas as fatias têm o mesmo cabeçalho (estilo e âncora do sumário): entra uma vez
+                corte = texto.find(self.MARCADOR_PAGINA)
+                corte = len(texto) if corte == -1 else corte
+                if cabecalho is None:
+                    cabecalho = texto[:corte]
+                    saida.write(cabecalho)
+                saida.write(texto[corte:])
+        os.replace(temporario, self.arquivo_saida)
+        self.logger.info(f"🧩 {len(plano['fatias'])} fatias juntadas em {self.arquivo_saida}")
+
+        if gerar_html:
+            caminho_html = self.arquivo_saida.replace('.md', '.html')
+            GenericMarkdownEnhancer(self.arquivo_saida).process_and_view(caminho_html)
+            self.logger.info(f"✨ Pronto! Link de leitura: {caminho_html}")
+        return self.arquivo_saida
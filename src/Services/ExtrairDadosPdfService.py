@@ -1,43 +1,273 @@
 import logging
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 import pymupdf
 from src.Utils.TextCleaner import TextCleaner
+from src.Utils.DetectorBoilerplate import DetectorBoilerplate
+from src.Utils.AnalisadorLayout import AnalisadorLayout
+from src.Utils.Metricas import Metricas
+
+
+# Documento aberto por cada processo trabalhador (reaberto só se o arquivo mudar)
+_doc_processo = None
+_caminho_processo = None
+
+def _abrir_documento_processo(file_path):
+    global _doc_processo, _caminho_processo
+    if _caminho_processo != file_path:
+        if _doc_processo is not None:
+            _doc_processo.close()
+        _doc_processo = pymupdf.open(file_path)
+        _caminho_processo = file_path
+    return _doc_processo
+
+def _observar_lote_paginas(file_path, inicio, fim, detector):
+    """Chaves de boilerplate (zona, texto normalizado) de cada página do lote, para a pré-passada."""
+    doc = _abrir_documento_processo(file_path)
+    chaves = []
+    for page_num in range(inicio, fim):
+        page = doc.load_page(page_num)
+        chaves.append(detector.chaves_pagina(page.get_text("blocks"), page.rect.height))
+    return chaves
+
+def _extrair_lote_paginas(file_path, inicio, fim, detector=None, analisador=None):
+    _abrir_documento_processo(file_path)
+
+    if analisador is not None:
+        return [
+            (page_num + 1,) + ExtrairDadosPdfService.extrair_blocos_pagina(_doc_processo.load_page(page_num), analisador, detector)
+            for page_num in range(inicio, fim)
+        ]
+    return [
+        (page_num + 1,) + ExtrairDadosPdfService.extrair_texto_pagina_filtrada(_doc_processo.load_page(page_num), detector) + (None,)
+        for page_num in range(inicio, fim)
+    ]
+
 
 class ExtrairDadosPdfService:
 
-    def __init__(self):
+    MODOS_EXTRACAO = ("blocos", "layout")
+
+    def __init__(self, num_processos=1, paginas_por_lote=8, janela_prefetch=None, remover_boilerplate=True, detector=None,
+                 modo_extracao="blocos", analisador=None, amostra_boilerplate=160, janela_amostra_boilerplate=8):
+        if modo_extracao not in self.MODOS_EXTRACAO:
+            raise ValueError(f"Modo de extração inválido: {modo_extracao}")
         self.logger = logging.getLogger(self.__class__.__name__)
+        self.metricas = Metricas.padrao()
+        # Cabeçalhos/rodapés recorrentes detectados numa pré-passada pelo documento inteiro
+        self.remover_boilerplate = remover_boilerplate
+        self.detector = detector
+        # A pré-passada lê no máximo 'amostra_boilerplate' páginas, em janelas de páginas seguidas
+        # espalhadas pelo livro (um cabeçalho de capítulo se repete dentro da janela)
+        self.amostra_boilerplate = amostra_boilerplate
+        self.janela_amostra_boilerplate = janela_amostra_boilerplate
+        # "layout": blocos tipados (título, parágrafo, lista, código) pelas fontes de get_text("dict")
+        self.modo_extracao = modo_extracao
+        self.analisador = analisador
+        # Pré-passada e calibração já feitas sobre o documento inteiro (ver preparar/aplicar_preparo)
+        self.preparo = None
+        self._caracteres_removidos = 0
+        self.num_processos = max(1, num_processos)
+        self.paginas_por_lote = paginas_por_lote
+        # Lotes em voo no modo paralelo: limita a memória independentemente do tamanho do livro
+        self.janela_prefetch = janela_prefetch or 2 * self.num_processos
+
+    @staticmethod
+    def extrair_texto_pagina(page):
+        # "blocks" preserva melhor a estrutura de parágrafos do livro
+        blocos = page.get_text("blocks")
+
+        # Pegamos o texto bruto de todos os blocos sem filtros agressivos aqui
+        # b[4] é o conteúdo de texto do bloco no PyMuPDF
+        return "\n".join([b[4] for b in blocos]).strip()
+
+    @staticmethod
+    def extrair_texto_pagina_filtrada(page, detector=None):
+        """Como extrair_texto_pagina, sem os blocos recorrentes. Retorna (texto, caracteres removidos)."""
+        if detector is None or not detector.ativo:
+            return ExtrairDadosPdfService.extrair_texto_pagina(page), None
+        blocos, removidos = detector.filtrar(page.get_text("blocks"), page.rect.height)
+        return "\n".join([b[4] for b in blocos]).strip(), removidos
+
+    @staticmethod
+    def extrair_blocos_pagina(page, analisador, detector=None):
+        """
+        Extração por layout. Retorna (texto, caracteres removidos, blocos), com os blocos
+        como tuplas (tipo, texto, nivel) na ordem da página.
+        """
+        blocos = analisador.blocos_pagina(page)
+        removidos = None
+        if detector is not None and detector.ativo:
+            blocos, removidos = detector.filtrar(blocos, page.rect.height)
+        texto = "\n".join(b[4] for b in blocos).strip()
+        return texto, removidos, [(b[5], b[4], b[6]) for b in blocos]
+
+    def janelas_amostra_boilerplate(self, start_page, end_page):
+        """Intervalos [inicio, fim) lidos pela pré-passada: o livro todo, se couber na amostra."""
+        total = end_page - start_page
+        janela = self.janela_amostra_boilerplate
+        if total <= self.amostra_boilerplate or self.amostra_boilerplate < 2 * janela:
+            return [(inicio, min(inicio + janela, end_page)) for inicio in range(start_page, end_page, janela)]
+        num_janelas = self.amostra_boilerplate // janela
+        passo = (total - janela) / (num_janelas - 1)
+        return [(start_page + round(i * passo), start_page + round(i * passo) + janela) for i in range(num_janelas)]
+
+    def analisar_boilerplate(self, doc, start_page, end_page, file_path=None, executor=None):
+        """
+        Pré-passada: índice de frequência dos blocos normalizados por zona da página, numa amostra
+        de janelas de páginas. Com um executor, as janelas são lidas pelos processos de extração.
+        """
+        detector = self.detector or DetectorBoilerplate()
+        janelas = self.janelas_amostra_boilerplate(start_page, end_page)
+        if executor is not None:
+            futuros = [executor.submit(_observar_lote_paginas, file_path, inicio, fim, detector) for inicio, fim in janelas]
+            for futuro in futuros:
+                for chaves_pagina in futuro.result():
+                    detector.registrar(chaves_pagina)
+        else:
+            for inicio, fim in janelas:
+                for page_num in range(inicio, fim):
+                    page = doc.load_page(page_num)
+                    detector.observar(page.get_text("blocks"), page.rect.height)
+        encontrados = detector.consolidar()
+        self.logger.info(
+            f"🧽 Pré-passada de boilerplate: {encontrados} blocos recorrentes "
+            f"({detector.paginas_analisadas} de {end_page - start_page} pgs amostradas)"
+        )
+        return detector
+
+    def _montar_pagina(self, p_num_display, texto_bruto, removidos=None, blocos=None):
+        if not texto_bruto:
+            self.logger.warning(f"⚠️ [Pág {p_num_display}] Nenhum texto encontrado (página pode ser uma imagem/diagrama).")
+        else:
+            self.logger.debug(f"✅ [Pág {p_num_display}] Extração concluída ({len(texto_bruto)} caracteres).")
+
+        pagina = {
+            "numero_pagina": p_num_display,
+            "conteudo": texto_bruto
+        }
+        if removidos is not None:
+            # Cabeçalhos já removidos pelo detector: a heurística da primeira linha não se aplica
+            pagina["sem_cabecalho"] = True
+            self._caracteres_removidos += removidos
+        if blocos is not None:
+            # Com os blocos tipados, títulos e cabeçalhos já estão identificados pela fonte
+            pagina["blocos"] = blocos
+            pagina["sem_cabecalho"] = True
+
+        # Entrega o conteúdo bruto para que os serviços seguintes decidam o que fazer
+        return pagina
+
+    @staticmethod
+    def ler_sumario(file_path):
+        """Estrutura (outline) do PDF como [(nivel, titulo, pagina)]; vazia se o PDF não tiver uma."""
+        with pymupdf.open(file_path) as doc:
+            return [(nivel, titulo.strip(), pagina) for nivel, titulo, pagina in doc.get_toc(simple=True) if titulo.strip()]
+
+    @staticmethod
+    def contar_paginas(file_path):
+        with pymupdf.open(file_path) as doc:
+            return len(doc)
 
     def extract_text_from_pdf(self, file_path, start_page=0, end_page=None):
         doc = pymupdf.open(file_path)
         total_paginas = len(doc)
         self.logger.info(f"📚 PDF aberto: {file_path} | Total: {total_paginas} pgs")
-        
+
         if end_page is None or end_page > total_paginas:
             end_page = total_paginas
-            
-        for page_num in range(start_page, end_page):
-            p_num_display = page_num + 1
-            self.logger.info(f"📑 [Pág {p_num_display}] Extraindo blocos de texto...")
-
-            page = doc.load_page(page_num)
-            
-            # "blocks" preserva melhor a estrutura de parágrafos do livro
-            blocos = page.get_text("blocks")
-            
-            # Pegamos o texto bruto de todos os blocos sem filtros agressivos aqui
-            # b[4] é o conteúdo de texto do bloco no PyMuPDF
-            texto_bruto = "\n".join([b[4] for b in blocos]).strip()
-
-            if not texto_bruto:
-                self.logger.warning(f"⚠️ [Pág {p_num_display}] Nenhum texto encontrado (página pode ser uma imagem/diagrama).")
-            else:
-                self.logger.info(f"✅ [Pág {p_num_display}] Extração concluída ({len(texto_bruto)} caracteres).")
-
-            # Entrega o conteúdo bruto para que os serviços seguintes decidam o que fazer
-            yield {
-                "numero_pagina": p_num_display,
-                "conteudo": texto_bruto
-            }
-            
-        doc.close()
-        self.logger.info("🏁 Fluxo de extração finalizado.")
\ No newline at end of file
+
+        self._caracteres_removidos = 0
+        if self.num_processos > 1:
+            # Um único pool para a pré-passada e para a extração
+            with ProcessPoolExecutor(max_workers=self.num_processos) as executor:
+                detector, analisador = self._preparar_extracao(doc, start_page, end_page, file_path, executor)
+                doc.close()
+                yield from self._extrair_em_paralelo(executor, file_path, start_page, end_page, detector, analisador)
+        else:
+            detector, analisador = self._preparar_extracao(doc, start_page, end_page)
+            for page_num in range(start_page, end_page):
+                page = doc.load_page(page_num)
+                if analisador is not None:
+                    yield self._montar_pagina(page_num + 1, *self.extrair_blocos_pagina(page, analisador, detector))
+                else:
+                    yield self._montar_pagina(page_num + 1, *self.extrair_texto_pagina_filtrada(page, detector))
+            doc.close()
+
+        if detector is not None and detector.ativo:
+            self._registrar_economia(end_page - start_page)
+        self.logger.info("🏁 Fluxo de extração finalizado.")
+
+    def _preparar_extracao(self, doc, start_page, end_page, file_path=None, executor=None):
+        """(detector, analisador) da extração: os do preparo aplicado ou calculados sobre o intervalo."""
+        if self.preparo is not None:
+            return self.detector if self.remover_boilerplate else None, self.analisador if self.modo_extracao == "layout" else None
+        detector = self.analisar_boilerplate(doc, start_page, end_page, file_path, executor) if self.remover_boilerplate else None
+        analisador = self.calibrar_layout(doc, start_page, end_page) if self.modo_extracao == "layout" else None
+        return detector, analisador
+
+    def preparar(self, file_path, start_page=0, end_page=None):
+        """
+        Pré-passada de boilerplate e calibração do layout sobre o intervalo, sem extrair.
+        O resultado (serializável em JSON) vale para extrações de partes do mesmo intervalo
+        via aplicar_preparo, ex.: as fatias, que assim filtram e classificam como o livro inteiro.
+        """
+        with pymupdf.open(file_path) as doc:
+            if end_page is None or end_page > len(doc):
+                end_page = len(doc)
+            detector, analisador = self._preparar_extracao(doc, start_page, end_page)
+        return {
+            "modo_extracao": self.modo_extracao,
+            "boilerplate": sorted(list(chave) for chave in detector.recorrentes) if detector else None,
+            "tamanho_corpo": analisador.tamanho_corpo if analisador else None
+        }
+
+    def aplicar_preparo(self, preparo):
+        """Usa o resultado de preparar (de outro processo ou máquina) em vez da pré-passada e da calibração próprias."""
+        self.modo_extracao = preparo["modo_extracao"]
+        self.remover_boilerplate = preparo["boilerplate"] is not None
+        if self.remover_boilerplate:
+            self.detector = self.detector or DetectorBoilerplate()
+            self.detector.restaurar(preparo["boilerplate"])
+        if self.modo_extracao == "layout":
+            self.analisador = self.analisador or AnalisadorLayout()
+            self.analisador.tamanho_corpo = preparo["tamanho_corpo"]
+        self.preparo = preparo
+
+    def calibrar_layout(self, doc, start_page, end_page):
+        """Tamanho de fonte do corpo do documento, referência para reconhecer os títulos."""
+        analisador = self.analisador or AnalisadorLayout()
+        tamanho = analisador.calibrar(doc, start_page, end_page)
+        self.logger.info(f"🔠 Extração por layout: fonte do corpo {tamanho}pt")
+        return analisador
+
+    def _registrar_economia(self, paginas):
+        # Cada caractere removido deixa de passar pelo Argos e pelo LLM (~4 caracteres por token)
+        tokens = self._caracteres_removidos // 4
+        self.metricas.incrementar("boilerplate_caracteres_removidos_total", self._caracteres_removidos)
+        self.metricas.incrementar("boilerplate_tokens_economizados_total", tokens)
+        self.logger.info(
+            f"🧽 Boilerplate removido: {self._caracteres_removidos} caracteres (~{tokens} tokens) em {paginas} pgs"
+        )
+
+    def _extrair_em_paralelo(self, executor, file_path, start_page, end_page, detector=None, analisador=None):
+        """
+        Divide o intervalo em lotes de páginas distribuídos entre processos (cada um abre
+        o PDF por conta própria) e entrega as páginas em ordem, com uma janela limitada de lotes adiantados.
+        """
+        self.logger.info(f"🧵 Extração paralela: {self.num_processos} processos, lotes de {self.paginas_por_lote} pgs")
+        lotes = (
+            (inicio, min(inicio + self.paginas_por_lote, end_page))
+            for inicio in range(start_page, end_page, self.paginas_por_lote)
+        )
+
+        em_voo = deque()
+        for inicio, fim in lotes:
+            em_voo.append(executor.submit(_extrair_lote_paginas, file_path, inicio, fim, detector, analisador))
+            if len(em_voo) >= self.janela_prefetch:
+                for extraida in em_voo.popleft().result():
+                    yield self._montar_pagina(*extraida)
+
+        while em_voo:
+            for extraida in em_voo.popleft().result():
+                yield self._montar_pagina(*extraida)
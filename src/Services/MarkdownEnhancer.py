@@ -1,9 +1,19 @@
+import os
 import re
-import markdown
+import json
+import shutil
+from src.Utils.CachePersistente import CachePersistente
 
 class GenericMarkdownEnhancer:
-    def __init__(self, file_path):
+    RE_PAGINA = re.compile(r'^## Página (\d+)')
+    RE_TOPICO = re.compile(r'^### (.*)')
+    EXTENSOES = ['extra', 'codehilite']
+    # Incremente ao mudar a forma de renderizar para invalidar o manifesto
+    VERSAO_RENDERIZACAO = "1"
+
+    def __init__(self, file_path, usar_manifesto=True):
         self.file_path = file_path
+        self.usar_manifesto = usar_manifesto
         self.STYLE = """
             <style>
                 :root { 
@@ -64,67 +74,128 @@ class GenericMarkdownEnhancer:
         """
 
     def process_and_view(self, html_output_path):
+        """
+        Renderização em streaming: o Markdown é lido linha a linha e cada página
+        (delimitada por '## Página N') é convertida isoladamente. O corpo HTML vai
+        para um arquivo temporário enquanto o índice é coletado, de modo que o pico
+        de memória fica limitado à maior página, e não ao livro inteiro.
+
+        Com o manifesto ativo, cada página renderizada fica guardada junto com o hash
+        do seu Markdown; numa nova execução só as páginas alteradas são reconvertidas.
+        """
+        caminho_corpo = html_output_path + ".corpo.tmp"
+        manifesto = None
         try:
-            with open(self.file_path, 'r', encoding='utf-8') as f:
-                lines = f.readlines()
-
-            processed_md_lines = []
-            toc_items = [] 
-            ultimo_titulo_registrado = "" 
-
-            for i, line in enumerate(lines):
-                # 1. Identifica Páginas
-                match_pg = re.match(r'^## Página (\d+)', line)
-                # 2. Identifica Títulos (H3)
-                match_topico = re.match(r'^### (.*)', line)
-
-                if match_pg:
-                    num = match_pg.group(1)
-                    tid = f"pg{num}"
-                    processed_md_lines.append(f'<div class="page-divider" id="{tid}">Página {num}</div>\n\n')
-                    toc_items.append(f'<li class="toc-page"><a href="#{tid}">Pág. {num}</a></li>')
-
-                elif match_topico:
-                    titulo_bruto = match_topico.group(1).strip()
-                    titulo_lower = titulo_bruto.lower().replace(":", "").strip()
-                    
-                    # Termos que o LLM usa quando está "alucinando" um título
-                    termos_proibidos = ["título do assunto", "assunto", "título", "revisão técnica"]
-                    
-                    # CRITÉRIO DE VALIDAÇÃO
-                    # Se for um título real (não está na lista, não é repetido e tem tamanho bom)
-                    if (titulo_bruto and 
-                        titulo_lower not in termos_proibidos and 
-                        titulo_lower != ultimo_titulo_registrado and 
-                        len(titulo_lower) > 3):
-                        
-                        tid = f"topico-{i}"
-                        processed_md_lines.append(f'### {titulo_bruto} <a id="{tid}"></a>\n\n')
-                        toc_items.append(f'<li class="toc-topic"><a href="#{tid}">{titulo_bruto}</a></li>')
-                        ultimo_titulo_registrado = titulo_lower
-                    else:
-                        # Se falhou na validação, NÃO DELETA. 
-                        # Apenas remove os '###' e escreve como texto normal.
-                        processed_md_lines.append(f"{titulo_bruto}\n\n")
-                
-                else:
-                    # Linha de texto comum: mantém exatamente como está
-                    processed_md_lines.append(line)
+            import markdown # Adiado: só é necessário na geração do HTML
+            conversor = markdown.Markdown(extensions=self.EXTENSOES)
+            if self.usar_manifesto:
+                manifesto = CachePersistente(html_output_path + ".manifesto.sqlite", tabela="paginas_html", max_bytes=1024 * 1024 * 1024)
+            toc_items = []
+            estado = {"ultimo_titulo_registrado": "", "renderizadas": 0, "reaproveitadas": 0}
 
-            # --- GERAÇÃO DO HTML ---
-            full_md = "".join(processed_md_lines)
-            body_content = markdown.markdown(full_md, extensions=['extra', 'codehilite'])
+            with open(self.file_path, 'r', encoding='utf-8') as f, \
+                 open(caminho_corpo, 'w', encoding='utf-8') as corpo:
+                segmento = []
+                for line in f:
+                    # Uma nova página fecha o segmento anterior
+                    if segmento and self.RE_PAGINA.match(line):
+                        self._renderizar_segmento(segmento, conversor, corpo, toc_items, estado, manifesto)
+                        segmento = []
+                    segmento.append(line)
+
+                if segmento:
+                    self._renderizar_segmento(segmento, conversor, corpo, toc_items, estado, manifesto)
 
+            # --- GERAÇÃO DO HTML ---
             with open(html_output_path, 'w', encoding='utf-8') as f:
                 f.write(f"<!DOCTYPE html><html lang='pt-br'><head><meta charset='UTF-8'><meta name='viewport' content='width=device-width, initial-scale=1.0'>{self.STYLE}</head><body>")
                 f.write("<aside class='sidebar'><h2>📚 Índice</h2><ul class='toc-list'>")
                 f.write("\n".join(toc_items))
                 f.write("</ul></aside>")
                 f.write("<main class='main-content'>")
-                f.write(body_content)
+                with open(caminho_corpo, 'r', encoding='utf-8') as corpo:
+                    shutil.copyfileobj(corpo, f)
                 f.write("</main></body></html>")
                 
-            print(f"✅ HTML gerado com sucesso em: {html_output_path}")
+            print(f"✅ HTML gerado com sucesso em: {html_output_path} "
+                  f"({estado['renderizadas']} páginas renderizadas, {estado['reaproveitadas']} reaproveitadas)")
 
         except Exception as e:
-            print(f"❌ Erro crítico no Enhancer: {e}")
\ No newline at end of file
+            print(f"❌ Erro crítico no Enhancer: {e}")
+        finally:
+            if manifesto:
+                manifesto.fechar()
+            if os.path.exists(caminho_corpo):
+                os.remove(caminho_corpo)
+
+    def _renderizar_segmento(self, linhas, conversor, corpo, toc_items, estado, manifesto):
+        texto = "".join(linhas)
+        match_pg = self.RE_PAGINA.match(linhas[0])
+        pagina = match_pg.group(1) if match_pg else "0"
+
+        # O título anterior entra na chave: ele decide se um '###' repetido vira tópico
+        chave = None
+        if manifesto:
+            chave = CachePersistente.gerar_chave(self.VERSAO_RENDERIZACAO, estado["ultimo_titulo_registrado"], texto)
+            salvo = manifesto.obter(chave)
+            if salvo is not None:
+                fragmento = json.loads(salvo)
+                corpo.write(fragmento["html"])
+                toc_items.extend(fragmento["toc"])
+                estado["ultimo_titulo_registrado"] = fragmento["ultimo_titulo"]
+                estado["reaproveitadas"] += 1
+                return
+
+        toc_pagina = []
+        processadas = [self._processar_linha(f"{pagina}-{j}", line, toc_pagina, estado) for j, line in enumerate(linhas)]
+        conversor.reset()
+        html = conversor.convert("".join(processadas)) + "\n"
+
+        corpo.write(html)
+        toc_items.extend(toc_pagina)
+        estado["renderizadas"] += 1
+
+        if manifesto:
+            manifesto.gravar(chave, json.dumps({
+                "html": html,
+                "toc": toc_pagina,
+                "ultimo_titulo": estado["ultimo_titulo_registrado"]
+            }, ensure_ascii=False))
+
+    def _processar_linha(self, i, line, toc_items, estado):
+        # 1. Identifica Páginas
+        match_pg = self.RE_PAGINA.match(line)
+        # 2. Identifica Títulos (H3)
+        match_topico = self.RE_TOPICO.match(line)
+
+        if match_pg:
+            num = match_pg.group(1)
+            tid = f"pg{num}"
+            toc_items.append(f'<li class="toc-page"><a href="#{tid}">Pág. {num}</a></li>')
+            return f'<div class="page-divider" id="{tid}">Página {num}</div>\n\n'
+
+        elif match_topico:
+            titulo_bruto = match_topico.group(1).strip()
+            titulo_lower = titulo_bruto.lower().replace(":", "").strip()
+            
+            # Termos que o LLM usa quando está "alucinando" um título
+            termos_proibidos = ["título do assunto", "assunto", "título", "revisão técnica"]
+            
+            # CRITÉRIO DE VALIDAÇÃO
+            # Se for um título real (não está na lista, não é repetido e tem tamanho bom)
+            if (titulo_bruto and 
+                titulo_lower not in termos_proibidos and 
+                titulo_lower != estado["ultimo_titulo_registrado"] and 
+                len(titulo_lower) > 3):
+                
+                tid = f"topico-{i}"
+                toc_items.append(f'<li class="toc-topic"><a href="#{tid}">{titulo_bruto}</a></li>')
+                estado["ultimo_titulo_registrado"] = titulo_lower
+                return f'### {titulo_bruto} <a id="{tid}"></a>\n\n'
+            else:
+                # Se falhou na validação, NÃO DELETA. 
+                # Apenas remove os '###' e escreve como texto normal.
+                return f"{titulo_bruto}\n\n"
+        
+        # Linha de texto comum: mantém exatamente como está
+        return line
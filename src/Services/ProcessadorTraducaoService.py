@@ -1,131 +1,700 @@
-import gc
+import re
+import time
 import logging
 import threading
-import concurrent.futures
-from concurrent.futures import ThreadPoolExecutor
 from src.Services.MarkdownEnhancer import GenericMarkdownEnhancer
 from src.Utils.TextCleaner import TextCleaner
+from src.Utils.DiarioProgresso import DiarioProgresso
+from src.Utils.EscritorOrdenado import EscritorMarkdownOrdenado
+from src.Utils.PipelineEstagios import Estagio, Pipeline
+from src.Utils.Metricas import Metricas, ExportadorMetricas
+from src.Utils.ControleAdmissao import ControleAdmissao
+from src.Utils.AnalisadorLayout import AnalisadorLayout
 
 class ProcessadorTraducaoService:
 
-    def __init__(self, argo_translate_service, refinador_service, arquivo_saida="traducao_final.md"):
+    # Concorrência padrão por estágio. O refino fica em 1: o llama.cpp não é thread-safe
+    CONCORRENCIA_PADRAO = {"limpeza": 1, "argos": 2, "refino": 1}
+    # Com o log por página em DEBUG, o progresso sai em INFO a cada N páginas
+    INTERVALO_PROGRESSO = 25
+    # Marcadores gráficos de lista viram o marcador do Markdown
+    RE_MARCADOR_LISTA = re.compile(r'^\s*[•◦▪‣∙·●○■□]\s*')
+    RE_NAO_PALAVRA = re.compile(r'[\W_]+')
+    # Títulos da estrutura do PDF que uma página precisa conter para ser um sumário de verdade
+    MIN_ENTRADAS_SUMARIO = 3
+
+    def __init__(self, argo_translate_service, refinador_service, arquivo_saida="traducao_final.md", politica_fsync="final",
+                 concorrencia=None, capacidade_filas=4, lote_argos=4, politica_refinamento=None,
+                 metricas=None, caminho_metricas=None, formato_metricas="prometheus", intervalo_metricas=15,
+                 controle_admissao=None, memoria_traducao=None, gerar_html=True):
         self.argo_translate_service = argo_translate_service
         self.refinador_service = refinador_service
         self.arquivo_saida = arquivo_saida
+        self.politica_fsync = politica_fsync
+        self.concorrencia = dict(self.CONCORRENCIA_PADRAO, **(concorrencia or {}))
+        self.capacidade_filas = capacidade_filas
+        # Páginas já enfileiradas são traduzidas juntas (lotes de frases entre páginas)
+        self.lote_argos = lote_argos
+        # Sem política, toda página de texto passa pelo LLM
+        self.politica_refinamento = politica_refinamento
+        self.metricas = metricas or Metricas.padrao()
+        # Exportação periódica opcional (arquivo .prom para o Prometheus ou .jsonl)
+        self.caminho_metricas = caminho_metricas
+        self.formato_metricas = formato_metricas
+        self.intervalo_metricas = intervalo_metricas
+        # Novas páginas só entram no pipeline com folga de bytes/tokens em voo e de memória
+        self.controle_admissao = controle_admissao or ControleAdmissao(metricas=self.metricas)
+        # Memória de tradução (MemoriaTraducao) opcional: parágrafos já traduzidos não refazem Argos + LLM
+        self.memoria_traducao = memoria_traducao
+        # Fatias de uma execução fatiada não geram HTML: só a junção final
+        self.gerar_html = gerar_html
         self.logger = logging.getLogger(self.__class__.__name__)
-        self.file_lock = threading.Lock()
         self.llm_lock = threading.Lock()
+        self.progresso_lock = threading.Lock()
+        # Parada pedida de fora (ex.: serviço encerrando): páginas em voo saem sem ir ao diário
+        self._parada = threading.Event()
+        self.escritor = None
+        # Progresso da execução atual (consultado pelo modo serviço)
+        self.total_paginas = None
+        self.concluidas = 0
+        self.retomadas = 0
+        self.falhas = 0
+        self.tempo_primeira_pagina = None
+        # Estrutura (outline) do PDF da execução atual e seus títulos traduzidos
+        self.sumario = []
+        self._titulos_sumario = None
+        self.sumario_lock = threading.Lock()
+        # Diário de páginas concluídas ao lado do arquivo de saída (permite retomar após queda)
+        self.diario = DiarioProgresso(arquivo_saida + ".diario.jsonl")
         # Estilo CSS para injetar no início do arquivo
         self.STYLE = """<style>body { max-width: 900px; margin: 0 auto; padding: 2rem; font-family: sans-serif; line-height: 1.6; color: #1f2328; background: #fff; } h2 { border-bottom: 1px solid #d0d7de; padding-bottom: 8px; margin-top: 40px; } @media (prefers-color-scheme: dark) { body { background: #0d1117; color: #e6edf3; } h2 { border-bottom-color: #30363d; } }</style><meta name="viewport" content="width=device-width, initial-scale=1.0">"""
 
-    def processar_livro_incremental(self, gerador_paginas, total_paginas=None):
+    def processar_livro_incremental(self, gerador_paginas, total_paginas=None, retomar=True, marco_inicial=None, sumario=None):
+        """
+        marco_inicial: instante (time.perf_counter) a partir do qual medir o tempo até a primeira
+        página gravada; por padrão, o início desta chamada. O CLI passa o início do processo.
+        sumario: estrutura do PDF (ExtrairDadosPdfService.ler_sumario). Com ela, as páginas de
+        sumário viram a lista traduzida pelo Argos, sem o LLM.
+        """
+        marco_inicial = marco_inicial if marco_inicial is not None else time.perf_counter()
         self.logger.info("🚀 Iniciando Pipeline Otimizada...")
-        
-        # 1. Preparação do Arquivo
-        with open(self.arquivo_saida, "w", encoding="utf-8") as f:
-            f.write(self.STYLE + "\n\n# Tradução Processada\n\n<div id='Sumario'></div>\n\n")
-
-        concluidas = 0
-        
-        with ThreadPoolExecutor(max_workers=4) as executor:
-            futures = []
-            
-            for pagina_original in gerador_paginas:
-                p_num = pagina_original['numero_pagina']
-                
-                conteudo_limpo = TextCleaner.limpar_extração_pdf(pagina_original['conteudo'])
-                pagina_original['conteudo'] = conteudo_limpo
-
-                self.logger.info(f"⏳ [Pág {p_num}] Traduzindo base (Argos)...")
-                
-                pagina_traduzida = self.argo_translate_service.traduzir_pagina(pagina_original)
-                
-                self.logger.info(f"🧠 [Pág {p_num}] Enviando para refinamento LLM (GPU)...")
-                fut = executor.submit(self._refinar_e_gravar, pagina_traduzida, pagina_original['conteudo'])
-                futures.append(fut)
-
-                # Callback para atualizar progresso assim que a página for gravada
-                def callback_concluido(f, num=p_num):
-                    nonlocal concluidas
-                    concluidas += 1
-                    status = "✅" if not f.exception() else "❌"
-                    # Se você souber o total de páginas, pode exibir a %
-                    progresso_str = f"({concluidas}/{total_paginas})" if total_paginas else f"({concluidas} pgs)"
-                    self.logger.info(f"{status} [Pág {num}] Processamento concluído {progresso_str}")
-
-                fut.add_done_callback(callback_concluido)
-
-                # Controle de fluxo para não estourar a VRAM
-                if len(futures) > 10:
-                    concurrent.futures.wait(futures, return_when=concurrent.futures.FIRST_COMPLETED)
-                    # Limpeza de lista de futuros terminados
-                    futures = [f for f in futures if not f.done()]
-                    gc.collect()
-            if futures:
-                self.logger.info("🏁 Aguardando finalização das últimas páginas...")
-                concurrent.futures.wait(futures)
-            
+
+        if not retomar:
+            self.diario.limpar()
+
+        # 1. Preparação do Arquivo: um único escritor grava as páginas na ordem do PDF
+        self.escritor = EscritorMarkdownOrdenado(
+            self.arquivo_saida,
+            cabecalho=self.STYLE + "\n\n# Tradução Processada\n\n<div id='Sumario'></div>\n\n",
+            politica_fsync=self.politica_fsync,
+            metricas=self.metricas
+        )
+        self.total_paginas = total_paginas
+        self.concluidas = 0
+        self.retomadas = 0
+        self.falhas = 0
+        self.sumario = sumario or []
+        self._titulos_sumario = None
+        # A memória é compartilhada entre livros: o relatório mostra só a diferença desta execução
+        self._memoria_inicial = self.memoria_traducao.relatorio() if self.memoria_traducao else None
+
+        # 2. Estágios conectados por filas limitadas:
+        # extração -> limpeza -> Argos (CPU) -> refino LLM (GPU) -> escrita
+        # O Argos da página N+k roda enquanto o LLM refina a página N.
+        estagios = [
+            Estagio("limpeza", self._etapa_limpeza, self.concorrencia["limpeza"], self.capacidade_filas, self._falha_pagina,
+                    metricas=self.metricas),
+            Estagio("argos", self._etapa_argos, self.concorrencia["argos"], self.capacidade_filas, self._falha_pagina, self.lote_argos,
+                    metricas=self.metricas),
+            Estagio("refino", self._etapa_refino, self.concorrencia["refino"], self.capacidade_filas, self._falha_pagina,
+                    metricas=self.metricas),
+        ]
+        pipeline = Pipeline("extracao", self._paginas_pendentes(gerador_paginas), estagios, metricas=self.metricas)
+
+        def coletar(metricas):
+            self._coletar_metricas(metricas, pipeline)
+        self.metricas.registrar_coletor(coletar)
+        exportador = None
+        if self.caminho_metricas:
+            exportador = ExportadorMetricas(self.metricas, self.caminho_metricas, self.formato_metricas, self.intervalo_metricas).iniciar()
+
+        try:
+            relatorio = pipeline.executar()
+        finally:
+            self.escritor.fechar()
+            if exportador:
+                exportador.parar()
+            self.metricas.remover_coletor(coletar)
+
+        relatorio["escrita"] = {
+            "itens": self.escritor.paginas_gravadas,
+            "concorrencia": 1,
+            "tempo_ocupado": self.escritor.tempo_ocupado,
+            "utilizacao": self.escritor.tempo_ocupado / max(pipeline.duracao, 1e-9)
+        }
+        self._registrar_relatorio_estagios(relatorio, pipeline.duracao)
+
+        if self.escritor.primeira_gravacao is not None:
+            self.tempo_primeira_pagina = self.escritor.primeira_gravacao - marco_inicial
+            self.metricas.definir("inicio_ate_primeira_pagina_segundos", self.tempo_primeira_pagina)
+            self.logger.info(f"⏱️ Primeira página gravada {self.tempo_primeira_pagina:.2f}s após o início.")
+
+        if self.controle_admissao.esperas:
+            self.logger.info(
+                f"🚦 Admissão: {self.controle_admissao.esperas} esperas por folga "
+                f"({self.controle_admissao.tempo_espera:.1f}s no total)"
+            )
+        if self.retomadas:
+            self.logger.info(f"📓 {self.retomadas} páginas reaproveitadas do diário de progresso.")
+        if self.falhas:
+            self.logger.error(f"❌ {self.falhas} páginas falharam e ficaram fora do diário; rode de novo (retomando) para refazê-las.")
+
+        self._registrar_estatisticas_cache()
+        self._registrar_desempenho_llm()
+        self._registrar_politica_refinamento()
+        self._registrar_memoria_traducao()
+        if self.interrompido:
+            self.logger.warning("⏸️ Execução interrompida: as páginas restantes serão retomadas pelo diário de progresso.")
+            return relatorio
         self.logger.info("✨ Processamento completo! Arquivo gerado com sucesso.")
         self.finalizar_processamento()
+        return relatorio
+
+    def interromper(self):
+        """
+        Pede a parada da execução atual: nenhuma página nova entra e as que estão em voo
+        são descartadas sem registro no diário (só a que estiver no LLM termina).
+        Uma nova execução com retomar=True continua de onde parou.
+        """
+        self._parada.set()
+
+    @property
+    def interrompido(self):
+        return self._parada.is_set()
+
+    def _paginas_pendentes(self, gerador_paginas):
+        """Fonte do pipeline: reserva a ordem de escrita e pula páginas já concluídas."""
+        for pagina_original in gerador_paginas:
+            if self.interrompido:
+                return
+            p_num = pagina_original['numero_pagina']
+            hash_origem = DiarioProgresso.calcular_hash(pagina_original['conteudo'])
+            self.escritor.reservar(p_num)
+
+            if self.diario.concluida(p_num, hash_origem):
+                # Página já finalizada numa execução anterior: nada de limpeza, Argos ou LLM
+                self.retomadas += 1
+                conteudo_salvo = self.diario.conteudo(p_num)
+                self.escritor.entregar(p_num, self._formatar_pagina(p_num, conteudo_salvo) if conteudo_salvo is not None else None)
+                continue
+
+            pagina_original['hash_origem'] = hash_origem
+            pagina_original['admissao'] = self.controle_admissao.admitir(pagina_original['conteudo'])
+            yield pagina_original
+
+    def _etapa_limpeza(self, pagina):
+        # Única passada de higienização da página (o Argos não limpa de novo)
+        texto_original = pagina['conteudo']
+        if 'blocos' in pagina:
+            pagina['conteudo'] = self._limpar_layout(pagina)
+        else:
+            pagina['conteudo'] = TextCleaner.limpar_pagina(texto_original, remover_cabecalho=not pagina.get('sem_cabecalho'))
+        pagina['higienizado'] = True
+        self.metricas.incrementar("caracteres_total", len(texto_original), estagio="extracao")
+        self.metricas.incrementar("caracteres_total", len(pagina['conteudo']), estagio="limpeza")
+
+        if len(texto_original) > 10 and len(pagina['conteudo']) < 5 and not pagina.get('layout'):
+            self.logger.warning(f"⚠️ [Pág {pagina['numero_pagina']}] Alerta: A limpeza removeu quase todo o conteúdo!")
+
+        if self.memoria_traducao and pagina['conteudo'].strip():
+            try:
+                consultas = [self.memoria_traducao.buscar(paragrafo) for paragrafo in pagina['conteudo'].split("\n\n")]
+            except Exception as e:
+                # Sem a memória, a página segue o caminho completo
+                self.logger.warning(f"⚠️ [Pág {pagina['numero_pagina']}] Memória de tradução indisponível: {e}")
+                self.metricas.incrementar("memoria_traducao_falhas_total", operacao="buscar")
+                consultas = []
+            if any(consultas):
+                # O Argos pula os parágrafos encontrados; o refino monta a página a partir das consultas
+                pagina['memoria'] = consultas
+                pagina['paragrafos_dispensados'] = {i for i, consulta in enumerate(consultas) if consulta}
+        return pagina
 
-    def _refinar_e_gravar(self, pagina_traduzida, original):
+    def _limpar_layout(self, pagina):
+        """
+        Extração por layout: limpa bloco a bloco e separa a prosa (parágrafos e itens de lista,
+        o que vai ao Argos e ao LLM) dos títulos e do código. Em 'layout' fica a ordem dos
+        segmentos para remontar a página; cada parágrafo da prosa é um bloco.
+        """
+        layout = []
+        prosa = []
+        for tipo, texto, nivel in pagina.pop('blocos'):
+            if tipo == "codigo":
+                # Listagens longas costumam vir em vários blocos seguidos
+                if layout and layout[-1]["tipo"] == "codigo":
+                    layout[-1]["texto"] += "\n" + texto
+                else:
+                    layout.append({"tipo": "codigo", "texto": texto})
+                continue
+            if tipo == "titulo":
+                layout.append({"tipo": "titulo", "nivel": nivel, "texto": " ".join(texto.split())})
+                continue
+
+            if tipo == "lista":
+                # Um item por linha iniciada por marcador; as demais continuam o item anterior
+                itens = []
+                for linha in texto.split("\n"):
+                    if itens and not AnalisadorLayout.RE_ITEM_LISTA.match(linha):
+                        itens[-1] += "\n" + linha
+                    else:
+                        itens.append(linha)
+                paragrafos = [self.RE_MARCADOR_LISTA.sub("- ", TextCleaner.limpar_pagina(item, remover_cabecalho=False)) for item in itens]
+            else:
+                paragrafos = [TextCleaner.limpar_pagina(texto, remover_cabecalho=False)]
+
+            for paragrafo in paragrafos:
+                # Um bloco (ou item) é um parágrafo só: a contagem em 'layout' precisa bater com a prosa
+                paragrafo = paragrafo.replace("\n\n", " ").strip()
+                if not paragrafo or paragrafo.isdigit():
+                    continue
+                if layout and layout[-1]["tipo"] == "prosa":
+                    layout[-1]["paragrafos"] += 1
+                else:
+                    layout.append({"tipo": "prosa", "paragrafos": 1})
+                prosa.append(paragrafo)
+
+        pagina['layout'] = layout
+        pagina['alinhar_paragrafos'] = True
+        return "\n\n".join(prosa)
+
+    def _etapa_argos(self, paginas):
+        if self.interrompido:
+            for pagina in paginas:
+                self._liberar_pagina(pagina)
+            return []
+        self.logger.debug(f"⏳ [Pág {', '.join(str(p['numero_pagina']) for p in paginas)}] Traduzindo base (Argos)...")
+        traducoes = self.argo_translate_service.traduzir_paginas(paginas)
+        for pagina, traducao in zip(paginas, traducoes):
+            pagina['traducao'] = traducao
+            self.metricas.incrementar("caracteres_total", len(traducao['traduzido']), estagio="argos")
+
+        # Títulos da extração por layout: só Argos, num lote com os das outras páginas
+        titulos = [segmento for pagina in paginas for segmento in pagina.get('layout', ()) if segmento["tipo"] == "titulo"]
+        if titulos:
+            for segmento, traducao in zip(titulos, self.argo_translate_service.traduzir_titulos([s["texto"] for s in titulos])):
+                segmento["traducao"] = traducao
+        return paginas
+
+    def _etapa_refino(self, pagina):
+        if self.interrompido:
+            self._liberar_pagina(pagina)
+            return None
+        try:
+            gravada = self._refinar_e_gravar(pagina['traducao'], pagina['conteudo'], pagina['hash_origem'], pagina.get('memoria'), pagina.get('layout'))
+        finally:
+            self._liberar_admissao(pagina)
+        if not gravada:
+            # Só conta como concluída a página registrada no diário
+            return None
+
+        with self.progresso_lock:
+            self.concluidas += 1
+            concluidas = self.concluidas
+            progresso_str = f"({concluidas}/{self.total_paginas})" if self.total_paginas else f"({concluidas} pgs)"
+        self.metricas.definir("paginas_concluidas", concluidas)
+        if concluidas % self.INTERVALO_PROGRESSO == 0:
+            self.logger.info(f"✅ Progresso: {progresso_str}")
+        self.logger.debug(f"✅ [Pág {pagina['numero_pagina']}] Processamento concluído {progresso_str}")
+        return None
+
+    def _falha_pagina(self, pagina, erro):
+        self._registrar_falha()
+        self._liberar_pagina(pagina)
+
+    def _registrar_falha(self):
+        with self.progresso_lock:
+            self.falhas += 1
+        self.metricas.incrementar("paginas_falhas_total")
+
+    def _liberar_pagina(self, pagina):
+        # Página perdida (ou descartada numa parada): libera a posição dela no escritor para não travar a ordem
+        self.escritor.entregar(pagina['numero_pagina'], None)
+        self._liberar_admissao(pagina)
+
+    def _liberar_admissao(self, pagina):
+        custo = pagina.pop('admissao', None)
+        if custo is not None:
+            self.controle_admissao.liberar(custo)
+
+    def _refinar_e_gravar(self, pagina_traduzida, original, hash_origem, consultas_memoria=None, layout=None):
+        """Refina e grava a página. Retorna True se ela ficou registrada no diário (mesmo descartada)."""
+        texto_pagina = None
         try:
             p_num = pagina_traduzida['pagina']
             tipo = pagina_traduzida.get('tipo_conteudo', 'TEXTO_TECNICO')
-            
+
             if pagina_traduzida.get('ignorar'):
-                self.logger.warning(f"⚠️ [Pág {p_num}] Descartada por filtros de ruído.")
-                return
+                # Numa página de layout só a prosa é descartada: títulos e código continuam
+                if layout:
+                    layout = [segmento for segmento in layout if segmento["tipo"] != "prosa"]
+                if not layout:
+                    self.logger.warning(f"⚠️ [Pág {p_num}] Descartada por filtros de ruído.")
+                    self.diario.registrar(p_num, hash_origem, None)
+                    return True
 
             conteudo_base_argos = pagina_traduzida['traduzido']
             conteudo_final = ""
+            # (original, tradução) a indexar na memória, só depois do registro no diário
+            pares_memoria = []
 
             # LÓGICA DE REFINAMENTO POR TIPO
             with self.llm_lock:
-                if tipo == "SUMARIO":
-                    self.logger.info(f"📊 [Pág {p_num}] Reestruturando hierarquia do Sumário...")
-                    conteudo_final = self.refinador_service.reestruturar_sumario(conteudo_base_argos)
-                
-                elif tipo == "CODIGO":
-                    self.logger.info(f"💻 [Pág {p_num}] Código detectado. Preservando original.")
-                    conteudo_final = f"```\n{original}\n```"
-                
+                if layout is not None:
+                    conteudo_final = self._traduzir_layout(p_num, tipo, layout, original, conteudo_base_argos, consultas_memoria, pares_memoria)
+
+                elif tipo in ("SUMARIO", "CODIGO"):
+                    conteudo_final = self._traduzir_especial(p_num, tipo, original, conteudo_base_argos)
+
+                elif consultas_memoria:
+                    conteudo_final = self._traduzir_com_memoria(
+                        p_num, original.split("\n\n"), conteudo_base_argos.split("\n\n"), consultas_memoria
+                    )
+
                 else:
-                    self.logger.info(f"🧠 [Pág {p_num}] Refinando tradução técnica...")
-                    refinado = self.refinador_service.refinar_traducao(original, conteudo_base_argos)
-                    
-                    # Validação de Confiabilidade (apenas para texto comum)
-                    if TextCleaner.calcular_confiabilidade(original, refinado):
-                        conteudo_final = refinado
-                    else:
-                        self.logger.warning(f"⚠️ [Pág {p_num}] Refinamento instável. Usando base Argos.")
-                        conteudo_final = conteudo_base_argos
-
-            # Escrita no arquivo (Thread-safe)
-            with self.file_lock:
-                with open(self.arquivo_saida, "a", encoding="utf-8") as f:
-                    f.write(f'\n## Página {p_num} <a id="pg{p_num}"></a>\n\n')
-                    f.write(f"{conteudo_final}\n\n")
-                    f.write(f'[↑ Voltar ao topo](#Sumario)\n')
-                    f.write("\n---\n")
-                    f.flush()
-
-            # --- LIMPEZA DE MEMÓRIA ---
-            pagina_traduzida['traduzido'] = ""
-            del conteudo_final
-            del original
-            gc.collect()
+                    conteudo_final = self._refinar_trecho(p_num, original, conteudo_base_argos)
+
+            # Registro no diário antes da escrita: uma queda a partir daqui não perde a página
+            self.diario.registrar(p_num, hash_origem, conteudo_final)
+            texto_pagina = self._formatar_pagina(p_num, conteudo_final)
+
+            # Páginas de layout indexam cada trecho de prosa separado em _traduzir_layout
+            if tipo == "TEXTO_TECNICO" and layout is None:
+                pares_memoria.append((original, conteudo_final))
+            for original_trecho, traducao_trecho in pares_memoria:
+                self._indexar_memoria(p_num, original_trecho, traducao_trecho)
+            return True
 
         except Exception as e:
             self.logger.error(f"❌ Falha crítica na Página {p_num}: {e}")
+            self._registrar_falha()
+            return False
+        finally:
+            # Sempre entrega (mesmo vazia) para não travar o buffer de reordenação do escritor
+            self.escritor.entregar(pagina_traduzida['pagina'], texto_pagina)
+
+    def _traduzir_especial(self, p_num, tipo, original, conteudo_base_argos, com_titulo=True):
+        if tipo == "SUMARIO" and self.sumario:
+            entradas = self._entradas_sumario(original)
+            if entradas:
+                self.logger.debug(f"📊 [Pág {p_num}] Sumário montado pela estrutura do PDF ({len(entradas)} entradas).")
+                self.metricas.incrementar("sumario_paginas_total", caminho="estrutura")
+                return self._renderizar_sumario(entradas)
+            # Nenhum título da estrutura na página: falso positivo ("index", "contents" no texto)
+            self.logger.debug(f"📄 [Pág {p_num}] Não é sumário (sem títulos da estrutura). Tratando como texto.")
+            self.metricas.incrementar("sumario_paginas_total", caminho="texto")
+            return self._refinar_trecho(p_num, original, conteudo_base_argos, com_titulo)
+        if tipo == "SUMARIO":
+            self.logger.debug(f"📊 [Pág {p_num}] Reestruturando hierarquia do Sumário...")
+            self.metricas.incrementar("sumario_paginas_total", caminho="llm")
+            return self.refinador_service.reestruturar_sumario(conteudo_base_argos)
+        self.logger.debug(f"💻 [Pág {p_num}] Código detectado. Preservando original.")
+        return f"```\n{original}\n```"
+
+    def _traduzir_layout(self, p_num, tipo, layout, original, conteudo_base_argos, consultas, pares_memoria=None):
+        """
+        Remonta uma página da extração por layout: títulos (traduzidos só pelo Argos) e código
+        (preservado) entram como estão; cada trecho contíguo de prosa é refinado à parte,
+        com o prompt sem a regra de títulos, mas com uma só decisão da política para a página.
+        Os pares de cada trecho vão para pares_memoria, indexados pelo chamador depois do diário.
+        """
+        paragrafos_original = original.split("\n\n")
+        paragrafos_argos = conteudo_base_argos.split("\n\n")
+        # Sumário ou "código" detectado no texto: a prosa não vem alinhada e sai inteira no primeiro trecho
+        prosa_inteira = (
+            self._traduzir_especial(p_num, tipo, original, conteudo_base_argos, com_titulo=False) if tipo in ("SUMARIO", "CODIGO") else None
+        )
+
+        partes = [] # texto pronto ou, na prosa, as peças do trecho (resolvidas depois do refino)
+        trechos = [] # (original do trecho, peças), para a memória de tradução
+        segmentos = []
+        inicio = 0
+        for segmento in layout:
+            if segmento["tipo"] == "titulo":
+                # Nível 1 vira '###', o tópico do índice lateral do HTML
+                partes.append(f"{'#' * (segmento['nivel'] + 2)} {segmento.get('traducao', segmento['texto'])}")
+            elif segmento["tipo"] == "codigo":
+                partes.append(f"```\n{segmento['texto']}\n```")
+            elif prosa_inteira is not None:
+                if inicio == 0:
+                    partes.append(prosa_inteira)
+                inicio += segmento["paragrafos"]
+            else:
+                fim = inicio + segmento["paragrafos"]
+                trecho_original = paragrafos_original[inicio:fim]
+                pecas = self._planejar_paragrafos(
+                    p_num, trecho_original, paragrafos_argos[inicio:fim], consultas[inicio:fim] if consultas else None, segmentos
+                )
+                trechos.append(("\n\n".join(trecho_original), pecas))
+                partes.append(pecas)
+                inicio = fim
+
+        refinados = self._refinar_segmentos(p_num, segmentos, com_titulo=False)
+        if pares_memoria is not None:
+            pares_memoria.extend((trecho, self._montar(pecas, refinados)) for trecho, pecas in trechos)
+        textos = (parte if isinstance(parte, str) else self._montar(parte, refinados) for parte in partes)
+        return "\n\n".join(texto for texto in textos if texto)
+
+    def _indexar_memoria(self, p_num, original, traducao):
+        """A memória de tradução é um atalho: uma falha nela (ex.: SQLite ocupado) não derruba a página."""
+        if self.memoria_traducao is None:
+            return
+        try:
+            self.memoria_traducao.indexar_pagina(original, traducao)
+        except Exception as e:
+            self.logger.warning(f"⚠️ [Pág {p_num}] Memória de tradução não atualizada: {e}")
+            self.metricas.incrementar("memoria_traducao_falhas_total", operacao="indexar")
+
+    def _entradas_sumario(self, texto):
+        """Entradas da estrutura do PDF cujo título aparece no texto da página (mínimo MIN_ENTRADAS_SUMARIO)."""
+        normalizado = f" {self.RE_NAO_PALAVRA.sub(' ', texto.lower())} "
+        titulos = self._traduzir_titulos_sumario()
+        entradas = [
+            (nivel, traduzido, pagina)
+            for (nivel, titulo, pagina), traduzido in zip(self.sumario, titulos)
+            if f" {self.RE_NAO_PALAVRA.sub(' ', titulo.lower()).strip()} " in normalizado
+        ]
+        return entradas if len(entradas) >= min(self.MIN_ENTRADAS_SUMARIO, len(self.sumario)) else []
+
+    def _traduzir_titulos_sumario(self):
+        # Todos os títulos num único lote do Argos, na primeira página de sumário
+        with self.sumario_lock:
+            if self._titulos_sumario is None:
+                self._titulos_sumario = self.argo_translate_service.traduzir_titulos([titulo for _, titulo, _ in self.sumario])
+            return self._titulos_sumario
+
+    @staticmethod
+    def _renderizar_sumario(entradas):
+        """Lista Markdown aninhada (4 espaços por nível), com links para as âncoras das páginas."""
+        base = min(nivel for nivel, _, _ in entradas)
+        linhas = []
+        for nivel, titulo, pagina in entradas:
+            item = f"[{titulo}](#pg{pagina})" if pagina > 0 else titulo
+            linhas.append(f"{'    ' * (nivel - base)}* {item}")
+        return "\n".join(linhas)
+
+    def _planejar_paragrafos(self, p_num, paragrafos_original, paragrafos_argos, consultas, segmentos):
+        """
+        Peças de um trecho de parágrafos: textos prontos (memória de tradução) ou índices em
+        'segmentos', a lista de (original, base Argos) que a página refina de uma vez só.
+        """
+        if consultas and any(consultas):
+            return self._planejar_com_memoria(p_num, paragrafos_original, paragrafos_argos, consultas, segmentos)
+        segmentos.append(("\n\n".join(paragrafos_original), "\n\n".join(paragrafos_argos)))
+        return [len(segmentos) - 1]
+
+    @staticmethod
+    def _montar(pecas, refinados):
+        return "\n\n".join(refinados[peca] if isinstance(peca, int) else peca for peca in pecas)
+
+    def _refinar_trecho(self, p_num, original, conteudo_base_argos, com_titulo=True):
+        return self._refinar_segmentos(p_num, [(original, conteudo_base_argos)], com_titulo)[0]
+
+    def _refinar_segmentos(self, p_num, segmentos, com_titulo=True):
+        """
+        Refina os segmentos (original, base Argos) de uma página, cada um numa chamada própria.
+        Com política, a decisão é uma só para a página inteira: o orçamento e o relatório contam páginas.
+        """
+        if not segmentos:
+            return []
+        if self.politica_refinamento is None:
+            self.logger.debug(f"🧠 [Pág {p_num}] Refinando tradução técnica...")
+            return [self._refinar_validado(p_num, original, traducao, com_titulo) for original, traducao in segmentos]
+        return self._refinar_com_politica(p_num, segmentos, com_titulo)
+
+    def _traduzir_com_memoria(self, p_num, paragrafos_original, paragrafos_argos, consultas, com_titulo=True):
+        segmentos = []
+        pecas = self._planejar_com_memoria(p_num, paragrafos_original, paragrafos_argos, consultas, segmentos)
+        return self._montar(pecas, self._refinar_segmentos(p_num, segmentos, com_titulo))
+
+    def _planejar_com_memoria(self, p_num, paragrafos_original, paragrafos_argos, consultas, segmentos):
+        """
+        Monta a página a partir da memória de tradução: acertos exatos são reaproveitados,
+        os quase idênticos viram uma edição curta no LLM e cada trecho contíguo de parágrafos
+        novos (os únicos traduzidos pelo Argos) vira um segmento do refino da página.
+        """
+        pecas = []
+        pendentes = []
+
+        def fechar_pendentes():
+            if pendentes:
+                segmentos.append((
+                    "\n\n".join(paragrafos_original[i] for i in pendentes),
+                    "\n\n".join(paragrafos_argos[i] for i in pendentes)
+                ))
+                pecas.append(len(segmentos) - 1)
+                pendentes.clear()
+
+        for i, consulta in enumerate(consultas):
+            if consulta is None:
+                pendentes.append(i)
+                continue
+            fechar_pendentes()
+
+            if consulta["tipo"] == "exato":
+                pecas.append(consulta["traducao"])
+                self.metricas.incrementar("memoria_traducao_paragrafos_total", caminho="exato")
+                continue
+
+            adaptada = self.refinador_service.adaptar_traducao(consulta["original"], consulta["traducao"], paragrafos_original[i])
+            if adaptada and TextCleaner.calcular_confiabilidade(paragrafos_original[i], adaptada):
+                pecas.append(adaptada)
+                self.metricas.incrementar("memoria_traducao_paragrafos_total", caminho="adaptado")
+                continue
+
+            # Sem edição confiável: o parágrafo faz o caminho completo (Argos + refino).
+            # A tradução do par parecido nunca substitui a deste parágrafo
+            self.metricas.incrementar("memoria_traducao_paragrafos_total", caminho="completo")
+            segmentos.append((paragrafos_original[i], self.argo_translate_service.traduzir_texto(paragrafos_original[i])))
+            pecas.append(len(segmentos) - 1)
+
+        fechar_pendentes()
+        self.logger.debug(f"🗂️ [Pág {p_num}] {sum(1 for c in consultas if c)}/{len(consultas)} parágrafos da memória de tradução.")
+        return pecas
+
+    def _refinar_validado(self, p_num, original, conteudo_base_argos, com_titulo=True):
+        refinado = self.refinador_service.refinar_traducao(original, conteudo_base_argos, com_titulo=com_titulo)
+
+        # Validação de Confiabilidade (apenas para texto comum)
+        if TextCleaner.calcular_confiabilidade(original, refinado):
+            return refinado
+        self.logger.warning(f"⚠️ [Pág {p_num}] Refinamento instável. Usando base Argos.")
+        self.metricas.incrementar("refino_fallback_argos_total", motivo="instavel")
+        return conteudo_base_argos
+
+    def _refinar_com_politica(self, p_num, segmentos, com_titulo=True):
+        restantes = self.total_paginas - self.concluidas if self.total_paginas else None
+        decisao = self.politica_refinamento.decidir(
+            "\n\n".join(original for original, _ in segmentos), "\n\n".join(traducao for _, traducao in segmentos), restantes
+        )
+        caminho = decisao["caminho"]
+
+        if caminho in ("ignorar", "orcamento"):
+            self.logger.debug(f"⏭️ [Pág {p_num}] Refino dispensado ({caminho}, pontuação {decisao['pontuacao']:.2f}).")
+            return [traducao for _, traducao in segmentos]
+
+        inicio = time.perf_counter()
+        try:
+            if caminho == "completo":
+                self.logger.debug(f"🧠 [Pág {p_num}] Refinando tradução técnica (pontuação {decisao['pontuacao']:.2f})...")
+                return [self._refinar_validado(p_num, original, traducao, com_titulo) for original, traducao in segmentos]
+
+            # Parcial: só os parágrafos apontados pela política vão ao LLM (índices da página inteira)
+            self.logger.debug(f"🧠 [Pág {p_num}] Refinando {len(decisao['paragrafos'])} parágrafos selecionados...")
+            selecionados = set(decisao["paragrafos"])
+            refinados = []
+            deslocamento = 0
+            for original, traducao in segmentos:
+                paragrafos_original = original.split("\n\n")
+                paragrafos_traducao = traducao.split("\n\n")
+                alvos = [i for i in range(len(paragrafos_original)) if deslocamento + i in selecionados]
+                deslocamento += len(paragrafos_original)
+                if alvos and len(paragrafos_original) != len(paragrafos_traducao):
+                    # Segmento sem alinhamento parágrafo a parágrafo: vai inteiro
+                    refinados.append(self._refinar_validado(p_num, original, traducao, com_titulo))
+                    continue
+                for i in alvos:
+                    paragrafos_traducao[i] = self._refinar_validado(p_num, paragrafos_original[i], paragrafos_traducao[i], com_titulo)
+                refinados.append("\n\n".join(paragrafos_traducao))
+            return refinados
+        finally:
+            self.politica_refinamento.registrar_gasto(caminho, time.perf_counter() - inicio)
+
+    def _formatar_pagina(self, p_num, conteudo_final):
+        return (
+            f'\n## Página {p_num} <a id="pg{p_num}"></a>\n\n'
+            f"{conteudo_final}\n\n"
+            f'[↑ Voltar ao topo](#Sumario)\n'
+            "\n---\n"
+        )
+
+    def _coletar_metricas(self, metricas, pipeline):
+        """Medidores lidos no momento da exportação: filas, buffer de escrita e caches."""
+        for estagio, profundidade in pipeline.profundidade_filas().items():
+            metricas.definir("fila_profundidade", profundidade, estagio=estagio)
+        if self.escritor:
+            metricas.definir("fila_profundidade", self.escritor.pendentes, estagio="escrita")
+        for nome, servico in (("argos", self.argo_translate_service), ("llm", self.refinador_service)):
+            estatisticas = servico.estatisticas_cache()
+            if estatisticas:
+                metricas.definir("cache_acertos", estatisticas["acertos"], cache=nome)
+                metricas.definir("cache_erros", estatisticas["erros"], cache=nome)
+                metricas.definir("cache_bytes", estatisticas["bytes"], cache=nome)
+
+    def _registrar_relatorio_estagios(self, relatorio, duracao):
+        self.logger.info(f"⏱️ Pipeline concluído em {duracao:.1f}s. Utilização por estágio:")
+        for nome, dados in relatorio.items():
+            self.logger.info(
+                f"   • {nome:<9} x{dados['concorrencia']}: {dados['itens']} itens | "
+                f"{dados['tempo_ocupado']:.1f}s ocupado | utilização {dados['utilizacao']:.0%}"
+            )
+
+    def _registrar_estatisticas_cache(self):
+        for nome, servico in (("Argos", self.argo_translate_service), ("LLM", self.refinador_service)):
+            estatisticas = servico.estatisticas_cache()
+            if estatisticas:
+                self.logger.info(
+                    f"📊 Cache {nome}: {estatisticas['acertos']} acertos / {estatisticas['erros']} erros "
+                    f"({estatisticas['taxa_acerto']:.0%}) | {estatisticas['removidas']} removidas"
+                )
+
+    def _registrar_desempenho_llm(self):
+        desempenho = self.refinador_service.relatorio_desempenho()
+        if desempenho["chamadas"]:
+            self.logger.info(
+                f"🧠 LLM: {desempenho['chamadas']} chamadas | TTFT médio {desempenho['ttft_medio'] * 1000:.0f} ms | "
+                f"prefixo de sistema avaliado {desempenho['prefixos_avaliados']}x, restaurado {desempenho['prefixos_restaurados']}x"
+            )
+        if desempenho["abortos"]:
+            motivos = ", ".join(f"{motivo}: {qtd}" for motivo, qtd in desempenho["abortos_por_motivo"].items())
+            self.logger.info(
+                f"🛑 LLM: {desempenho['abortos']} gerações abortadas ({motivos}) | "
+                f"~{desempenho['tokens_economizados']} tokens economizados"
+            )
+
+    def _registrar_politica_refinamento(self):
+        if self.politica_refinamento is None:
+            return
+        relatorio = self.politica_refinamento.relatorio()
+        orcamento = relatorio["orcamento_gpu_segundos"]
+        self.logger.info(
+            f"🎯 Política de refino: {relatorio['gasto_gpu_segundos']:.1f}s de LLM"
+            + (f" de {orcamento:.0f}s orçados" if orcamento is not None else "")
+        )
+        for caminho, paginas in relatorio["paginas"].items():
+            self.logger.info(f"   • {caminho:<9}: {paginas} páginas | {relatorio['gasto_por_caminho'][caminho]:.1f}s")
+
+    def _registrar_memoria_traducao(self):
+        if self.memoria_traducao is None:
+            return
+        atual = self.memoria_traducao.relatorio()
+        relatorio = {chave: atual[chave] - self._memoria_inicial[chave]
+                     for chave in ("exatos", "proximos", "ausentes", "indexados", "buscas", "tempo_busca")}
+        if relatorio["buscas"]:
+            self.logger.info(
+                f"🗂️ Memória de tradução: {relatorio['exatos']} exatos / {relatorio['proximos']} próximos / "
+                f"{relatorio['ausentes']} ausentes | busca média {relatorio['tempo_busca'] / relatorio['buscas'] * 1000:.2f} ms | "
+                f"{relatorio['indexados']} pares novos"
+            )
 
     def finalizar_processamento(self):
+        if not self.gerar_html:
+            return
         self.logger.info("📦 Consolidando arquivos e gerando HTML...")
-        caminho_md = self.arquivo_saida 
+        caminho_md = self.arquivo_saida
         caminho_html = caminho_md.replace('.md', '.html')
         try:
             enhancer = GenericMarkdownEnhancer(caminho_md)
             enhancer.process_and_view(caminho_html)
             self.logger.info(f"✨ Pronto! Link de leitura: {caminho_html}")
         except Exception as e:
-            self.logger.error(f"❌ Erro ao gerar o HTML final: {e}")
\ No newline at end of file
+            self.logger.error(f"❌ Erro ao gerar o HTML final: {e}")
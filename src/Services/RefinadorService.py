@@ -1,33 +1,22 @@
-
 import os
+import json
+import time
+import hashlib
 import logging
-import llama_cpp
+import threading
+from src.Utils.CachePersistente import CachePersistente
+from src.Utils.OrcamentoTokens import OrcamentoTokens
+from src.Utils.MonitorDegeneracao import MonitorDegeneracao, GeracaoAbortada
+from src.Utils.Metricas import Metricas
 
 class RefinadorService:
-    def __init__(self, model_path: str):
-        self.logger = logging.getLogger(self.__class__.__name__)
-        
-        if not os.path.exists(model_path):
-            raise FileNotFoundError(f"Arquivo do modelo não encontrado: {model_path}")
-
-        self.logger.info("Carregando modelo local para refinamento...")
-        
-        self.llm = llama_cpp.Llama(
-            model_path=model_path,
-            n_ctx=4096,
-            n_gpu_layers=-1, # Usa todas as camadas da GPU disponíveis
-            n_batch=512, # Processa o texto em blocos menores
-            n_threads = min(4, os.cpu_count() // 2),
-            verbose=False # Deixa o console limpo
-        )
+    # Incremente a versão ao alterar um template para invalidar o cache de refinamentos
+    VERSAO_PROMPT_REFINAMENTO = "1"
+    VERSAO_PROMPT_SUMARIO = "1"
+    VERSAO_PROMPT_ADAPTACAO = "1"
 
-    def refinar_traducao(self, texto_original, texto_traduzido):
-        """
-        Usa o Phi-3 para comparar o original e o traduzido,
-        ajustando termos técnicos e limpando ruídos.
-        """
-        # Formato de Prompt específico do Phi-3
-        prompt = f"""<|begin_of_text|><|start_header_id|>system<|end_header_id|>
+    # Formato de Prompt específico do Llama 3
+    PROMPT_REFINAMENTO = """<|begin_of_text|><|start_header_id|>system<|end_header_id|>
                     Você é um Revisor Técnico Bilíngue especialista em livros de TI e Gestão.
                     Sua tarefa é refinar a TRADUÇÃO ATUAL baseando-se no TEXTO ORIGINAL.
 
@@ -41,21 +30,7 @@ class RefinadorService:
                     TRADUÇÃO ATUAL: {texto_traduzido}<|eot_id|>
                     <|start_header_id|>assistant<|end_header_id|>"""
 
-        response = self.llm(
-            prompt,
-            max_tokens=len(texto_traduzido) + 200, # Permite expansão leve
-            temperature=0.2, # Baixa para evitar que a IA invente coisas
-            top_p=0.9,
-            repeat_penalty=1.3,
-            stop=["<|eot_id|>", "<|end_of_text|>", "TEXTO ORIGINAL:", "TRADUÇÃO ATUAL:"]
-        )
-        texto_final = response["choices"][0]["text"].strip()
-        # Limpeza de segurança: Caso o LLM repita o sistema de headers
-        texto_final = texto_final.replace("<|start_header_id|>assistant<|end_header_id|>", "")
-        return texto_final
-    
-    def reestruturar_sumario(self, texto_sumario):
-        prompt = f"""<|start_header_id|>system<|end_header_id|>
+    PROMPT_SUMARIO = """<|start_header_id|>system<|end_header_id|>
         Você é um assistente especializado em estruturação de documentos.
         Sua tarefa é converter um texto de SUMÁRIO extraído de um PDF em uma lista Markdown organizada.
 
@@ -69,12 +44,328 @@ class RefinadorService:
         TEXTO DO SUMÁRIO:
         {texto_sumario}<|eot_id|>
         <|start_header_id|>assistant<|end_header_id|>"""
-                
-        resposta_completa = self.llm(prompt, max_tokens=2048, stop=["<|eot_id|>"])
-        
-        if isinstance(resposta_completa, dict):
-            texto_final = resposta_completa['choices'][0]['text']
+
+    # Variante para a extração por layout: os títulos já vêm da fonte do PDF (e traduzidos pelo Argos)
+    PROMPT_REFINAMENTO_SEM_TITULO = """<|begin_of_text|><|start_header_id|>system<|end_header_id|>
+                    Você é um Revisor Técnico Bilíngue especialista em livros de TI e Gestão.
+                    Sua tarefa é refinar a TRADUÇÃO ATUAL baseando-se no TEXTO ORIGINAL.
+
+                    REGRAS CRÍTICAS:
+                    1. TERMINOLOGIA: Mantenha termos técnicos de mercado (ex: Stakeholders, Pipeline, Design Patterns) se a tradução soar artificial, mas garanta que o contexto seja PT-BR.
+                    2. FLUIDEZ: Remova vícios de tradução literal (ex: "fazer sentido" em vez de "make sense").
+                    3. FORMATO: Não crie títulos; preserve a divisão em parágrafos e os itens de lista.
+                    4. RESPOSTA: Retorne APENAS o texto revisado. Não explique suas alterações.<|eot_id|>
+                    <|start_header_id|>user<|end_header_id|>
+                    TEXTO ORIGINAL: {texto_original}
+                    TRADUÇÃO ATUAL: {texto_traduzido}<|eot_id|>
+                    <|start_header_id|>assistant<|end_header_id|>"""
+
+    # Edição curta a partir da memória de tradução: um parágrafo quase igual a outro já traduzido
+    PROMPT_ADAPTACAO = """<|begin_of_text|><|start_header_id|>system<|end_header_id|>
+                    Você é um Revisor Técnico Bilíngue especialista em livros de TI e Gestão.
+                    Um parágrafo já traduzido reaparece com pequenas diferenças no inglês.
+                    Ajuste a TRADUÇÃO ANTERIOR para que corresponda ao NOVO ORIGINAL, alterando apenas o que mudou
+                    e mantendo a mesma terminologia e o mesmo estilo.
+                    Retorne APENAS a tradução ajustada. Não explique suas alterações.<|eot_id|>
+                    <|start_header_id|>user<|end_header_id|>
+                    ORIGINAL ANTERIOR: {original_anterior}
+                    TRADUÇÃO ANTERIOR: {traducao_anterior}
+                    NOVO ORIGINAL: {novo_original}<|eot_id|>
+                    <|start_header_id|>assistant<|end_header_id|>"""
+
+    # Tudo antes deste marcador é o prefixo de sistema, constante entre chamadas
+    MARCADOR_USUARIO = "<|start_header_id|>user<|end_header_id|>"
+
+    PARAMETROS_REFINAMENTO = {
+        "temperature": 0.2, # Baixa para evitar que a IA invente coisas
+        "top_p": 0.9,
+        "repeat_penalty": 1.3,
+        "stop": ["<|eot_id|>", "<|end_of_text|>", "TEXTO ORIGINAL:", "TRADUÇÃO ATUAL:"]
+    }
+
+    PARAMETROS_ADAPTACAO = dict(
+        PARAMETROS_REFINAMENTO,
+        stop=PARAMETROS_REFINAMENTO["stop"] + ["ORIGINAL ANTERIOR:", "NOVO ORIGINAL:"]
+    )
+
+    PARAMETROS_SUMARIO = {
+        "max_tokens": 2048,
+        "stop": ["<|eot_id|>"]
+    }
+
+    def __init__(self, model_path: str, n_ctx=4096, caminho_cache="cache/refinamentos_llm.sqlite", razao_expansao=1.25, llm=None, metricas=None,
+                 carregar_em_segundo_plano=False):
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.metricas = metricas or Metricas.padrao()
+        self._llm = None
+        self._erro_carregamento = None
+        self._llm_pronto = threading.Event()
+
+        if llm is not None:
+            # Modelo já carregado ou substituto com a mesma interface (ex.: stub de benchmark)
+            self._llm = llm
+            self._llm_pronto.set()
+            impressao = f"{llm.__class__.__name__}:{model_path}"
+        else:
+            if not os.path.exists(model_path):
+                raise FileNotFoundError(f"Arquivo do modelo não encontrado: {model_path}")
+            impressao = self._calcular_impressao_modelo(model_path)
+
+            if carregar_em_segundo_plano:
+                # Extração e Argos das primeiras páginas correm enquanto o GGUF sobe para a GPU
+                threading.Thread(target=self._carregar_modelo, args=(model_path, n_ctx), name="carregar-llm", daemon=True).start()
+            else:
+                self._carregar_modelo(model_path, n_ctx)
+                if self._erro_carregamento:
+                    raise self._erro_carregamento
+
+        # Orçamento medido com o tokenizador do modelo (e não em caracteres)
+        self.orcamento = OrcamentoTokens(self.contar_tokens, n_ctx, razao_expansao=razao_expansao)
+
+        # Memoização persistente: a saída depende apenas do modelo, do prompt, dos parâmetros e das entradas
+        self.impressao_modelo = f"{impressao}:ctx{n_ctx}:exp{razao_expansao}"
+        self.cache = CachePersistente(caminho_cache, tabela="refinamentos_llm") if caminho_cache else None
+
+        # Estados do modelo com cada prefixo de sistema já avaliado (reuso do KV cache)
+        self._estados_prefixo = {}
+        self._prefixo_ativo = None
+        self.estatisticas = {
+            "chamadas": 0,
+            "ttft_total": 0.0,
+            "tempo_total": 0.0,
+            "tokens_gerados": 0,
+            "prefixos_avaliados": 0,
+            "prefixos_restaurados": 0,
+            "abortos": 0,
+            "abortos_por_motivo": {},
+            "tokens_economizados": 0
+        }
+
+    def _carregar_modelo(self, model_path, n_ctx):
+        inicio = time.perf_counter()
+        try:
+            self.logger.info("Carregando modelo local para refinamento...")
+            import llama_cpp # Adiado: o import já inicializa o backend de GPU
+
+            self._llm = llama_cpp.Llama(
+                model_path=model_path,
+                n_ctx=n_ctx,
+                n_gpu_layers=-1, # Usa todas as camadas da GPU disponíveis
+                n_batch=512, # Processa o texto em blocos menores
+                n_threads = min(4, os.cpu_count() // 2),
+                verbose=False # Deixa o console limpo
+            )
+            self.metricas.definir("llm_carregamento_segundos", time.perf_counter() - inicio)
+        except Exception as e:
+            self._erro_carregamento = e
+            self.logger.error(f"❌ Falha ao carregar o modelo: {e}")
+        finally:
+            self._llm_pronto.set()
+
+    @property
+    def llm(self):
+        """O modelo; com carregamento em segundo plano, espera ele ficar pronto."""
+        self._llm_pronto.wait()
+        if self._erro_carregamento:
+            raise RuntimeError(f"Modelo de refinamento indisponível: {self._erro_carregamento}")
+        return self._llm
+
+    @staticmethod
+    def _calcular_impressao_modelo(model_path, amostra=1024 * 1024):
+        """
+        Identifica o arquivo GGUF sem ler os vários GB: nome, tamanho e hash do início e do fim.
+        """
+        tamanho = os.path.getsize(model_path)
+        h = hashlib.sha256()
+        with open(model_path, "rb") as f:
+            h.update(f.read(amostra))
+            if tamanho > amostra:
+                f.seek(max(amostra, tamanho - amostra))
+                h.update(f.read(amostra))
+        return f"{os.path.basename(model_path)}:{tamanho}:{h.hexdigest()[:16]}"
+
+    def _chave_cache(self, versao, template, parametros, *entradas):
+        return CachePersistente.gerar_chave(
+            self.impressao_modelo,
+            versao,
+            hashlib.sha256(template.encode("utf-8")).hexdigest(),
+            json.dumps(parametros, sort_keys=True, ensure_ascii=False),
+            *entradas
+        )
+
+    def _gerar_com_cache(self, chave, gerar):
+        if self.cache:
+            em_cache = self.cache.obter(chave)
+            if em_cache is not None:
+                return em_cache
+
+        texto_final = gerar()
+        if self.cache:
+            self.cache.gravar(chave, texto_final)
+        return texto_final
+
+    def contar_tokens(self, texto):
+        if not texto:
+            return 0
+        return len(self.llm.tokenize(texto.encode("utf-8"), add_bos=False, special=False))
+
+    def _preparar_prefixo(self, prompt):
+        """
+        Garante que o KV cache do modelo comece com o prefixo de sistema do prompt.
+        Na primeira vez o prefixo é avaliado e o estado salvo; depois, basta restaurá-lo.
+        Se a última chamada usou o mesmo prefixo, nada é feito: o llama.cpp reaproveita
+        sozinho o trecho inicial em comum com os tokens já avaliados.
+        """
+        prefixo = prompt[:prompt.index(self.MARCADOR_USUARIO)]
+        if prefixo == self._prefixo_ativo:
+            return
+
+        estado = self._estados_prefixo.get(prefixo)
+        if estado is None:
+            # Mesma tokenização usada pelo llama-cpp-python no prompt completo
+            tokens = self.llm.tokenize(prefixo.encode("utf-8"), special=True)
+            self.llm.reset()
+            self.llm.eval(tokens)
+            self._estados_prefixo[prefixo] = self.llm.save_state()
+            self.estatisticas["prefixos_avaliados"] += 1
         else:
-            texto_final = str(resposta_completa)
-            
-        return texto_final.strip()
\ No newline at end of file
+            self.llm.load_state(estado)
+            self.estatisticas["prefixos_restaurados"] += 1
+        self._prefixo_ativo = prefixo
+
+    def _gerar(self, prompt, parametros, tokens_entrada, monitor=None):
+        """
+        Gera em streaming a partir do prefixo em cache, medindo o tempo até o primeiro token
+        (incluindo a restauração do prefixo). tokens_entrada é o tamanho do prompt já medido
+        pelo chamador no orçamento, para não tokenizar o prompt de novo só pela métrica.
+        Com um monitor, a geração é interrompida assim que ele detectar degeneração (GeracaoAbortada).
+        """
+        inicio = time.perf_counter()
+        self._preparar_prefixo(prompt)
+
+        ttft = None
+        partes = []
+        motivo = None
+        for pedaco in self.llm(prompt, stream=True, **parametros):
+            if ttft is None:
+                ttft = time.perf_counter() - inicio
+            texto = pedaco["choices"][0]["text"]
+            partes.append(texto)
+            if monitor is not None:
+                motivo = monitor.alimentar(texto)
+                if motivo:
+                    # Sair do laço fecha o gerador e para a decodificação no llama.cpp
+                    break
+
+        self.estatisticas["chamadas"] += 1
+        self.estatisticas["ttft_total"] += ttft if ttft is not None else time.perf_counter() - inicio
+        self.estatisticas["tempo_total"] += time.perf_counter() - inicio
+        self.estatisticas["tokens_gerados"] += len(partes)
+        self.logger.debug(f"⏱️ TTFT {(ttft or 0) * 1000:.0f} ms | {len(partes)} tokens")
+        self.metricas.observar("llm_ttft_segundos", ttft if ttft is not None else time.perf_counter() - inicio)
+        self.metricas.observar("llm_geracao_segundos", time.perf_counter() - inicio)
+        self.metricas.incrementar("llm_tokens_gerados_total", len(partes))
+        self.metricas.incrementar("llm_tokens_entrada_total", tokens_entrada)
+
+        if motivo:
+            economizados = max(0, parametros.get("max_tokens", len(partes)) - len(partes))
+            self.estatisticas["abortos"] += 1
+            self.estatisticas["abortos_por_motivo"][motivo] = self.estatisticas["abortos_por_motivo"].get(motivo, 0) + 1
+            self.estatisticas["tokens_economizados"] += economizados
+            self.metricas.incrementar("llm_abortos_total", motivo=motivo)
+            self.metricas.incrementar("llm_tokens_economizados_total", economizados)
+            raise GeracaoAbortada(motivo, len(partes), economizados)
+        return "".join(partes)
+
+    def relatorio_desempenho(self):
+        chamadas = self.estatisticas["chamadas"]
+        return dict(
+            self.estatisticas,
+            ttft_medio=(self.estatisticas["ttft_total"] / chamadas) if chamadas else 0.0
+        )
+
+    def refinar_traducao(self, texto_original, texto_traduzido, com_titulo=True):
+        """
+        Usa o LLM para comparar o original e o traduzido,
+        ajustando termos técnicos e limpando ruídos.
+        Páginas que não cabem no contexto são refinadas em segmentos alinhados.
+        com_titulo=False usa o prompt sem a regra de títulos (extração por layout).
+        """
+        parametros = self.PARAMETROS_REFINAMENTO
+        template = self.PROMPT_REFINAMENTO if com_titulo else self.PROMPT_REFINAMENTO_SEM_TITULO
+        chave = self._chave_cache(self.VERSAO_PROMPT_REFINAMENTO, template, parametros, texto_original, texto_traduzido)
+
+        def gerar():
+            tokens_fixos = self.contar_tokens(template.format(texto_original="", texto_traduzido=""))
+            segmentos = self.orcamento.segmentar(tokens_fixos, texto_original, texto_traduzido)
+            if len(segmentos) > 1:
+                self.logger.debug(f"✂️ Página excede o contexto: refinando em {len(segmentos)} segmentos.")
+
+            partes = []
+            for (original_seg, traduzido_seg), tokens_traducao, tokens_entrada in segmentos:
+                prompt = template.format(texto_original=original_seg, texto_traduzido=traduzido_seg)
+                # max_tokens pelo tamanho medido da tradução, com expansão curta
+                parametros_seg = dict(parametros, max_tokens=self.orcamento.max_tokens_saida(tokens_traducao))
+                monitor = MonitorDegeneracao(original_seg)
+                texto_final = self._gerar(prompt, parametros_seg, tokens_fixos + tokens_entrada, monitor).strip()
+                # Limpeza de segurança: Caso o LLM repita o sistema de headers
+                partes.append(texto_final.replace("<|start_header_id|>assistant<|end_header_id|>", ""))
+            return "\n\n".join(partes)
+
+        try:
+            return self._gerar_com_cache(chave, gerar)
+        except GeracaoAbortada as e:
+            # Resposta degenerada não vai para o cache: fica a base do Argos
+            self.logger.warning(f"🛑 {e}. Usando base Argos.")
+            self.metricas.incrementar("refino_fallback_argos_total", motivo="abortado")
+            return texto_traduzido
+    
+    def adaptar_traducao(self, original_anterior, traducao_anterior, novo_original):
+        """
+        Ajusta a tradução de um parágrafo quase idêntico (memória de tradução), sem passar pelo Argos.
+        Retorna None se a edição não couber no contexto ou degenerar; o chamador segue pelo caminho completo.
+        """
+        parametros = self.PARAMETROS_ADAPTACAO
+        chave = self._chave_cache(self.VERSAO_PROMPT_ADAPTACAO, self.PROMPT_ADAPTACAO, parametros,
+                                  original_anterior, traducao_anterior, novo_original)
+
+        def gerar():
+            prompt = self.PROMPT_ADAPTACAO.format(
+                original_anterior=original_anterior, traducao_anterior=traducao_anterior, novo_original=novo_original
+            )
+            tokens_traducao = self.contar_tokens(traducao_anterior)
+            max_tokens = self.orcamento.max_tokens_saida(tokens_traducao)
+            tokens_prompt = self.contar_tokens(prompt)
+            if tokens_prompt + max_tokens + self.orcamento.margem_contexto > self.orcamento.n_ctx:
+                raise GeracaoAbortada("não cabe no contexto", 0, 0)
+            texto_final = self._gerar(prompt, dict(parametros, max_tokens=max_tokens), tokens_prompt, MonitorDegeneracao(novo_original)).strip()
+            return texto_final.replace("<|start_header_id|>assistant<|end_header_id|>", "")
+
+        try:
+            return self._gerar_com_cache(chave, gerar)
+        except GeracaoAbortada as e:
+            self.logger.debug(f"🛑 Adaptação pela memória de tradução descartada: {e}")
+            return None
+
+    def reestruturar_sumario(self, texto_sumario):
+        parametros = self.PARAMETROS_SUMARIO
+        chave = self._chave_cache(self.VERSAO_PROMPT_SUMARIO, self.PROMPT_SUMARIO, parametros, texto_sumario)
+
+        def gerar():
+            tokens_fixos = self.contar_tokens(self.PROMPT_SUMARIO.format(texto_sumario=""))
+            partes = []
+            for (sumario_seg,), tokens_sumario, _ in self.orcamento.segmentar(tokens_fixos, texto_sumario):
+                prompt = self.PROMPT_SUMARIO.format(texto_sumario=sumario_seg)
+                # A lista Markdown tem aproximadamente o tamanho do texto; o teto continua o do template
+                max_tokens = min(parametros["max_tokens"], self.orcamento.max_tokens_saida(tokens_sumario))
+                partes.append(self._gerar(prompt, dict(parametros, max_tokens=max_tokens), tokens_fixos + tokens_sumario).strip())
+            return "\n".join(partes)
+
+        return self._gerar_com_cache(chave, gerar)
+
+    def estatisticas_cache(self):
+        return self.cache.estatisticas() if self.cache else None
+
+    def fechar(self):
+        if self.cache:
+            self.cache.fechar()
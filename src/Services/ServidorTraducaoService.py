@@ -0,0 +1,227 @@
+import json
+import uuid
+import queue
+import logging
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from src.Services.ExtrairDadosPdfService import ExtrairDadosPdfService
+from src.Services.ProcessadorTraducaoService import ProcessadorTraducaoService
+from src.Utils.Metricas import Metricas
+
+
+class TrabalhoTraducao:
+    """Um pedido de tradução (PDF, intervalo de páginas, saída) e seu estado."""
+
+    def __init__(self, caminho_pdf, arquivo_saida, pagina_inicial=0, pagina_final=None, retomar=True):
+        self.id = uuid.uuid4().hex[:12]
+        self.caminho_pdf = caminho_pdf
+        self.arquivo_saida = arquivo_saida
+        self.pagina_inicial = pagina_inicial
+        self.pagina_final = pagina_final
+        self.retomar = retomar
+        self.estado = "na_fila"
+        self.erro = None
+        self.total_paginas = None
+        self.criado_em = time.time()
+        self.iniciado_em = None
+        self.concluido_em = None
+        self.processador = None
+
+    def resumo(self):
+        concluidas = self.processador.concluidas + self.processador.retomadas if self.processador else 0
+        return {
+            "id": self.id,
+            "estado": self.estado,
+            "caminho_pdf": self.caminho_pdf,
+            "arquivo_saida": self.arquivo_saida,
+            "pagina_inicial": self.pagina_inicial,
+            "pagina_final": self.pagina_final,
+            "paginas_concluidas": concluidas,
+            "total_paginas": self.total_paginas,
+            "erro": self.erro,
+            "criado_em": self.criado_em,
+            "iniciado_em": self.iniciado_em,
+            "concluido_em": self.concluido_em
+        }
+
+
+class ServidorTraducaoService:
+    """
+    Modo serviço: mantém o Argos e o LLM carregados e atende pedidos por HTTP local.
+    Os trabalhos entram numa fila e são executados um por vez (o LLM é único),
+    cada um no pipeline de estágios do ProcessadorTraducaoService.
+
+    Rotas:
+        POST /trabalhos           {"caminho_pdf", "arquivo_saida", "pagina_inicial", "pagina_final", "retomar"}
+        GET  /trabalhos           lista os trabalhos
+        GET  /trabalhos/<id>      estado e progresso de um trabalho
+        GET  /metricas            métricas no formato do Prometheus
+        GET  /saude               verificação simples
+    """
+
+    def __init__(self, traducao_base, refinador, host="127.0.0.1", porta=8765, extrator=None, criar_opcoes_processador=None):
+        self.traducao_base = traducao_base
+        self.refinador = refinador
+        self.host = host
+        self.porta = porta
+        self.extrator = extrator or ExtrairDadosPdfService()
+        # Fábrica dos parâmetros de cada ProcessadorTraducaoService (política, admissão, concorrência...);
+        # uma chamada por trabalho, para que orçamentos como o de GPU valham por livro
+        self.criar_opcoes_processador = criar_opcoes_processador or dict
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.trabalhos = {}
+        self.fila = queue.Queue()
+        self.lock = threading.Lock()
+        self._servidor_http = None
+        self._executor = None
+        self._parando = threading.Event()
+
+    def enviar(self, caminho_pdf, arquivo_saida, pagina_inicial=0, pagina_final=None, retomar=True):
+        trabalho = TrabalhoTraducao(caminho_pdf, arquivo_saida, pagina_inicial, pagina_final, retomar)
+        with self.lock:
+            self.trabalhos[trabalho.id] = trabalho
+        self.fila.put(trabalho)
+        self.logger.info(f"📥 Trabalho {trabalho.id} na fila: {caminho_pdf} -> {arquivo_saida}")
+        return trabalho
+
+    def consultar(self, id_trabalho):
+        with self.lock:
+            trabalho = self.trabalhos.get(id_trabalho)
+        return trabalho.resumo() if trabalho else None
+
+    def listar(self):
+        with self.lock:
+            trabalhos = list(self.trabalhos.values())
+        return [t.resumo() for t in trabalhos]
+
+    def _executar_trabalhos(self):
+        while True:
+            trabalho = self.fila.get()
+            if trabalho is None:
+                return
+            self._executar(trabalho)
+
+    def _executar(self, trabalho):
+        trabalho.estado = "executando"
+        trabalho.iniciado_em = time.time()
+        self.logger.info(f"▶️ Trabalho {trabalho.id} iniciado.")
+        try:
+            total_pdf = self.extrator.contar_paginas(trabalho.caminho_pdf)
+            fim = min(trabalho.pagina_final, total_pdf) if trabalho.pagina_final is not None else total_pdf
+            trabalho.total_paginas = max(0, fim - trabalho.pagina_inicial)
+
+            trabalho.processador = ProcessadorTraducaoService(
+                self.traducao_base, self.refinador, trabalho.arquivo_saida, **self.criar_opcoes_processador()
+            )
+            if self._parando.is_set():
+                trabalho.processador.interromper()
+            paginas = self.extrator.extract_text_from_pdf(trabalho.caminho_pdf, trabalho.pagina_inicial, fim)
+            trabalho.processador.processar_livro_incremental(
+                paginas, total_paginas=trabalho.total_paginas, retomar=trabalho.retomar,
+                sumario=self.extrator.ler_sumario(trabalho.caminho_pdf)
+            )
+            if trabalho.processador.interrompido:
+                trabalho.estado = "interrompido"
+                self.logger.info(f"⏸️ Trabalho {trabalho.id} interrompido; reenvie com retomar para continuar.")
+            else:
+                trabalho.estado = "concluido"
+                self.logger.info(f"🏁 Trabalho {trabalho.id} concluído.")
+        except Exception as e:
+            trabalho.estado = "falhou"
+            trabalho.erro = str(e)
+            self.logger.error(f"❌ Trabalho {trabalho.id} falhou: {e}")
+        finally:
+            trabalho.concluido_em = time.time()
+
+    def servir(self):
+        """Inicia o executor de trabalhos e atende HTTP até ser interrompido (Ctrl+C)."""
+        self._executor = threading.Thread(target=self._executar_trabalhos, name="executor-trabalhos", daemon=True)
+        self._executor.start()
+
+        servico = self
+
+        class Manipulador(_ManipuladorHttp):
+            servidor = servico
+
+        self._servidor_http = ThreadingHTTPServer((self.host, self.porta), Manipulador)
+        self.logger.info(f"🛰️ Serviço de tradução ouvindo em http://{self.host}:{self.porta}")
+        try:
+            self._servidor_http.serve_forever()
+        except KeyboardInterrupt:
+            self.logger.info("🛑 Interrompido pelo usuário.")
+        finally:
+            self.parar()
+
+    def parar(self):
+        if self._servidor_http is not None:
+            self._servidor_http.server_close()
+            self._servidor_http = None
+        if self._executor is not None:
+            self._parando.set()
+            # Os trabalhos na fila são descartados; o em andamento para após a página no LLM
+            # (o diário guarda as concluídas e um novo envio com retomar continua dali)
+            while True:
+                try:
+                    descartado = self.fila.get_nowait()
+                except queue.Empty:
+                    break
+                if descartado is not None:
+                    descartado.estado = "cancelado"
+            with self.lock:
+                em_andamento = [t for t in self.trabalhos.values() if t.estado == "executando" and t.processador]
+            for trabalho in em_andamento:
+                trabalho.processador.interromper()
+            self.fila.put(None)
+            self._executor.join()
+            self._executor = None
+
+
+class _ManipuladorHttp(BaseHTTPRequestHandler):
+    servidor = None
+
+    def log_message(self, formato, *args):
+        logging.getLogger("ServidorTraducaoService.http").debug(formato % args)
+
+    def _responder(self, status, corpo, tipo="application/json; charset=utf-8"):
+        dados = corpo.encode("utf-8") if isinstance(corpo, str) else json.dumps(corpo, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", tipo)
+        self.send_header("Content-Length", str(len(dados)))
+        self.end_headers()
+        self.wfile.write(dados)
+
+    def do_GET(self):
+        partes = [p for p in self.path.split("?")[0].split("/") if p]
+        if partes == ["saude"]:
+            self._responder(200, {"estado": "ok"})
+        elif partes == ["metricas"]:
+            metricas = Metricas.padrao()
+            metricas.coletar()
+            self._responder(200, metricas.formato_prometheus(), "text/plain; version=0.0.4; charset=utf-8")
+        elif partes == ["trabalhos"]:
+            self._responder(200, self.servidor.listar())
+        elif len(partes) == 2 and partes[0] == "trabalhos":
+            resumo = self.servidor.consultar(partes[1])
+            self._responder(200, resumo) if resumo else self._responder(404, {"erro": "Trabalho não encontrado"})
+        else:
+            self._responder(404, {"erro": "Rota não encontrada"})
+
+    def do_POST(self):
+        if self.path.rstrip("/") != "/trabalhos":
+            self._responder(404, {"erro": "Rota não encontrada"})
+            return
+        try:
+            tamanho = int(self.headers.get("Content-Length", 0))
+            pedido = json.loads(self.rfile.read(tamanho) or b"{}")
+            trabalho = self.servidor.enviar(
+                pedido["caminho_pdf"],
+                pedido["arquivo_saida"],
+                int(pedido.get("pagina_inicial") or 0),
+                int(pedido["pagina_final"]) if pedido.get("pagina_final") is not None else None,
+                bool(pedido.get("retomar", True))
+            )
+        except (KeyError, ValueError, TypeError) as e:
+            self._responder(400, {"erro": f"Pedido inválido: {e}"})
+            return
+        self._responder(202, trabalho.resumo())
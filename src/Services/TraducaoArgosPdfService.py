@@ -1,46 +1,187 @@
-import gc
+import re
 import logging
-import argostranslate.translate
 from src.Utils.ArgosManager import ArgosManager
+from src.Utils.CachePersistente import CachePersistente
+from src.Utils.Metricas import Metricas
+from src.Utils.MotorTraducao import MotorArgosLocal
 from src.Utils.TextCleaner import TextCleaner
 
 class TraducaoArgosPdfService:
-    def __init__(self, from_code="en", to_code="pt"):
+    # Quebra após ., ! ou ? seguidos de espaço e de início provável de nova frase
+    REGEX_FIM_FRASE = re.compile(r'(?<=[.!?])\s+(?=["\'(\[A-Z0-9])')
+
+    def __init__(self, from_code="en", to_code="pt", caminho_cache="cache/traducoes_argos.sqlite", max_bytes_cache=512 * 1024 * 1024, motor=None,
+                 modo_segmentacao="chunks", max_tokens_lote=1024, modo_pacotes="auto", pasta_modelos=None):
+        if modo_segmentacao not in ("chunks", "frases"):
+            raise ValueError(f"Modo de segmentação inválido: {modo_segmentacao}")
+
         self.from_code = from_code
         self.to_code = to_code
+        self.modo_segmentacao = modo_segmentacao
+        self.max_tokens_lote = max_tokens_lote
         self.logger = logging.getLogger(self.__class__.__name__)
+        self.metricas = Metricas.padrao()
+        # Motor de tradução: local (thread chamadora) ou MotorArgosProcessos (pool de processos)
+        self.motor = motor or MotorArgosLocal(from_code, to_code)
 
-        if not ArgosManager.garantir_pacote_instalado(from_code, to_code):
-            raise RuntimeError("Não foi possível carregar os pacotes de tradução.")
+        if getattr(self.motor, "requer_pacote_argos", True):
+            # "offline" nunca acessa a rede; "auto" só baixa se o pacote não existir localmente
+            if not ArgosManager.garantir_pacote_instalado(from_code, to_code, modo_pacotes, pasta_modelos):
+                raise RuntimeError("Não foi possível carregar os pacotes de tradução.")
+            versao_pacote = ArgosManager.obter_versao_pacote(from_code, to_code)
+        else:
+            # Motores sem Argos (ex.: stubs de benchmark) informam a própria versão
+            versao_pacote = getattr(self.motor, "versao", self.motor.__class__.__name__)
 
-    def traduzir_pagina(self, item):
+        # Cache em disco: reexecuções do mesmo livro não refazem o trabalho do Argos
+        self.versao_pacote = versao_pacote
+        self.cache = CachePersistente(caminho_cache, tabela="traducoes_argos", max_bytes=max_bytes_cache) if caminho_cache else None
+
+    def _traduzir_chunks(self, chunks, em_frases=False):
+        """
+        Traduz os chunks em ordem. Apenas os ausentes do cache vão para o motor,
+        todos de uma vez, para que o motor possa distribuí-los entre processos.
+        Com em_frases=True, cada chunk é uma frase e os pendentes são decodificados
+        em lotes limitados por tokens.
+        """
+        modo = "frase" if em_frases else "chunk"
+        resultados = [None] * len(chunks)
+        chaves = [None] * len(chunks)
+        pendentes = []
+        traduzidos = []
+
+        for i, chunk in enumerate(chunks):
+            if self.cache:
+                chaves[i] = CachePersistente.gerar_chave(chunk, self.from_code, self.to_code, self.versao_pacote, modo)
+                resultados[i] = self.cache.obter(chaves[i])
+            if resultados[i] is None:
+                pendentes.append(i)
+
+        if pendentes and em_frases:
+            textos_pendentes = [chunks[i] for i in pendentes]
+            for lote in self._agrupar_por_tokens(textos_pendentes):
+                try:
+                    traduzidos.extend(self.motor.traduzir_frases([textos_pendentes[j] for j in lote]))
+                except Exception:
+                    traduzidos.extend([None] * len(lote))
+        elif pendentes:
+            try:
+                traduzidos = self.motor.traduzir_lote([chunks[i] for i in pendentes])
+            except Exception:
+                # Se o lote falhar, tenta chunk a chunk para isolar o problemático
+                traduzidos = []
+                for i in pendentes:
+                    try:
+                        traduzidos.extend(self.motor.traduzir_lote([chunks[i]]))
+                    except Exception:
+                        traduzidos.append(None)
+
+        self.metricas.incrementar("argos_segmentos_total", len(chunks) - len(pendentes), modo=modo, origem="cache")
+        self.metricas.incrementar("argos_segmentos_total", len(pendentes), modo=modo, origem="motor")
+
+        for i, res in zip(pendentes, traduzidos):
+            if res is None:
+                resultados[i] = "[Erro no chunk]"
+                continue
+            resultados[i] = res
+            if self.cache:
+                self.cache.gravar(chaves[i], res)
+
+        return resultados
+
+    def _preparar_pagina(self, item):
+        """
+        Higieniza e classifica a página.
+        Retorna (resultado_final, None) para páginas descartadas ou (None, (texto_limpo, tipo)).
+        """
         texto_original = item.get('conteudo', '')
         p_num = item['numero_pagina']
 
         if not texto_original.strip():
-            self.logger.info(f"⚪ [Pág {p_num}] Ignorada: Página totalmente vazia ou sem texto extraível.")
-            return {"pagina": p_num, "traduzido": "", "ignorar": True, "tipo_conteudo": "N/A"}
-
-        # Início da higienização
-        self.logger.info(f"🧹 [Pág {p_num}] Higienizando texto (Original: {len(texto_original)} chars)...")
-        
-        texto_higienizado = TextCleaner.limpar_sujeira_digital(texto_original)
-        self.logger.debug(f"🔍 [Pág {p_num}] Após limpar_sujeira_digital: {len(texto_higienizado)} chars")
+            self.logger.debug(f"⚪ [Pág {p_num}] Ignorada: Página totalmente vazia ou sem texto extraível.")
+            return {"pagina": p_num, "traduzido": "", "ignorar": True, "tipo_conteudo": "N/A"}, None
 
-        texto_limpo = TextCleaner.limpar_extração_pdf(texto_higienizado)
-        self.logger.info(f"✨ [Pág {p_num}] Limpeza concluída. Texto final: {len(texto_limpo)} chars.")
+        if item.get('higienizado'):
+            # Página já limpa pelo estágio de limpeza do pipeline: não repete a passada
+            texto_limpo = texto_original
+        else:
+            # Início da higienização
+            self.logger.debug(f"🧹 [Pág {p_num}] Higienizando texto (Original: {len(texto_original)} chars)...")
+            texto_limpo = TextCleaner.limpar_pagina(texto_original, remover_cabecalho=not item.get('sem_cabecalho'))
+            self.logger.debug(f"✨ [Pág {p_num}] Limpeza concluída. Texto final: {len(texto_limpo)} chars.")
 
-        # Verificação crítica: Se o texto sumiu após a limpeza
-        if len(texto_original) > 10 and len(texto_limpo) < 5:
-            self.logger.warning(f"⚠️ [Pág {p_num}] Alerta: A limpeza removeu quase todo o conteúdo!")
+            # Verificação crítica: Se o texto sumiu após a limpeza
+            if len(texto_original) > 10 and len(texto_limpo) < 5:
+                self.logger.warning(f"⚠️ [Pág {p_num}] Alerta: A limpeza removeu quase todo o conteúdo!")
 
         if TextCleaner.texto_parece_propaganda(texto_limpo):
             self.logger.warning(f"🚫 [Pág {p_num}] Ignorada: O algoritmo de limpeza classificou como propaganda/lixo.")
-            return {"pagina": p_num, "traduzido": "", "ignorar": True, "tipo_conteudo": "PROPAGANDA"}
+            return {"pagina": p_num, "traduzido": "", "ignorar": True, "tipo_conteudo": "PROPAGANDA"}, None
 
         # 3. IDENTIFICAÇÃO DE CONTEUDO
         tipo_conteudo = TextCleaner.identificar_tipo_conteudo(texto_limpo)
+        return None, (texto_limpo, tipo_conteudo)
 
+    def traduzir_pagina(self, item):
+        return self.traduzir_paginas([item])[0]
+
+    def traduzir_paginas(self, itens):
+        """
+        Traduz várias páginas de uma vez. No modo "frases" as frases de todas
+        as páginas são agrupadas nos mesmos lotes de decodificação.
+        """
+        resultados = [None] * len(itens)
+        preparadas = []
+        for i, item in enumerate(itens):
+            descartada, preparada = self._preparar_pagina(item)
+            if descartada:
+                resultados[i] = descartada
+            else:
+                preparadas.append((i, item['numero_pagina']) + preparada)
+
+        # Parágrafos já resolvidos pela memória de tradução ficam vazios (só em texto comum);
+        # nessas páginas, e nas que pedem alinhamento (extração por layout), a tradução
+        # sai alinhada parágrafo a parágrafo com o original
+        alinhadas = set()
+        for j, (i, p_num, texto, tipo_conteudo) in enumerate(preparadas):
+            dispensados = itens[i].get('paragrafos_dispensados') or set()
+            if (dispensados or itens[i].get('alinhar_paragrafos')) and tipo_conteudo == "TEXTO_TECNICO":
+                paragrafos = texto.split("\n\n")
+                texto = "\n\n".join("" if k in dispensados else paragrafo for k, paragrafo in enumerate(paragrafos))
+                preparadas[j] = (i, p_num, texto, tipo_conteudo)
+                alinhadas.add(j)
+
+        if self.modo_segmentacao == "frases":
+            traducoes = self._traduzir_por_frases([texto for _, _, texto, _ in preparadas])
+        else:
+            traducoes = [
+                "\n\n".join(self._traduzir_por_chunks(paragrafo) for paragrafo in texto.split("\n\n")) if j in alinhadas
+                else self._traduzir_por_chunks(texto)
+                for j, (_, _, texto, _) in enumerate(preparadas)
+            ]
+
+        for (i, p_num, _, tipo_conteudo), traduzido in zip(preparadas, traducoes):
+            resultados[i] = {
+                "pagina": p_num,
+                "traduzido": traduzido,
+                "ignorar": False,
+                "tipo_conteudo": tipo_conteudo
+            }
+
+        return resultados
+
+    def traduzir_texto(self, texto):
+        """Traduz um trecho já higienizado, sem os filtros e a classificação de página de _preparar_pagina."""
+        if self.modo_segmentacao == "frases":
+            return self._traduzir_por_frases([texto])[0]
+        return self._traduzir_por_chunks(texto)
+
+    def traduzir_titulos(self, titulos):
+        """Títulos (extração por layout) só passam pelo Argos, todos num lote; em caso de erro fica o original."""
+        traduzidos = self._traduzir_chunks(titulos)
+        return [original if traduzido == "[Erro no chunk]" else traduzido for original, traduzido in zip(titulos, traduzidos)]
+
+    def _traduzir_por_chunks(self, texto_limpo):
         # 4. TRADUÇÃO DOS CHUNKS (Usando o texto já limpo)
         limite = 1000
         chunks = []
@@ -62,24 +203,51 @@ class TraducaoArgosPdfService:
             chunks.append(texto[:indice_corte])
             texto = texto[indice_corte:].lstrip() # Remove o espaço que sobrou no início
         
-        partes_traduzidas = []
-        for chunk in chunks:
-            try:
-                res = argostranslate.translate.translate(chunk, self.from_code, self.to_code)
-                partes_traduzidas.append(res)
-            except Exception:
-                partes_traduzidas.append("[Erro no chunk]")
+        return " ".join(self._traduzir_chunks(chunks))
+
+    def _traduzir_por_frases(self, textos):
+        """
+        Segmenta cada texto em parágrafos e frases, traduz as frases em lotes
+        limitados por tokens e remonta o layout original de parágrafos.
+        """
+        frases = []
+        estruturas = [] # por texto: lista de parágrafos, cada um com os índices de suas frases
+        for texto in textos:
+            paragrafos = []
+            for paragrafo in texto.split("\n\n"):
+                indices = []
+                for frase in self.REGEX_FIM_FRASE.split(paragrafo.strip()):
+                    if frase:
+                        indices.append(len(frases))
+                        frases.append(frase)
+                paragrafos.append(indices)
+            estruturas.append(paragrafos)
+
+        traduzidas = self._traduzir_chunks(frases, em_frases=True)
+
+        return [
+            "\n\n".join(" ".join(traduzidas[i] for i in indices) for indices in paragrafos)
+            for paragrafos in estruturas
+        ]
 
-        resultado = {
-            "pagina": p_num,
-            "traduzido": " ".join(partes_traduzidas),
-            "ignorar": False,
-            "tipo_conteudo": tipo_conteudo
-        }
+    def _agrupar_por_tokens(self, textos):
+        """Agrupa índices de textos em lotes cujo total estimado de tokens cabe no orçamento."""
+        lotes, atual, tokens_atual = [], [], 0
+        for i, texto in enumerate(textos):
+            tokens = max(1, len(texto) // 4) # Estimativa: ~4 caracteres por token
+            if atual and tokens_atual + tokens > self.max_tokens_lote:
+                lotes.append(atual)
+                atual, tokens_atual = [], 0
+            atual.append(i)
+            tokens_atual += tokens
+        if atual:
+            lotes.append(atual)
+        return lotes
 
-        # Limpeza agressiva de RAM
-        del partes_traduzidas
-        del texto_limpo
-        gc.collect()
+    def fechar(self):
+        self.motor.fechar()
+        if self.cache:
+            self.cache.fechar()
 
-        return resultado
\ No newline at end of file
+    def estatisticas_cache(self):
+        return self.cache.estatisticas() if self.cache else None
@@ -0,0 +1,113 @@
+import re
+from collections import Counter
+
+class AnalisadorLayout:
+    """
+    Classifica os blocos de get_text("dict") pelos metadados de fonte: tamanho em relação
+    ao corpo do documento, negrito e famílias monoespaçadas. Cada bloco sai tipado como
+    titulo (com nível), paragrafo, lista ou codigo, para que o código não seja traduzido
+    e os títulos não dependam do LLM.
+    """
+
+    TIPOS = ("titulo", "paragrafo", "lista", "codigo")
+    # Bits de 'flags' dos spans no PyMuPDF
+    FLAG_MONO = 8
+    FLAG_NEGRITO = 16
+    RE_FONTE_MONO = re.compile(r'mono|courier|consol|menlo|inconsolata|code|fixed', re.IGNORECASE)
+    RE_ITEM_LISTA = re.compile(r'^\s*(?:[•◦▪‣∙·●○■□–—*-]|\(?\d{1,2}[.)]|\(?[a-z][.)])\s+')
+    RE_FIM_TITULO_INVALIDO = re.compile(r'[.,;:]\s*$')
+
+    def __init__(self, razao_titulo=1.15, razao_titulo_principal=1.5, fracao_mono=0.8, fracao_negrito=0.9,
+                 max_caracteres_titulo=160, max_linhas_titulo=3, paginas_amostra=24):
+        # Tamanho mínimo (em relação ao corpo) para um bloco curto ser título; acima do segundo, nível 1
+        self.razao_titulo = razao_titulo
+        self.razao_titulo_principal = razao_titulo_principal
+        self.fracao_mono = fracao_mono
+        self.fracao_negrito = fracao_negrito
+        self.max_caracteres_titulo = max_caracteres_titulo
+        self.max_linhas_titulo = max_linhas_titulo
+        self.paginas_amostra = paginas_amostra
+        self.tamanho_corpo = None
+
+    def calibrar(self, doc, inicio, fim):
+        """Tamanho de fonte do corpo: o mais frequente (ponderado por caracteres) numa amostra de páginas."""
+        paginas = range(inicio, fim)
+        passo = max(1, len(paginas) // self.paginas_amostra)
+        contagem = Counter()
+        for page_num in paginas[::passo]:
+            for bloco in doc.load_page(page_num).get_text("dict")["blocks"]:
+                for linha in bloco.get("lines", ()):
+                    for span in linha["spans"]:
+                        contagem[round(span["size"], 1)] += len(span["text"].strip())
+        self.tamanho_corpo = contagem.most_common(1)[0][0] if contagem else None
+        return self.tamanho_corpo
+
+    def _eh_mono(self, span):
+        return bool(span["flags"] & self.FLAG_MONO) or bool(self.RE_FONTE_MONO.search(span["font"]))
+
+    def blocos_pagina(self, page):
+        """
+        Blocos de texto da página como tuplas (x0, y0, x1, y1, texto, tipo, nivel),
+        compatíveis com o DetectorBoilerplate (bbox e texto nas mesmas posições de get_text("blocks")).
+        """
+        lidos = [] # (bbox, texto, fonte) com fonte = None para código
+        tamanhos_pagina = Counter()
+        for bloco in page.get_text("dict")["blocks"]:
+            if bloco.get("type") != 0:
+                continue # imagem
+
+            linhas, x_linhas = [], []
+            caracteres = mono = negrito = 0
+            tamanhos = Counter()
+            for linha in bloco["lines"]:
+                texto_linha = "".join(span["text"] for span in linha["spans"])
+                if not texto_linha.strip():
+                    continue
+                linhas.append(texto_linha)
+                x_linhas.append(linha["bbox"][0])
+                for span in linha["spans"]:
+                    n = len(span["text"].strip())
+                    caracteres += n
+                    tamanhos[round(span["size"], 1)] += n
+                    if self._eh_mono(span):
+                        mono += n
+                    if span["flags"] & self.FLAG_NEGRITO:
+                        negrito += n
+            if not caracteres:
+                continue
+
+            tamanho = tamanhos.most_common(1)[0][0]
+            tamanhos_pagina.update(tamanhos)
+            if mono >= self.fracao_mono * caracteres:
+                # O recuo do código está na posição das linhas, não em espaços do texto
+                largura = tamanho * 0.6
+                margem = min(x_linhas)
+                texto = "\n".join(" " * round((x - margem) / largura) + l.rstrip() for l, x in zip(linhas, x_linhas))
+                lidos.append((tuple(bloco["bbox"]), texto, None))
+            else:
+                fonte = (tamanho, negrito >= self.fracao_negrito * caracteres, len(linhas))
+                lidos.append((tuple(bloco["bbox"]), "\n".join(linhas), fonte))
+
+        # Sem calibração, o corpo é o tamanho predominante da própria página
+        corpo = self.tamanho_corpo or (tamanhos_pagina.most_common(1)[0][0] if tamanhos_pagina else None)
+        return [
+            bbox + (texto,) + (("codigo", 0) if fonte is None else self._classificar(texto, *fonte, corpo))
+            for bbox, texto, fonte in lidos
+        ]
+
+    def _classificar(self, texto, tamanho, negrito, n_linhas, corpo):
+        """Retorna (tipo, nivel) de um bloco que não é código."""
+        # Números soltos (página, figura) não são títulos, por maior que seja a fonte
+        curto = n_linhas <= self.max_linhas_titulo and len(texto.strip()) <= self.max_caracteres_titulo and not texto.strip().isdigit()
+        if curto and corpo:
+            razao = tamanho / corpo
+            if razao >= self.razao_titulo_principal:
+                return "titulo", 1
+            if razao >= self.razao_titulo:
+                return "titulo", 2
+            # Linha em negrito no tamanho do corpo, sem pontuação final: subtítulo
+            if negrito and razao >= 0.95 and not self.RE_FIM_TITULO_INVALIDO.search(texto):
+                return "titulo", 3
+        if self.RE_ITEM_LISTA.match(texto):
+            return "lista", 0
+        return "paragrafo", 0
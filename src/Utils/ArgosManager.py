@@ -1,35 +1,80 @@
-import argostranslate.package
+import os
+import re
+import json
 import logging
 
 class ArgosManager:
+    """
+    Garante o pacote de tradução do Argos com prioridade para o que já está na máquina:
+    1. manifesto local (sem importar o argostranslate e sem rede);
+    2. pacotes instalados (argostranslate, sem rede);
+    3. arquivos .argosmodel de uma pasta local;
+    4. índice online — apenas no modo "auto".
+    """
+
+    MODOS = ("offline", "auto")
+    CAMINHO_MANIFESTO = os.path.join("cache", "argos_manifesto.json")
+    # Nome padrão dos pacotes publicados: translate-en_pt-1_9.argosmodel
+    RE_ARQUIVO_MODELO = re.compile(r'translate-([a-z]{2,3})_([a-z]{2,3})(?:-([\w.]+))?\.argosmodel$', re.IGNORECASE)
+
     @staticmethod
-    def garantir_pacote_instalado(from_code: str, to_code: str):
+    def garantir_pacote_instalado(from_code: str, to_code: str, modo="auto", pasta_modelos=None, caminho_manifesto=None):
         """
-        Verifica se o pacote de tradução está instalado, caso contrário, realiza o download.
+        Verifica se o pacote de tradução está instalado, caso contrário, instala da pasta local
+        ou (modo "auto") realiza o download.
         """
+        if modo not in ArgosManager.MODOS:
+            raise ValueError(f"Modo de pacotes inválido: {modo}")
         logger = logging.getLogger("ArgosManager")
+        caminho_manifesto = caminho_manifesto or ArgosManager.CAMINHO_MANIFESTO
         logger.info(f"Verificando pacote de tradução: {from_code} -> {to_code}")
 
+        # 1. Manifesto local: verificação instantânea, sem importar o argostranslate
+        if ArgosManager._entrada_manifesto(caminho_manifesto, from_code, to_code):
+            logger.info(f"Pacote {from_code}->{to_code} já está pronto para uso (manifesto local).")
+            return True
+
         try:
-            # 1. Atualiza o índice (necessário para downloads)
-            argostranslate.package.update_package_index()
-            
-            # 2. Verifica se já está instalado para evitar download desnecessário
-            installed_packages = argostranslate.package.get_installed_packages()
-            is_installed = any(
-                p.from_code == from_code and p.to_code == to_code 
-                for p in installed_packages
-            )
+            import argostranslate.package
 
-            if is_installed:
+            # 2. Verifica se já está instalado para evitar download desnecessário
+            if ArgosManager._registrar_instalado(caminho_manifesto, from_code, to_code):
                 logger.info(f"Pacote {from_code}->{to_code} já está pronto para uso.")
                 return True
 
-            # 3. Busca o pacote nos disponíveis
+            # 3. Instalação a partir de uma pasta local de .argosmodel (máquinas sem rede)
+            arquivo_local = ArgosManager._buscar_modelo_local(pasta_modelos, from_code, to_code)
+            if arquivo_local:
+                logger.info(f"Instalando pacote {from_code}->{to_code} de {arquivo_local}...")
+                argostranslate.package.install_from_path(arquivo_local)
+                return ArgosManager._registrar_instalado(caminho_manifesto, from_code, to_code)
+
+            if modo == "offline":
+                logger.error(
+                    f"Pacote {from_code}->{to_code} não instalado e modo offline ativo. "
+                    f"Informe uma pasta com o .argosmodel ou use o modo 'auto'."
+                )
+                return False
+        except Exception as e:
+            logger.error(f"Erro ao gerenciar pacotes Argos localmente: {e}")
+            return False
+
+        return ArgosManager._instalar_do_indice(caminho_manifesto, from_code, to_code)
+
+    @staticmethod
+    def _instalar_do_indice(caminho_manifesto, from_code, to_code):
+        import argostranslate.package
+        logger = logging.getLogger("ArgosManager")
+
+        try:
+            # 4. Atualiza o índice (necessário para downloads)
+            argostranslate.package.update_package_index()
+
+            # Busca o pacote nos disponíveis
             available_packages = argostranslate.package.get_available_packages()
             package_to_install = next(
                 filter(
-                    lambda x: x.from_code == from_code and x.to_code == to_code, 
+                    lambda x: x.from_code == from_code and x.to_code == to_code,
                     available_packages
                 ), None
             )
@@ -38,11 +83,110 @@ class ArgosManager:
                 logger.info(f"Baixando e instalando pacote {from_code}->{to_code} (isso pode demorar)...")
                 argostranslate.package.install_from_path(package_to_install.download())
                 logger.info("Instalação concluída com sucesso.")
-                return True
+                return ArgosManager._registrar_instalado(caminho_manifesto, from_code, to_code)
             else:
                 logger.error(f"Pacote de tradução {from_code}->{to_code} não disponível no índice.")
                 return False
 
         except Exception as e:
-            logger.error(f"Erro ao gerenciar pacotes Argos: {e}")
-            return False
\ No newline at end of file
+            logger.error(f"Erro ao baixar pacotes Argos: {e}")
+            return False
+
+    @staticmethod
+    def _buscar_modelo_local(pasta_modelos, from_code, to_code):
+        if not pasta_modelos or not os.path.isdir(pasta_modelos):
+            return None
+        candidatos = []
+        for nome in os.listdir(pasta_modelos):
+            m = ArgosManager.RE_ARQUIVO_MODELO.match(nome)
+            if m and m.group(1).lower() == from_code and m.group(2).lower() == to_code:
+                candidatos.append((ArgosManager._versao_numerica(m.group(3)), nome))
+        if not candidatos:
+            return None
+        # Versão mais nova pelo valor numérico ("1_10" depois de "1_9"), não pela ordem do texto
+        return os.path.join(pasta_modelos, max(candidatos)[1])
+
+    @staticmethod
+    def _versao_numerica(versao):
+        return tuple(int(n) for n in re.findall(r'\d+', versao or ""))
+
+    @staticmethod
+    def _registrar_instalado(caminho_manifesto, from_code, to_code):
+        """Procura o pacote entre os instalados e o registra no manifesto local."""
+        import argostranslate.package
+
+        for p in argostranslate.package.get_installed_packages():
+            if p.from_code == from_code and p.to_code == to_code:
+                ArgosManager._gravar_manifesto(caminho_manifesto, from_code, to_code, {
+                    "versao": str(getattr(p, "package_version", "desconhecida")),
+                    "caminho": str(getattr(p, "package_path", ""))
+                })
+                return True
+        return False
+
+    @staticmethod
+    def _ler_manifesto(caminho_manifesto):
+        try:
+            with open(caminho_manifesto, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    @staticmethod
+    def _gravar_manifesto(caminho_manifesto, from_code, to_code, entrada):
+        manifesto = ArgosManager._ler_manifesto(caminho_manifesto)
+        manifesto[f"{from_code}->{to_code}"] = entrada
+        pasta = os.path.dirname(caminho_manifesto)
+        if pasta:
+            os.makedirs(pasta, exist_ok=True)
+        # Temporário por processo: trabalhadores de fatias iniciando juntos gravam o mesmo manifesto
+        temporario = f"{caminho_manifesto}.{os.getpid()}.tmp"
+        with open(temporario, "w", encoding="utf-8") as f:
+            json.dump(manifesto, f, indent=2, ensure_ascii=False)
+        os.replace(temporario, caminho_manifesto)
+
+    @staticmethod
+    def _entrada_manifesto(caminho_manifesto, from_code, to_code):
+        """
+        Entrada do manifesto, se o pacote registrado ainda existir no disco. A versão é
+        conferida com o metadata.json do pacote (atualizado no mesmo caminho, o manifesto
+        ficaria com a versão antiga, e ela entra na chave do cache de tradução).
+        """
+        entrada = ArgosManager._ler_manifesto(caminho_manifesto).get(f"{from_code}->{to_code}")
+        if not (entrada and entrada.get("caminho") and os.path.isdir(entrada["caminho"])):
+            return None
+        versao = ArgosManager._versao_metadados(entrada["caminho"])
+        if versao is not None and versao != entrada.get("versao"):
+            logging.getLogger("ArgosManager").info(
+                f"Pacote {from_code}->{to_code} mudou de versão no disco ({entrada.get('versao')} -> {versao}); manifesto atualizado."
+            )
+            entrada = dict(entrada, versao=versao)
+            ArgosManager._gravar_manifesto(caminho_manifesto, from_code, to_code, entrada)
+        return entrada
+
+    @staticmethod
+    def _versao_metadados(caminho_pacote):
+        """package_version do metadata.json do pacote instalado; None se não der para ler."""
+        try:
+            with open(os.path.join(caminho_pacote, "metadata.json"), "r", encoding="utf-8") as f:
+                versao = json.load(f).get("package_version")
+        except (OSError, ValueError, AttributeError):
+            return None
+        return str(versao) if versao is not None else None
+
+    @staticmethod
+    def obter_versao_pacote(from_code: str, to_code: str, caminho_manifesto=None) -> str:
+        """
+        Retorna a versão do pacote instalado (usada como parte da chave do cache de tradução).
+        """
+        entrada = ArgosManager._entrada_manifesto(caminho_manifesto or ArgosManager.CAMINHO_MANIFESTO, from_code, to_code)
+        if entrada:
+            return entrada.get("versao", "desconhecida")
+        try:
+            import argostranslate.package
+            for p in argostranslate.package.get_installed_packages():
+                if p.from_code == from_code and p.to_code == to_code:
+                    return str(getattr(p, "package_version", "desconhecida"))
+        except Exception as e:
+            logging.getLogger("ArgosManager").warning(f"Não foi possível obter a versão do pacote: {e}")
+        return "desconhecida"
@@ -0,0 +1,161 @@
+import os
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+
+class CachePersistente:
+    """
+    Cache chave/valor em SQLite, endereçado por conteúdo.
+    Mantém contadores de acerto/erro e remove as entradas menos usadas
+    quando o tamanho total ultrapassa o limite configurado.
+
+    O banco pode ser compartilhado por vários processos (execução fatiada): as escritas
+    esperam até 'timeout' segundos pelo bloqueio e, se ainda assim falharem, são
+    descartadas (o cache é só um atalho). Os horários de acesso da remoção LRU são
+    gravados em lote, não a cada acerto.
+    """
+
+    # Acertos acumulados antes de gravar os horários de acesso
+    LOTE_ACESSOS = 64
+    # Escritas entre recontagens do tamanho total no banco (outros processos também gravam)
+    INTERVALO_RECONTAGEM = 64
+
+    def __init__(self, caminho_db, tabela="cache", max_bytes=512 * 1024 * 1024, timeout=30.0):
+        self.caminho_db = caminho_db
+        self.tabela = tabela
+        self.max_bytes = max_bytes
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.lock = threading.Lock()
+        self.acertos = 0
+        self.erros = 0
+        self.removidas = 0
+        self.escritas_descartadas = 0
+        self._acessos = {}
+        self._escritas_sem_recontagem = 0
+
+        pasta = os.path.dirname(caminho_db)
+        if pasta and not os.path.exists(pasta):
+            os.makedirs(pasta)
+
+        self.conexao = sqlite3.connect(caminho_db, timeout=timeout, check_same_thread=False)
+        self.conexao.execute("PRAGMA journal_mode=WAL")
+        self.conexao.execute("PRAGMA synchronous=NORMAL")
+        self.conexao.execute(
+            f"CREATE TABLE IF NOT EXISTS {tabela} ("
+            "chave TEXT PRIMARY KEY, valor TEXT NOT NULL, "
+            "tamanho INTEGER NOT NULL, ultimo_acesso REAL NOT NULL)"
+        )
+        self.conexao.execute(f"CREATE INDEX IF NOT EXISTS idx_{tabela}_acesso ON {tabela}(ultimo_acesso)")
+        self.conexao.commit()
+
+        self.total_bytes = self._contar_bytes()
+
+    @staticmethod
+    def gerar_chave(*partes):
+        """Gera a chave SHA-256 a partir das partes (texto, idiomas, versões...)."""
+        h = hashlib.sha256()
+        for parte in partes:
+            h.update(str(parte).encode("utf-8"))
+            h.update(b"\x1f") # Separador para evitar colisões entre ("ab","c") e ("a","bc")
+        return h.hexdigest()
+
+    def obter(self, chave):
+        with self.lock:
+            linha = self.conexao.execute(f"SELECT valor FROM {self.tabela} WHERE chave = ?", (chave,)).fetchone()
+            if linha is None:
+                self.erros += 1
+                return None
+
+            self.acertos += 1
+            self._acessos[chave] = time.time()
+            if len(self._acessos) >= self.LOTE_ACESSOS:
+                self._escrever(self._gravar_acessos)
+            return linha[0]
+
+    def gravar(self, chave, valor):
+        tamanho = len(valor.encode("utf-8"))
+
+        def inserir():
+            anterior = self.conexao.execute(f"SELECT tamanho FROM {self.tabela} WHERE chave = ?", (chave,)).fetchone()
+            self.conexao.execute(
+                f"INSERT OR REPLACE INTO {self.tabela} (chave, valor, tamanho, ultimo_acesso) VALUES (?, ?, ?, ?)",
+                (chave, valor, tamanho, time.time())
+            )
+            self.total_bytes += tamanho - (anterior[0] if anterior else 0)
+            self._gravar_acessos()
+            self._escritas_sem_recontagem += 1
+            # O contador local não vê as escritas de outros processos: o total é recontado no
+            # banco periodicamente e sempre antes de remover (dentro desta mesma transação)
+            if self.total_bytes > self.max_bytes or self._escritas_sem_recontagem >= self.INTERVALO_RECONTAGEM:
+                self.total_bytes = self._contar_bytes()
+                self._escritas_sem_recontagem = 0
+            if self.total_bytes > self.max_bytes:
+                return self._remover_menos_usadas()
+            return 0
+
+        with self.lock:
+            removidas = self._escrever(inserir)
+            if removidas:
+                self.removidas += removidas
+                self.logger.debug(f"🧽 [{self.tabela}] {removidas} entradas removidas (limite de {self.max_bytes} bytes).")
+
+    def _contar_bytes(self):
+        return self.conexao.execute(f"SELECT COALESCE(SUM(tamanho), 0) FROM {self.tabela}").fetchone()[0]
+
+    def _escrever(self, operacao):
+        """
+        Executa e confirma uma escrita, retornando o resultado da operação; com o banco ocupado
+        por outro processo, desfaz e segue sem ela (retorna None).
+        """
+        total_bytes = self.total_bytes
+        try:
+            resultado = operacao()
+            self.conexao.commit()
+            return resultado
+        except sqlite3.OperationalError as e:
+            self.conexao.rollback()
+            self.total_bytes = total_bytes
+            self.escritas_descartadas += 1
+            self.logger.warning(f"⚠️ [{self.tabela}] Escrita no cache descartada: {e}")
+            return None
+
+    def _gravar_acessos(self):
+        if self._acessos:
+            self.conexao.executemany(
+                f"UPDATE {self.tabela} SET ultimo_acesso = ? WHERE chave = ?",
+                [(instante, chave) for chave, instante in self._acessos.items()]
+            )
+            self._acessos = {}
+
+    def _remover_menos_usadas(self):
+        """Retorna a quantidade de entradas removidas (contabilizada só depois do commit)."""
+        # Remove em lote até 90% do limite para não pagar a remoção a cada escrita
+        alvo = int(self.max_bytes * 0.9)
+        cursor = self.conexao.execute(f"SELECT chave, tamanho FROM {self.tabela} ORDER BY ultimo_acesso ASC")
+        remover = []
+        for chave, tamanho in cursor:
+            if self.total_bytes <= alvo:
+                break
+            remover.append((chave,))
+            self.total_bytes -= tamanho
+
+        self.conexao.executemany(f"DELETE FROM {self.tabela} WHERE chave = ?", remover)
+        return len(remover)
+
+    def estatisticas(self):
+        total = self.acertos + self.erros
+        return {
+            "acertos": self.acertos,
+            "erros": self.erros,
+            "taxa_acerto": (self.acertos / total) if total else 0.0,
+            "removidas": self.removidas,
+            "escritas_descartadas": self.escritas_descartadas,
+            "bytes": self.total_bytes
+        }
+
+    def fechar(self):
+        with self.lock:
+            self._escrever(self._gravar_acessos)
+            self.conexao.close()
@@ -0,0 +1,118 @@
+import time
+import logging
+import threading
+from src.Utils.Metricas import Metricas
+
+class ControleAdmissao:
+    """
+    Porta de entrada do pipeline: uma página nova só entra quando há folga nos orçamentos
+    de bytes e tokens em voo (admitidos e ainda não concluídos) e na RSS/VRAM observadas.
+    Quando não há nada em voo a página é sempre admitida, para nunca travar o pipeline.
+    """
+
+    def __init__(self, max_bytes_em_voo=2 * 1024 * 1024, max_tokens_em_voo=256 * 1024, max_rss_bytes=None,
+                 max_vram_bytes=None, intervalo_amostragem=0.5, metricas=None):
+        self.max_bytes_em_voo = max_bytes_em_voo
+        self.max_tokens_em_voo = max_tokens_em_voo
+        self.max_rss_bytes = max_rss_bytes
+        self.max_vram_bytes = max_vram_bytes
+        # RSS/VRAM mudam sem aviso: são reamostradas no máximo a cada 'intervalo_amostragem' segundos
+        self.intervalo_amostragem = intervalo_amostragem
+        self.metricas = metricas or Metricas.padrao()
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+        self.condicao = threading.Condition()
+        self.bytes_em_voo = 0
+        self.tokens_em_voo = 0
+        self.paginas_em_voo = 0
+        self.esperas = 0
+        self.tempo_espera = 0.0
+        self._ultima_amostra = 0.0
+        self._memoria_excedida = None
+        self._nvml = None
+
+    @staticmethod
+    def estimar_custo(texto):
+        """Bytes UTF-8 e tokens estimados (~4 caracteres por token) de uma página."""
+        tamanho = len(texto.encode("utf-8"))
+        return tamanho, max(1, len(texto) // 4)
+
+    def admitir(self, texto):
+        """Bloqueia até haver folga e reserva o custo da página. Retorna o custo, a devolver em liberar()."""
+        bytes_pagina, tokens_pagina = self.estimar_custo(texto)
+        inicio = None
+        with self.condicao:
+            while self.paginas_em_voo and not self._ha_folga(bytes_pagina, tokens_pagina):
+                if inicio is None:
+                    inicio = time.perf_counter()
+                    self.esperas += 1
+                # Acordado por liberar() ou pelo tempo, para reamostrar a memória
+                self.condicao.wait(self.intervalo_amostragem)
+
+            self.bytes_em_voo += bytes_pagina
+            self.tokens_em_voo += tokens_pagina
+            self.paginas_em_voo += 1
+            self._publicar()
+
+        if inicio is not None:
+            espera = time.perf_counter() - inicio
+            self.tempo_espera += espera
+            self.metricas.incrementar("admissao_esperas_total")
+            self.metricas.observar("admissao_espera_segundos", espera)
+        return bytes_pagina, tokens_pagina
+
+    def liberar(self, custo):
+        bytes_pagina, tokens_pagina = custo
+        with self.condicao:
+            self.bytes_em_voo -= bytes_pagina
+            self.tokens_em_voo -= tokens_pagina
+            self.paginas_em_voo -= 1
+            self._publicar()
+            self.condicao.notify_all()
+
+    def _ha_folga(self, bytes_pagina, tokens_pagina):
+        if self.max_bytes_em_voo is not None and self.bytes_em_voo + bytes_pagina > self.max_bytes_em_voo:
+            return False
+        if self.max_tokens_em_voo is not None and self.tokens_em_voo + tokens_pagina > self.max_tokens_em_voo:
+            return False
+        return not self._memoria_excedida_amostrada()
+
+    def _memoria_excedida_amostrada(self):
+        if self.max_rss_bytes is None and self.max_vram_bytes is None:
+            return False
+        agora = time.monotonic()
+        if self._memoria_excedida is None or agora - self._ultima_amostra >= self.intervalo_amostragem:
+            self._ultima_amostra = agora
+            self._memoria_excedida = self._medir_memoria_excedida()
+        return self._memoria_excedida
+
+    def _medir_memoria_excedida(self):
+        if self.max_rss_bytes is not None:
+            rss = Metricas.rss_atual()
+            if rss is not None and rss > self.max_rss_bytes:
+                return True
+        if self.max_vram_bytes is not None:
+            vram = self.vram_em_uso()
+            if vram is not None and vram > self.max_vram_bytes:
+                return True
+        return False
+
+    def vram_em_uso(self):
+        """VRAM usada na GPU 0 via NVML (None sem GPU NVIDIA ou sem o pacote pynvml)."""
+        try:
+            if self._nvml is None:
+                import pynvml
+                pynvml.nvmlInit()
+                self._nvml = (pynvml, pynvml.nvmlDeviceGetHandleByIndex(0))
+            pynvml, dispositivo = self._nvml
+            return pynvml.nvmlDeviceGetMemoryInfo(dispositivo).used
+        except Exception:
+            if self._nvml is None:
+                self.logger.warning("⚠️ VRAM indisponível (pynvml/NVIDIA); orçamento de VRAM ignorado.")
+                self.max_vram_bytes = None
+            return None
+
+    def _publicar(self):
+        self.metricas.definir("admissao_bytes_em_voo", self.bytes_em_voo)
+        self.metricas.definir("admissao_tokens_em_voo", self.tokens_em_voo)
+        self.metricas.definir("admissao_paginas_em_voo", self.paginas_em_voo)
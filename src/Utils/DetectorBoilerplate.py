@@ -0,0 +1,92 @@
+import re
+from collections import Counter
+
+class DetectorBoilerplate:
+    """
+    Pré-passada sobre os blocos do documento inteiro: conta, por zona da página
+    (topo, corpo, rodapé), os blocos de texto normalizado que se repetem.
+    Cabeçalhos correntes, rodapés, números de página e faixas de capítulo aparecem
+    em muitas páginas e são removidos antes da tradução.
+    """
+
+    RE_DIGITOS = re.compile(r'\d+')
+    RE_ROMANO = re.compile(r'^[ivxlcdm]+$')
+    RE_ESPACOS = re.compile(r'\s+')
+
+    def __init__(self, margem_topo=0.12, margem_rodape=0.12, min_paginas=4, fracao_margem=0.05,
+                 fracao_corpo=0.5, paginas_minimas_documento=6):
+        # Faixas (fração da altura) onde ficam cabeçalhos e rodapés
+        self.margem_topo = margem_topo
+        self.margem_rodape = margem_rodape
+        # Nas margens basta repetir em poucas páginas; no corpo, só marcas d'água (metade do livro)
+        self.min_paginas = min_paginas
+        self.fracao_margem = fracao_margem
+        self.fracao_corpo = fracao_corpo
+        self.paginas_minimas_documento = paginas_minimas_documento
+        self.frequencias = Counter()
+        self.paginas_analisadas = 0
+        self.recorrentes = frozenset()
+
+    @staticmethod
+    def normalizar(texto):
+        """Minúsculas, números (arábicos e romanos) como '#' e espaços colapsados."""
+        texto = DetectorBoilerplate.RE_ESPACOS.sub(' ', texto.lower()).strip()
+        if DetectorBoilerplate.RE_ROMANO.match(texto):
+            return '#'
+        return DetectorBoilerplate.RE_DIGITOS.sub('#', texto)
+
+    def zona(self, bloco, altura):
+        y0, y1 = bloco[1], bloco[3]
+        if y1 <= altura * self.margem_topo:
+            return "topo"
+        if y0 >= altura * (1 - self.margem_rodape):
+            return "rodape"
+        return "corpo"
+
+    def chaves_pagina(self, blocos, altura):
+        return {(self.zona(b, altura), self.normalizar(b[4])) for b in blocos if b[4].strip()}
+
+    def observar(self, blocos, altura):
+        """Conta cada (zona, texto normalizado) uma vez por página."""
+        self.registrar(self.chaves_pagina(blocos, altura))
+
+    def registrar(self, chaves):
+        """Conta as chaves de uma página já calculadas (ex.: por chaves_pagina num processo de extração)."""
+        self.frequencias.update(chaves)
+        self.paginas_analisadas += 1
+
+    def consolidar(self):
+        """Fecha a contagem e define os blocos recorrentes. Retorna a quantidade encontrada."""
+        if self.paginas_analisadas < self.paginas_minimas_documento:
+            self.recorrentes = frozenset()
+            return 0
+
+        limite_margem = max(self.min_paginas, self.fracao_margem * self.paginas_analisadas)
+        limite_corpo = max(self.min_paginas, self.fracao_corpo * self.paginas_analisadas)
+        self.recorrentes = frozenset(
+            chave for chave, vezes in self.frequencias.items()
+            if vezes >= (limite_corpo if chave[0] == "corpo" else limite_margem)
+        )
+        # A contagem não é mais necessária (e o detector viaja para os processos de extração)
+        self.frequencias = Counter()
+        return len(self.recorrentes)
+
+    def restaurar(self, recorrentes):
+        """Usa blocos recorrentes já consolidados em outra pré-passada (ex.: a do plano de fatias)."""
+        self.frequencias = Counter()
+        self.recorrentes = frozenset(tuple(chave) for chave in recorrentes)
+
+    @property
+    def ativo(self):
+        return bool(self.recorrentes)
+
+    def filtrar(self, blocos, altura):
+        """Retorna (blocos mantidos, caracteres removidos)."""
+        mantidos = []
+        removidos = 0
+        for b in blocos:
+            if b[4].strip() and (self.zona(b, altura), self.normalizar(b[4])) in self.recorrentes:
+                removidos += len(b[4])
+            else:
+                mantidos.append(b)
+        return mantidos, removidos
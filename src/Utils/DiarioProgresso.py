@@ -0,0 +1,83 @@
+import os
+import json
+import hashlib
+import logging
+import threading
+
+class DiarioProgresso:
+    """
+    Diário append-only (JSONL) das páginas concluídas.
+    Cada linha guarda o hash do texto de origem e o conteúdo final da página,
+    permitindo retomar um processamento interrompido sem refazer trabalho.
+    """
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.lock = threading.Lock()
+        self.paginas = {}
+        self._carregar()
+
+    @staticmethod
+    def calcular_hash(texto):
+        return hashlib.sha256((texto or "").encode("utf-8")).hexdigest()
+
+    def _carregar(self):
+        if not os.path.exists(self.caminho):
+            return
+
+        descartadas = 0
+        with open(self.caminho, "r", encoding="utf-8") as f:
+            for linha in f:
+                try:
+                    registro = json.loads(linha)
+                except json.JSONDecodeError:
+                    # Última linha truncada por uma queda no meio da escrita
+                    descartadas += 1
+                    continue
+
+                conteudo = registro.get("conteudo")
+                if conteudo is not None and self.calcular_hash(conteudo) != registro.get("hash_conteudo"):
+                    descartadas += 1
+                    continue
+                self.paginas[registro["pagina"]] = registro
+
+        self.logger.info(f"📓 Diário carregado: {len(self.paginas)} páginas concluídas ({descartadas} registros inválidos).")
+
+    def concluida(self, numero_pagina, hash_origem):
+        registro = self.paginas.get(numero_pagina)
+        return registro is not None and registro.get("hash_origem") == hash_origem
+
+    def conteudo(self, numero_pagina):
+        registro = self.paginas.get(numero_pagina)
+        return registro["conteudo"] if registro else None
+
+    def pendentes(self, hashes_origem):
+        """
+        Páginas, entre as informadas ({número: hash do texto de origem}), sem registro no diário
+        para esse hash: as que faltam e as registradas a partir de outro texto de origem.
+        """
+        with self.lock:
+            return [n for n, h in hashes_origem.items() if self.paginas.get(n, {}).get("hash_origem") != h]
+
+    def registrar(self, numero_pagina, hash_origem, conteudo):
+        """Registra a página concluída. conteudo=None indica página descartada."""
+        registro = {
+            "pagina": numero_pagina,
+            "hash_origem": hash_origem,
+            "hash_conteudo": self.calcular_hash(conteudo) if conteudo is not None else None,
+            "conteudo": conteudo
+        }
+        linha = json.dumps(registro, ensure_ascii=False) + "\n"
+        with self.lock:
+            with open(self.caminho, "a", encoding="utf-8") as f:
+                f.write(linha)
+                f.flush()
+                os.fsync(f.fileno())
+            self.paginas[numero_pagina] = registro
+
+    def limpar(self):
+        with self.lock:
+            self.paginas = {}
+            if os.path.exists(self.caminho):
+                os.remove(self.caminho)
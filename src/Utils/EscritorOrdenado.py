@@ -0,0 +1,112 @@
+import os
+import queue
+import logging
+import threading
+import time
+
+class EscritorMarkdownOrdenado:
+    """
+    Estágio único de escrita do Markdown.
+    As páginas chegam na ordem em que terminam, ficam num buffer de reordenação
+    e são gravadas estritamente na ordem de reserva (ordem de leitura do PDF),
+    usando um único arquivo aberto e escritas em lote.
+
+    Políticas de fsync:
+        "nunca" -> apenas flush no fechamento
+        "final" -> fsync uma vez, no fechamento
+        "lote"  -> fsync após cada lote gravado
+    """
+
+    POLITICAS_FSYNC = ("nunca", "final", "lote")
+    _FIM = object()
+
+    def __init__(self, caminho, cabecalho="", politica_fsync="final", tamanho_lote=16, metricas=None):
+        if politica_fsync not in self.POLITICAS_FSYNC:
+            raise ValueError(f"Política de fsync inválida: {politica_fsync}")
+
+        self.caminho = caminho
+        self.politica_fsync = politica_fsync
+        self.tamanho_lote = tamanho_lote
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.fila = queue.Queue()
+        self.paginas_gravadas = 0
+        self.tempo_ocupado = 0.0
+        # Instante (perf_counter) da primeira gravação de página
+        self.primeira_gravacao = None
+        self.metricas = metricas
+        # Páginas prontas esperando uma anterior (tamanho do buffer de reordenação)
+        self.pendentes = 0
+
+        self.arquivo = open(caminho, "w", encoding="utf-8", buffering=1024 * 1024)
+        self.arquivo.write(cabecalho)
+
+        self.thread = threading.Thread(target=self._executar, name="EscritorMarkdown", daemon=True)
+        self.thread.start()
+
+    def reservar(self, numero_pagina):
+        """Registra a posição da página na ordem final. Deve ser chamado na ordem do PDF."""
+        self.fila.put(("reserva", numero_pagina, None))
+
+    def entregar(self, numero_pagina, texto):
+        """Entrega a página formatada. texto=None marca a página como descartada."""
+        self.fila.put(("entrega", numero_pagina, texto))
+
+    def fechar(self):
+        self.fila.put(self._FIM)
+        self.thread.join()
+
+    def _executar(self):
+        ordem = []          # números de página reservados, na ordem de leitura
+        proxima = 0         # índice em 'ordem' da próxima página a gravar
+        pendentes = {}      # buffer de reordenação: numero_pagina -> texto
+        lote = []
+
+        while True:
+            mensagem = self.fila.get()
+            if mensagem is self._FIM:
+                break
+
+            tipo, numero_pagina, texto = mensagem
+            if tipo == "reserva":
+                ordem.append(numero_pagina)
+            else:
+                pendentes[numero_pagina] = texto
+
+            while proxima < len(ordem) and ordem[proxima] in pendentes:
+                texto_pronto = pendentes.pop(ordem[proxima])
+                if texto_pronto is not None:
+                    lote.append(texto_pronto)
+                    self.paginas_gravadas += 1
+                proxima += 1
+            self.pendentes = len(pendentes)
+
+            # Grava quando o lote enche ou quando não há mais nada a caminho
+            if lote and (len(lote) >= self.tamanho_lote or self.fila.empty()):
+                self._gravar_lote(lote)
+                lote = []
+
+        if lote:
+            self._gravar_lote(lote)
+        if proxima < len(ordem):
+            self.logger.warning(f"⚠️ {len(ordem) - proxima} páginas reservadas não foram entregues ao escritor.")
+
+        self.arquivo.flush()
+        if self.politica_fsync != "nunca":
+            os.fsync(self.arquivo.fileno())
+        self.arquivo.close()
+
+    def _gravar_lote(self, lote):
+        inicio = time.perf_counter()
+        self.arquivo.write("".join(lote))
+        if self.primeira_gravacao is None:
+            self.primeira_gravacao = time.perf_counter()
+        if self.politica_fsync == "lote":
+            self.arquivo.flush()
+            os.fsync(self.arquivo.fileno())
+        duracao = time.perf_counter() - inicio
+        self.tempo_ocupado += duracao
+        if self.metricas:
+            for _ in lote:
+                self.metricas.observar("estagio_latencia_segundos", duracao / len(lote), estagio="escrita")
+            self.metricas.incrementar("estagio_itens_total", len(lote), estagio="escrita")
+            self.metricas.incrementar("caracteres_total", sum(len(texto) for texto in lote), estagio="escrita")
@@ -0,0 +1,230 @@
+import os
+import re
+import time
+import zlib
+import struct
+import sqlite3
+import hashlib
+import logging
+import threading
+from src.Utils.Metricas import Metricas
+
+class MemoriaTraducao:
+    """
+    Memória de tradução: pares de parágrafos (original -> tradução final) de páginas já concluídas.
+    Parágrafos idênticos são reaproveitados direto; os quase idênticos são encontrados por
+    MinHash com LSH (bandas da assinatura indexadas no SQLite) e viram uma edição curta no LLM,
+    em vez de uma passada completa de Argos + refino.
+    """
+
+    RE_ESPACOS = re.compile(r'\s+')
+    RE_PALAVRA = re.compile(r'\w+')
+    DESLOCAMENTO = 0x9E3779B97F4A7C15
+
+    def __init__(self, caminho_db="cache/memoria_traducao.sqlite", compartimentos=64, bandas=16, tamanho_shingle=3,
+                 limiar_proximo=0.8, min_caracteres=40, max_candidatos=32, metricas=None, timeout=30.0):
+        if compartimentos % bandas:
+            raise ValueError("O número de compartimentos deve ser múltiplo do número de bandas.")
+        self.caminho_db = caminho_db
+        self.compartimentos = compartimentos
+        self.bandas = bandas
+        self.linhas_banda = compartimentos // bandas
+        self.tamanho_shingle = tamanho_shingle
+        # Similaridade de Jaccard (estimada) mínima para tratar como quase idêntico
+        self.limiar_proximo = limiar_proximo
+        # Parágrafos curtos (títulos, legendas) não entram: pouco ganho e muitos falsos parecidos
+        self.min_caracteres = min_caracteres
+        self.max_candidatos = max_candidatos
+        self.metricas = metricas or Metricas.padrao()
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.lock = threading.Lock()
+        self.formato_assinatura = f"<{compartimentos}Q"
+
+        self.estatisticas = {"exatos": 0, "proximos": 0, "ausentes": 0, "indexados": 0, "tempo_busca": 0.0}
+
+        pasta = os.path.dirname(caminho_db)
+        if pasta and not os.path.exists(pasta):
+            os.makedirs(pasta)
+
+        # Compartilhada entre processos (execução fatiada): escritas esperam pelo bloqueio até 'timeout' segundos
+        self.conexao = sqlite3.connect(caminho_db, timeout=timeout, check_same_thread=False)
+        self.conexao.execute("PRAGMA journal_mode=WAL")
+        self.conexao.execute("PRAGMA synchronous=NORMAL")
+        self.conexao.execute(
+            "CREATE TABLE IF NOT EXISTS pares ("
+            "id INTEGER PRIMARY KEY, chave TEXT UNIQUE NOT NULL, original TEXT NOT NULL, "
+            "traducao TEXT NOT NULL, assinatura BLOB NOT NULL, usos INTEGER NOT NULL DEFAULT 0, "
+            "atualizado_em REAL NOT NULL)"
+        )
+        self.conexao.execute("CREATE TABLE IF NOT EXISTS bandas (chave_banda INTEGER NOT NULL, par_id INTEGER NOT NULL)")
+        self.conexao.execute("CREATE INDEX IF NOT EXISTS idx_bandas_chave ON bandas(chave_banda)")
+        self.conexao.commit()
+
+    @staticmethod
+    def normalizar(texto):
+        return MemoriaTraducao.RE_ESPACOS.sub(' ', texto).strip()
+
+    @staticmethod
+    def gerar_chave(texto):
+        return hashlib.sha256(MemoriaTraducao.normalizar(texto).encode("utf-8")).hexdigest()
+
+    def _shingles(self, texto):
+        """Hashes de 64 bits dos n-gramas de palavras em minúsculas."""
+        palavras = self.RE_PALAVRA.findall(texto.lower())
+        n = min(self.tamanho_shingle, len(palavras))
+        return {
+            int.from_bytes(hashlib.blake2b(" ".join(palavras[i:i + n]).encode("utf-8"), digest_size=8).digest(), "little")
+            for i in range(len(palavras) - n + 1)
+        }
+
+    def assinatura(self, texto):
+        """
+        Assinatura MinHash por permutação única: cada shingle cai num dos 'compartimentos'
+        (pelo próprio hash) e fica o menor valor de cada um (uma passada, em vez de uma por permutação).
+        Compartimentos vazios copiam o próximo preenchido (densificação por rotação).
+        """
+        shingles = self._shingles(texto)
+        if not shingles:
+            return None
+        k = self.compartimentos
+        minimos = [None] * k
+        for h in shingles:
+            compartimento, valor = h % k, h // k
+            if minimos[compartimento] is None or valor < minimos[compartimento]:
+                minimos[compartimento] = valor
+
+        assinatura = list(minimos)
+        for i in range(k):
+            if assinatura[i] is None:
+                distancia = 1
+                while minimos[(i + distancia) % k] is None:
+                    distancia += 1
+                # O deslocamento pela distância evita que vazios vizinhos fiquem iguais por acaso
+                assinatura[i] = (minimos[(i + distancia) % k] + distancia * self.DESLOCAMENTO) % (1 << 64)
+        return assinatura
+
+    def _chaves_bandas(self, assinatura):
+        """Uma chave inteira por banda: (número da banda, CRC32 das linhas da banda)."""
+        chaves = []
+        for banda in range(self.bandas):
+            linhas = assinatura[banda * self.linhas_banda:(banda + 1) * self.linhas_banda]
+            chaves.append((banda << 32) | zlib.crc32(struct.pack(f"<{len(linhas)}Q", *linhas)))
+        return chaves
+
+    @staticmethod
+    def similaridade(assinatura_a, assinatura_b):
+        """Jaccard estimado: fração dos compartimentos com o mesmo mínimo."""
+        return sum(1 for x, y in zip(assinatura_a, assinatura_b) if x == y) / len(assinatura_a)
+
+    def buscar(self, texto):
+        """
+        Procura o parágrafo na memória. Retorna None ou um dict com 'tipo' ("exato" ou "proximo"),
+        'original' e 'traducao' do par encontrado e a 'similaridade'.
+        """
+        if len(texto.strip()) < self.min_caracteres:
+            return None
+
+        inicio = time.perf_counter()
+        resultado = self._buscar(texto)
+        duracao = time.perf_counter() - inicio
+
+        tipo = resultado["tipo"] if resultado else "ausente"
+        with self.lock:
+            self.estatisticas["tempo_busca"] += duracao
+            self.estatisticas[tipo + "s"] += 1
+        self.metricas.observar("memoria_traducao_busca_segundos", duracao)
+        self.metricas.incrementar("memoria_traducao_buscas_total", resultado=tipo)
+        return resultado
+
+    def _buscar(self, texto):
+        with self.lock:
+            linha = self.conexao.execute("SELECT id, original, traducao FROM pares WHERE chave = ?", (self.gerar_chave(texto),)).fetchone()
+        if linha:
+            self._registrar_uso(linha[0])
+            return {"tipo": "exato", "original": linha[1], "traducao": linha[2], "similaridade": 1.0}
+
+        assinatura = self.assinatura(texto)
+        if assinatura is None:
+            return None
+
+        chaves = self._chaves_bandas(assinatura)
+        with self.lock:
+            # Os candidatos com mais bandas em comum primeiro: o limite corta os menos parecidos
+            candidatos = self.conexao.execute(
+                f"SELECT p.id, p.original, p.traducao, p.assinatura FROM pares p JOIN ("
+                f"SELECT par_id, COUNT(*) AS comuns FROM bandas WHERE chave_banda IN ({','.join('?' * len(chaves))}) "
+                f"GROUP BY par_id ORDER BY comuns DESC LIMIT ?) c ON c.par_id = p.id",
+                (*chaves, self.max_candidatos)
+            ).fetchall()
+
+        melhor = None
+        for id_par, original, traducao, blob in candidatos:
+            similaridade = self.similaridade(assinatura, struct.unpack(self.formato_assinatura, blob))
+            if similaridade >= self.limiar_proximo and (melhor is None or similaridade > melhor["similaridade"]):
+                melhor = {"tipo": "proximo", "original": original, "traducao": traducao, "similaridade": similaridade, "id": id_par}
+
+        if melhor:
+            self._registrar_uso(melhor.pop("id"))
+        return melhor
+
+    def _registrar_uso(self, id_par):
+        # Só estatística: com o banco ocupado, o acerto vale mesmo sem a contagem
+        with self.lock:
+            try:
+                self.conexao.execute("UPDATE pares SET usos = usos + 1 WHERE id = ?", (id_par,))
+                self.conexao.commit()
+            except sqlite3.OperationalError as e:
+                self.conexao.rollback()
+                self.logger.debug(f"Uso do par {id_par} não registrado: {e}")
+
+    def indexar(self, original, traducao):
+        """Grava (ou atualiza) um par. Retorna True se o parágrafo foi indexado."""
+        if len(original.strip()) < self.min_caracteres or not traducao.strip():
+            return False
+        assinatura = self.assinatura(original)
+        if assinatura is None:
+            return False
+
+        chave = self.gerar_chave(original)
+        with self.lock:
+            linha = self.conexao.execute("SELECT id FROM pares WHERE chave = ?", (chave,)).fetchone()
+            if linha:
+                # Mesmo original: a tradução mais recente prevalece (as bandas não mudam)
+                self.conexao.execute("UPDATE pares SET traducao = ?, atualizado_em = ? WHERE id = ?", (traducao, time.time(), linha[0]))
+            else:
+                cursor = self.conexao.execute(
+                    "INSERT INTO pares (chave, original, traducao, assinatura, atualizado_em) VALUES (?, ?, ?, ?, ?)",
+                    (chave, original.strip(), traducao.strip(), struct.pack(self.formato_assinatura, *assinatura), time.time())
+                )
+                self.conexao.executemany(
+                    "INSERT INTO bandas (chave_banda, par_id) VALUES (?, ?)",
+                    [(chave_banda, cursor.lastrowid) for chave_banda in self._chaves_bandas(assinatura)]
+                )
+                self.estatisticas["indexados"] += 1
+            self.conexao.commit()
+        return True
+
+    def indexar_pagina(self, original, traducao):
+        """
+        Indexa os parágrafos de uma página finalizada. Só quando original e tradução têm
+        o mesmo número de parágrafos (senão o alinhamento par a par não é confiável).
+        Retorna a quantidade de pares indexados.
+        """
+        paragrafos_original = original.split("\n\n")
+        paragrafos_traducao = traducao.split("\n\n")
+        if len(paragrafos_original) != len(paragrafos_traducao):
+            return 0
+        return sum(1 for o, t in zip(paragrafos_original, paragrafos_traducao) if self.indexar(o, t))
+
+    def relatorio(self):
+        with self.lock:
+            buscas = self.estatisticas["exatos"] + self.estatisticas["proximos"] + self.estatisticas["ausentes"]
+            return dict(
+                self.estatisticas,
+                buscas=buscas,
+                busca_media=(self.estatisticas["tempo_busca"] / buscas) if buscas else 0.0
+            )
+
+    def fechar(self):
+        with self.lock:
+            self.conexao.close()
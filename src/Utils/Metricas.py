@@ -0,0 +1,208 @@
+import os
+import json
+import time
+import logging
+import threading
+from contextlib import contextmanager
+
+class Metricas:
+    """
+    Registro de métricas em memória: contadores, histogramas e medidores (gauges),
+    identificados por nome e rótulos. Seguro para várias threads.
+    Exporta no formato texto do Prometheus ou como uma linha JSON por coleta.
+    """
+
+    # Limites dos baldes (segundos) dos histogramas de latência
+    BALDES_PADRAO = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+    _padrao = None
+    _lock_padrao = threading.Lock()
+
+    def __init__(self, prefixo="tradutor"):
+        self.prefixo = prefixo
+        self.lock = threading.Lock()
+        self.contadores = {}
+        self.medidores = {}
+        self.histogramas = {}
+        self.coletores = []
+
+    @classmethod
+    def padrao(cls):
+        """Instância compartilhada pelos serviços (como o logging.getLogger)."""
+        with cls._lock_padrao:
+            if cls._padrao is None:
+                cls._padrao = cls()
+            return cls._padrao
+
+    @staticmethod
+    def _chave(nome, rotulos):
+        return nome, tuple(sorted(rotulos.items()))
+
+    def incrementar(self, nome, valor=1, **rotulos):
+        chave = self._chave(nome, rotulos)
+        with self.lock:
+            self.contadores[chave] = self.contadores.get(chave, 0) + valor
+
+    def definir(self, nome, valor, **rotulos):
+        with self.lock:
+            self.medidores[self._chave(nome, rotulos)] = valor
+
+    def observar(self, nome, valor, **rotulos):
+        chave = self._chave(nome, rotulos)
+        with self.lock:
+            histograma = self.histogramas.get(chave)
+            if histograma is None:
+                histograma = self.histogramas[chave] = {"baldes": [0] * len(self.BALDES_PADRAO), "soma": 0.0, "contagem": 0}
+            for i, limite in enumerate(self.BALDES_PADRAO):
+                if valor <= limite:
+                    histograma["baldes"][i] += 1
+                    break
+            histograma["soma"] += valor
+            histograma["contagem"] += 1
+
+    @contextmanager
+    def cronometrar(self, nome, **rotulos):
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observar(nome, time.perf_counter() - inicio, **rotulos)
+
+    def registrar_coletor(self, coletor):
+        """Função chamada antes de cada exportação para atualizar medidores (fila, cache, RSS...)."""
+        with self.lock:
+            self.coletores.append(coletor)
+
+    def remover_coletor(self, coletor):
+        with self.lock:
+            if coletor in self.coletores:
+                self.coletores.remove(coletor)
+
+    def coletar(self):
+        with self.lock:
+            coletores = list(self.coletores)
+        for coletor in coletores:
+            try:
+                coletor(self)
+            except Exception as e:
+                logging.getLogger(self.__class__.__name__).debug(f"Coletor de métricas falhou: {e}")
+        rss = self.rss_atual()
+        if rss is not None:
+            self.definir("processo_rss_bytes", rss)
+
+    @staticmethod
+    def rss_atual():
+        """RSS atual do processo em bytes (None se a plataforma não informar)."""
+        try:
+            import psutil
+            return psutil.Process().memory_info().rss
+        except ImportError:
+            pass
+        try:
+            with open("/proc/self/statm") as f:
+                return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        except (OSError, ValueError, AttributeError):
+            return None
+
+    def instantaneo(self):
+        """Cópia dos valores atuais, com os rótulos como dicionário."""
+        with self.lock:
+            return {
+                "contadores": [{"nome": n, "rotulos": dict(r), "valor": v} for (n, r), v in self.contadores.items()],
+                "medidores": [{"nome": n, "rotulos": dict(r), "valor": v} for (n, r), v in self.medidores.items()],
+                "histogramas": [
+                    {"nome": n, "rotulos": dict(r), "soma": h["soma"], "contagem": h["contagem"],
+                     "baldes": dict(zip(map(str, self.BALDES_PADRAO), h["baldes"]))}
+                    for (n, r), h in self.histogramas.items()
+                ]
+            }
+
+    @staticmethod
+    def _rotulos_prometheus(rotulos, extra=None):
+        pares = list(rotulos) + (list(extra.items()) if extra else [])
+        if not pares:
+            return ""
+        return "{" + ",".join(f'{k}="{str(v)}"' for k, v in pares) + "}"
+
+    def formato_prometheus(self):
+        linhas = []
+        with self.lock:
+            for tipo, valores in (("counter", self.contadores), ("gauge", self.medidores)):
+                tipos_emitidos = set()
+                for (nome, rotulos), valor in sorted(valores.items()):
+                    nome_completo = f"{self.prefixo}_{nome}"
+                    if nome_completo not in tipos_emitidos:
+                        linhas.append(f"# TYPE {nome_completo} {tipo}")
+                        tipos_emitidos.add(nome_completo)
+                    linhas.append(f"{nome_completo}{self._rotulos_prometheus(rotulos)} {valor}")
+
+            tipos_emitidos = set()
+            for (nome, rotulos), h in sorted(self.histogramas.items()):
+                nome_completo = f"{self.prefixo}_{nome}"
+                if nome_completo not in tipos_emitidos:
+                    linhas.append(f"# TYPE {nome_completo} histogram")
+                    tipos_emitidos.add(nome_completo)
+                acumulado = 0
+                for limite, quantidade in zip(self.BALDES_PADRAO, h["baldes"]):
+                    acumulado += quantidade
+                    linhas.append(f"{nome_completo}_bucket{self._rotulos_prometheus(rotulos, {'le': limite})} {acumulado}")
+                linhas.append(f"{nome_completo}_bucket{self._rotulos_prometheus(rotulos, {'le': '+Inf'})} {h['contagem']}")
+                linhas.append(f"{nome_completo}_sum{self._rotulos_prometheus(rotulos)} {h['soma']}")
+                linhas.append(f"{nome_completo}_count{self._rotulos_prometheus(rotulos)} {h['contagem']}")
+        return "\n".join(linhas) + "\n"
+
+    def exportar(self, caminho, formato="prometheus"):
+        self.coletar()
+        pasta = os.path.dirname(caminho)
+        if pasta:
+            os.makedirs(pasta, exist_ok=True)
+
+        if formato == "prometheus":
+            # Troca atômica: o node_exporter (textfile collector) nunca lê um arquivo pela metade
+            temporario = caminho + ".tmp"
+            with open(temporario, "w", encoding="utf-8") as f:
+                f.write(self.formato_prometheus())
+            os.replace(temporario, caminho)
+        elif formato == "jsonl":
+            with open(caminho, "a", encoding="utf-8") as f:
+                f.write(json.dumps(dict(self.instantaneo(), momento=time.time()), ensure_ascii=False) + "\n")
+        else:
+            raise ValueError(f"Formato de métricas inválido: {formato}")
+
+
+class ExportadorMetricas:
+    """Thread que exporta as métricas a cada 'intervalo' segundos e uma última vez ao parar."""
+
+    def __init__(self, metricas, caminho, formato="prometheus", intervalo=15):
+        if formato not in ("prometheus", "jsonl"):
+            raise ValueError(f"Formato de métricas inválido: {formato}")
+        self.metricas = metricas
+        self.caminho = caminho
+        self.formato = formato
+        self.intervalo = intervalo
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self._parar = threading.Event()
+        self._thread = None
+
+    def iniciar(self):
+        self._parar.clear()
+        self._thread = threading.Thread(target=self._executar, name="exportador-metricas", daemon=True)
+        self._thread.start()
+        return self
+
+    def _executar(self):
+        while not self._parar.wait(self.intervalo):
+            self._exportar()
+
+    def _exportar(self):
+        try:
+            self.metricas.exportar(self.caminho, self.formato)
+        except Exception as e:
+            self.logger.warning(f"⚠️ Falha ao exportar métricas: {e}")
+
+    def parar(self):
+        self._parar.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self._exportar()
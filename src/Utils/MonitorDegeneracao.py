@@ -0,0 +1,83 @@
+import re
+
+class MonitorDegeneracao:
+    """
+    Acompanha a resposta do LLM enquanto os tokens chegam e aponta degeneração
+    (repetição, loop de pontos, eco do inglês, resposta longa demais) antes do fim da geração.
+    Os limiares seguem os de TextCleaner.calcular_confiabilidade.
+    """
+
+    RE_REPETICAO = re.compile(r'(\w{2,})\1{5,}')
+    # Palavras funcionais do inglês que não existem em português
+    PALAVRAS_INGLES = frozenset({
+        'the', 'of', 'and', 'to', 'in', 'is', 'that', 'with', 'for', 'this',
+        'are', 'it', 'be', 'on', 'by', 'which', 'from', 'was', 'were', 'have'
+    })
+
+    def __init__(self, original, intervalo=64, janela_repeticao=600, folga_pontos=30,
+                 razao_maxima=1.8, densidade_ingles=0.15, min_palavras=40):
+        self.tamanho_original = len(original.strip()) if original else 0
+        self.limite_pontos = (original.count('.') if original else 0) + folga_pontos
+        self.intervalo = intervalo
+        self.janela_repeticao = janela_repeticao
+        self.razao_maxima = razao_maxima
+        self.densidade_ingles = densidade_ingles
+        self.min_palavras = min_palavras
+
+        self.texto = ""
+        self.pontos = 0
+        self.palavras = 0
+        self.palavras_ingles = 0
+        self._verificado_ate = 0
+        self._palavras_ate = 0
+
+    def alimentar(self, pedaco):
+        """Acrescenta um pedaço da resposta. Retorna o motivo da degeneração ou None."""
+        self.texto += pedaco
+        self.pontos += pedaco.count('.')
+
+        if self.pontos > self.limite_pontos:
+            return "loop de pontos"
+        if self._tamanho_excedido():
+            return "resposta longa demais"
+
+        # As verificações por regex e por palavras rodam a cada 'intervalo' caracteres
+        if len(self.texto) - self._verificado_ate < self.intervalo:
+            return None
+        self._verificado_ate = len(self.texto)
+        return self._verificar_repeticao() or self._verificar_ingles()
+
+    def _tamanho_excedido(self):
+        if self.tamanho_original == 0:
+            return len(self.texto.strip()) >= 50
+        return len(self.texto) / self.tamanho_original > self.razao_maxima
+
+    def _verificar_repeticao(self):
+        if self.RE_REPETICAO.search(self.texto, max(0, len(self.texto) - self.janela_repeticao)):
+            return "repetição"
+        return None
+
+    def _verificar_ingles(self):
+        # Só palavras completas: a última pode ainda estar chegando
+        fim = max(self.texto.rfind(' '), self.texto.rfind('\n'))
+        if fim <= self._palavras_ate:
+            return None
+        for palavra in self.texto[self._palavras_ate:fim].lower().split():
+            self.palavras += 1
+            if palavra in self.PALAVRAS_INGLES:
+                self.palavras_ingles += 1
+        self._palavras_ate = fim
+
+        if self.palavras >= self.min_palavras and self.palavras_ingles / self.palavras > self.densidade_ingles:
+            return "eco do inglês"
+        return None
+
+
+class GeracaoAbortada(Exception):
+    """Geração interrompida pelo monitor; a resposta parcial é descartada."""
+
+    def __init__(self, motivo, tokens_gerados, tokens_economizados):
+        super().__init__(f"Geração abortada ({motivo}) após {tokens_gerados} tokens")
+        self.motivo = motivo
+        self.tokens_gerados = tokens_gerados
+        self.tokens_economizados = tokens_economizados
@@ -0,0 +1,151 @@
+import os
+import logging
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+def _preparar_tradutor_ct2(traducao):
+    """
+    Retorna a tradução do pacote Argos com o tradutor CTranslate2 carregado,
+    ou None se a versão instalada do Argos não expuser esses objetos.
+    """
+    traducao = getattr(traducao, "underlying", traducao) # Desembrulha CachedTranslation
+    pacote = getattr(traducao, "pkg", None)
+    if getattr(pacote, "tokenizer", None) is None or not hasattr(traducao, "translator"):
+        return None
+
+    if traducao.translator is None:
+        import ctranslate2
+        import argostranslate.settings
+        traducao.translator = ctranslate2.Translator(
+            str(pacote.package_path / "model"),
+            device=argostranslate.settings.device,
+            inter_threads=argostranslate.settings.inter_threads,
+            intra_threads=argostranslate.settings.intra_threads
+        )
+    return traducao
+
+def _traduzir_frases_em_lote(traducao, frases):
+    """
+    Traduz uma lista de frases numa única chamada batched ao CTranslate2,
+    reaproveitando o tokenizador e o tradutor do pacote Argos.
+    Sem acesso a esses objetos, traduz frase a frase.
+    """
+    traducao_ct2 = _preparar_tradutor_ct2(traducao)
+    if traducao_ct2 is None:
+        return [traducao.translate(f) for f in frases]
+
+    traducao = traducao_ct2
+    pacote = traducao.pkg
+    tokenizador = pacote.tokenizer
+    prefixo = getattr(pacote, "target_prefix", "")
+    tokens = [tokenizador.encode(f) for f in frases]
+    # Mesmos parâmetros de decodificação usados internamente pelo Argos
+    lotes = traducao.translator.translate_batch(
+        tokens,
+        target_prefix=[[prefixo]] * len(tokens) if prefixo else None,
+        replace_unknowns=True,
+        max_batch_size=32,
+        beam_size=4,
+        length_penalty=0.2
+    )
+
+    resultados = []
+    for lote in lotes:
+        texto = tokenizador.decode(lote.hypotheses[0])
+        if prefixo and texto.startswith(prefixo):
+            texto = texto[len(prefixo):]
+        resultados.append(texto.lstrip())
+    return resultados
+
+
+class MotorArgosLocal:
+    """
+    Motor padrão: traduz na própria thread chamadora, um texto por vez.
+    """
+    requer_pacote_argos = True
+
+    def __init__(self, from_code="en", to_code="pt"):
+        self.from_code = from_code
+        self.to_code = to_code
+        self._traducao = None
+        self._lock = threading.Lock()
+
+    def traduzir_lote(self, textos):
+        import argostranslate.translate
+        return [argostranslate.translate.translate(t, self.from_code, self.to_code) for t in textos]
+
+    def traduzir_frases(self, frases):
+        with self._lock:
+            if self._traducao is None:
+                import argostranslate.translate
+                traducao = argostranslate.translate.get_translation_from_codes(self.from_code, self.to_code)
+                self._traducao = _preparar_tradutor_ct2(traducao) or traducao
+        return _traduzir_frases_em_lote(self._traducao, frases)
+
+    def fechar(self):
+        pass
+
+
+# Estado de cada processo trabalhador: o modelo é carregado uma única vez no inicializador
+_traducao_processo = None
+
+def _inicializar_processo(from_code, to_code, inter_threads, intra_threads):
+    global _traducao_processo
+    # As variáveis precisam existir antes do import para valerem no CTranslate2
+    os.environ["ARGOS_INTER_THREADS"] = str(inter_threads)
+    os.environ["ARGOS_INTRA_THREADS"] = str(intra_threads)
+    os.environ["OMP_NUM_THREADS"] = str(intra_threads)
+
+    import argostranslate.settings
+    import argostranslate.translate
+    # Com 'fork' o módulo pode já ter sido importado pelo processo pai
+    argostranslate.settings.inter_threads = inter_threads
+    argostranslate.settings.intra_threads = intra_threads
+
+    _traducao_processo = argostranslate.translate.get_translation_from_codes(from_code, to_code)
+
+def _traduzir_no_processo(texto):
+    return _traducao_processo.translate(texto)
+
+def _traduzir_frases_no_processo(frases):
+    return _traduzir_frases_em_lote(_traducao_processo, frases)
+
+
+class MotorArgosProcessos:
+    """
+    Motor com N processos trabalhadores, cada um com o modelo en->pt residente.
+    Os chunks de várias páginas são distribuídos entre os processos e
+    devolvidos na ordem em que foram enviados.
+    """
+    requer_pacote_argos = True
+
+    def __init__(self, from_code="en", to_code="pt", num_processos=None, inter_threads=1, intra_threads=None):
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.from_code = from_code
+        self.to_code = to_code
+        self.num_processos = num_processos or os.cpu_count() or 1
+        # Divide os núcleos entre os processos para não haver sobreinscrição
+        self.intra_threads = intra_threads or max(1, (os.cpu_count() or 1) // self.num_processos)
+        self.inter_threads = inter_threads
+
+        self.logger.info(
+            f"🧵 Iniciando {self.num_processos} processos Argos "
+            f"(inter={self.inter_threads}, intra={self.intra_threads})..."
+        )
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.num_processos,
+            initializer=_inicializar_processo,
+            initargs=(from_code, to_code, self.inter_threads, self.intra_threads)
+        )
+
+    def traduzir_lote(self, textos):
+        return list(self.executor.map(_traduzir_no_processo, textos))
+
+    def traduzir_frases(self, frases):
+        # Um sub-lote contíguo por processo, cada um decodificado em batch
+        tamanho = max(1, -(-len(frases) // self.num_processos))
+        sublotes = [frases[i:i + tamanho] for i in range(0, len(frases), tamanho)]
+        return [f for traduzidas in self.executor.map(_traduzir_frases_no_processo, sublotes) for f in traduzidas]
+
+    def fechar(self):
+        self.executor.shutdown(wait=True)
@@ -0,0 +1,93 @@
+import math
+import re
+
+class OrcamentoTokens:
+    """
+    Orçamento de tokens para chamadas ao LLM, medido com o tokenizador do próprio modelo.
+    Define o max_tokens a partir do tamanho real da entrada e divide páginas densas
+    em segmentos que cabem no contexto (prompt + resposta <= n_ctx).
+    """
+
+    RE_FIM_FRASE = re.compile(r'(?<=[.!?:;])\s+')
+
+    def __init__(self, contar_tokens, n_ctx, razao_expansao=1.25, folga_saida=32, margem_contexto=16):
+        self.contar_tokens = contar_tokens
+        self.n_ctx = n_ctx
+        self.razao_expansao = razao_expansao
+        self.folga_saida = folga_saida
+        self.margem_contexto = margem_contexto
+
+    def max_tokens_saida(self, tokens_referencia):
+        """A resposta esperada tem o tamanho da referência, com uma expansão curta."""
+        return math.ceil(tokens_referencia * self.razao_expansao) + self.folga_saida
+
+    def _custo(self, tokens_fixos, tokens_entradas, tokens_referencia):
+        return tokens_fixos + tokens_entradas + self.max_tokens_saida(tokens_referencia) + self.margem_contexto
+
+    def segmentar(self, tokens_fixos, *textos):
+        """
+        Divide textos paralelos (ex.: original e tradução) em segmentos alinhados que cabem no contexto.
+        O último texto é a referência de tamanho da resposta.
+        Retorna, por segmento, a tupla de trechos, os tokens da referência e o total de tokens dos trechos.
+        """
+        tokens = [self.contar_tokens(t) for t in textos]
+        if self._custo(tokens_fixos, sum(tokens), tokens[-1]) <= self.n_ctx:
+            return [(textos, tokens[-1], sum(tokens))]
+
+        disponivel = self.n_ctx - tokens_fixos - self.margem_contexto - self.folga_saida
+        if disponivel <= 0:
+            raise ValueError("O prompt fixo não cabe no contexto do modelo.")
+
+        # Quantidade inicial de partes pela proporção; aumenta até todas caberem
+        partes = max(2, math.ceil((sum(tokens) + tokens[-1] * self.razao_expansao) / disponivel))
+        limite_partes = max(len(t) for t in textos) // 20 + 2
+        while True:
+            divididos = [self._dividir(texto, partes) for texto in textos]
+            segmentos = []
+            cabe = True
+            for grupo in zip(*divididos):
+                tokens_grupo = [self.contar_tokens(t) for t in grupo]
+                cabe = cabe and self._custo(tokens_fixos, sum(tokens_grupo), tokens_grupo[-1]) <= self.n_ctx
+                segmentos.append((grupo, tokens_grupo[-1], sum(tokens_grupo)))
+
+            # Se nem fatiando em trechos de ~20 caracteres couber, devolve o melhor possível
+            if cabe or partes >= limite_partes:
+                return segmentos
+            partes = min(limite_partes, partes + max(1, partes // 2))
+
+    def _dividir(self, texto, partes):
+        """
+        Divide o texto em 'partes' trechos de tamanho parecido. Prefere limites de
+        parágrafo, depois de frase, e por fim de palavra.
+        """
+        cortes = []
+        inicio = 0
+        for i in range(1, partes):
+            alvo = round(len(texto) * i / partes)
+            corte = self._melhor_corte(texto, max(alvo, inicio), inicio)
+            cortes.append(corte)
+            inicio = corte
+
+        trechos = []
+        anterior = 0
+        for corte in cortes + [len(texto)]:
+            trechos.append(texto[anterior:corte].strip())
+            anterior = corte
+        return trechos
+
+    def _melhor_corte(self, texto, alvo, minimo):
+        janela = max(200, len(texto) // 20)
+        # 1. Quebra de parágrafo próxima
+        candidato = texto.rfind("\n\n", minimo, alvo + janela)
+        if candidato != -1 and candidato > alvo - janela:
+            return candidato
+        # 2. Fim de frase próximo
+        melhor = None
+        for m in self.RE_FIM_FRASE.finditer(texto, max(minimo, alvo - janela), min(len(texto), alvo + janela)):
+            if melhor is None or abs(m.end() - alvo) < abs(melhor - alvo):
+                melhor = m.end()
+        if melhor is not None:
+            return melhor
+        # 3. Espaço mais próximo (ou o próprio alvo, se a palavra for gigante)
+        espaco = texto.rfind(" ", minimo, alvo + 1)
+        return espaco if espaco > minimo else alvo
@@ -0,0 +1,191 @@
+import queue
+import logging
+import threading
+import time
+
+_FIM = object()
+
+def percentis(valores, pontos=(50, 95, 99)):
+    """Percentis por posição mais próxima (valores em segundos)."""
+    if not valores:
+        return {f"p{p}": 0.0 for p in pontos}
+    ordenados = sorted(valores)
+    return {f"p{p}": ordenados[min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))] for p in pontos}
+
+class Estagio:
+    """
+    Etapa do pipeline: N threads consumindo uma fila limitada de entrada
+    e repassando o resultado para a fila do próximo estágio.
+    Se a função retornar None, o item é consumido e não segue adiante.
+
+    Com tamanho_lote > 1, a função recebe uma lista com os itens já disponíveis
+    na fila (até o tamanho do lote, sem esperar por mais) e retorna uma lista de resultados.
+    """
+
+    def __init__(self, nome, funcao, concorrencia=1, capacidade_fila=4, ao_falhar=None, tamanho_lote=1, metricas=None):
+        self.nome = nome
+        self.funcao = funcao
+        self.concorrencia = max(1, concorrencia)
+        self.tamanho_lote = max(1, tamanho_lote)
+        self.fila_entrada = queue.Queue(maxsize=capacidade_fila)
+        self.ao_falhar = ao_falhar
+        self.metricas = metricas
+        self.logger = logging.getLogger(f"Estagio.{nome}")
+        self.lock = threading.Lock()
+        self.tempo_ocupado = 0.0
+        self.itens = 0
+        self.falhas = 0
+        # Duração de cada chamada da função (um lote conta como uma chamada)
+        self.latencias = []
+        self._ativos = 0
+        self._threads = []
+        self._fila_saida = None
+
+    def iniciar(self, fila_saida):
+        self._fila_saida = fila_saida
+        self._ativos = self.concorrencia
+        for i in range(self.concorrencia):
+            t = threading.Thread(target=self._trabalhar, name=f"{self.nome}-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def aguardar(self):
+        for t in self._threads:
+            t.join()
+
+    def _coletar_lote(self, primeiro):
+        lote = [primeiro]
+        while len(lote) < self.tamanho_lote:
+            try:
+                item = self.fila_entrada.get_nowait()
+            except queue.Empty:
+                break
+            if item is _FIM:
+                self.fila_entrada.put(_FIM)
+                break
+            lote.append(item)
+        return lote
+
+    def _trabalhar(self):
+        while True:
+            item = self.fila_entrada.get()
+            if item is _FIM:
+                with self.lock:
+                    self._ativos -= 1
+                    ultimo = self._ativos == 0
+                if ultimo:
+                    if self._fila_saida is not None:
+                        self._fila_saida.put(_FIM)
+                else:
+                    # Devolve o sinal de fim para as demais threads do estágio
+                    self.fila_entrada.put(_FIM)
+                return
+
+            lote = self._coletar_lote(item) if self.tamanho_lote > 1 else [item]
+            inicio = time.perf_counter()
+            resultados = []
+            try:
+                resultados = self.funcao(lote) if self.tamanho_lote > 1 else [self.funcao(item)]
+            except Exception as e:
+                self.logger.error(f"❌ Falha no estágio '{self.nome}': {e}")
+                with self.lock:
+                    self.falhas += len(lote)
+                if self.metricas:
+                    self.metricas.incrementar("estagio_falhas_total", len(lote), estagio=self.nome)
+                if self.ao_falhar:
+                    for falho in lote:
+                        self.ao_falhar(falho, e)
+            finally:
+                duracao = time.perf_counter() - inicio
+                with self.lock:
+                    self.tempo_ocupado += duracao
+                    self.itens += len(lote)
+                    self.latencias.append(duracao)
+                if self.metricas:
+                    # Num lote, o tempo é rateado entre as páginas
+                    for _ in lote:
+                        self.metricas.observar("estagio_latencia_segundos", duracao / len(lote), estagio=self.nome)
+                    self.metricas.incrementar("estagio_itens_total", len(lote), estagio=self.nome)
+
+            if self._fila_saida is not None:
+                for resultado in resultados:
+                    if resultado is not None:
+                        self._fila_saida.put(resultado)
+
+
+class Pipeline:
+    """
+    Encadeia uma fonte (iterável consumido numa thread própria) e estágios
+    conectados por filas limitadas, de modo que etapas de CPU e GPU se sobreponham.
+    """
+
+    def __init__(self, nome_fonte, fonte, estagios, metricas=None):
+        self.nome_fonte = nome_fonte
+        self.fonte = fonte
+        self.estagios = estagios
+        self.metricas = metricas
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.tempo_fonte = 0.0
+        self.itens_fonte = 0
+        self.latencias_fonte = []
+        self.duracao = 0.0
+
+    def executar(self):
+        inicio = time.perf_counter()
+
+        for atual, proximo in zip(self.estagios, self.estagios[1:] + [None]):
+            atual.iniciar(proximo.fila_entrada if proximo else None)
+
+        primeira_fila = self.estagios[0].fila_entrada
+        iterador = iter(self.fonte)
+        try:
+            while True:
+                t0 = time.perf_counter()
+                try:
+                    item = next(iterador)
+                except StopIteration:
+                    break
+                finally:
+                    duracao_item = time.perf_counter() - t0
+                    self.tempo_fonte += duracao_item
+                    self.latencias_fonte.append(duracao_item)
+                self.itens_fonte += 1
+                if self.metricas:
+                    self.metricas.observar("estagio_latencia_segundos", duracao_item, estagio=self.nome_fonte)
+                    self.metricas.incrementar("estagio_itens_total", 1, estagio=self.nome_fonte)
+                # Bloqueia quando o primeiro estágio está cheio (contrapressão)
+                primeira_fila.put(item)
+        finally:
+            primeira_fila.put(_FIM)
+            for estagio in self.estagios:
+                estagio.aguardar()
+            self.duracao = time.perf_counter() - inicio
+
+        return self.relatorio()
+
+    def profundidade_filas(self):
+        """Itens aguardando na fila de entrada de cada estágio."""
+        return {estagio.nome: estagio.fila_entrada.qsize() for estagio in self.estagios}
+
+    def relatorio(self):
+        """Itens, tempo ocupado, utilização (tempo ocupado / tempo disponível) e percentis de latência por estágio."""
+        duracao = max(self.duracao, 1e-9)
+        relatorio = {
+            self.nome_fonte: {
+                "itens": self.itens_fonte,
+                "concorrencia": 1,
+                "tempo_ocupado": self.tempo_fonte,
+                "utilizacao": self.tempo_fonte / duracao,
+                "latencia": percentis(self.latencias_fonte)
+            }
+        }
+        for estagio in self.estagios:
+            relatorio[estagio.nome] = {
+                "itens": estagio.itens,
+                "falhas": estagio.falhas,
+                "concorrencia": estagio.concorrencia,
+                "tempo_ocupado": estagio.tempo_ocupado,
+                "utilizacao": estagio.tempo_ocupado / (duracao * estagio.concorrencia),
+                "latencia": percentis(estagio.latencias)
+            }
+        return relatorio
@@ -0,0 +1,147 @@
+import re
+import math
+import threading
+from src.Utils.MonitorDegeneracao import MonitorDegeneracao
+
+class PoliticaRefinamento:
+    """
+    Decide, por página, se a saída do Argos passa pelo LLM: inteira ("completo"),
+    só nos parágrafos problemáticos ("parcial") ou não passa ("ignorar").
+    A implementação base refina tudo (comportamento sem política); subclasses trocam decidir().
+    """
+
+    CAMINHOS = ("completo", "parcial", "ignorar", "orcamento")
+
+    def __init__(self, orcamento_gpu_segundos=None):
+        # Teto de segundos de LLM por livro (None = sem teto)
+        self.orcamento_gpu_segundos = orcamento_gpu_segundos
+        self.gasto_gpu_segundos = 0.0
+        self.contagem = {caminho: 0 for caminho in self.CAMINHOS}
+        self.gasto_por_caminho = {caminho: 0.0 for caminho in self.CAMINHOS}
+        self.lock = threading.Lock()
+
+    def decidir(self, original, traducao, paginas_restantes=None):
+        """Retorna {"caminho": ..., "pontuacao": float, "paragrafos": [índices a refinar]}."""
+        if self._orcamento_esgotado():
+            return self._decisao("orcamento", 0.0)
+        return self._decisao("completo", 1.0)
+
+    def registrar_gasto(self, caminho, segundos):
+        with self.lock:
+            self.gasto_gpu_segundos += segundos
+            self.gasto_por_caminho[caminho] += segundos
+
+    def relatorio(self):
+        with self.lock:
+            return {
+                "paginas": dict(self.contagem),
+                "gasto_por_caminho": dict(self.gasto_por_caminho),
+                "gasto_gpu_segundos": self.gasto_gpu_segundos,
+                "orcamento_gpu_segundos": self.orcamento_gpu_segundos
+            }
+
+    def _orcamento_esgotado(self):
+        return self.orcamento_gpu_segundos is not None and self.gasto_gpu_segundos >= self.orcamento_gpu_segundos
+
+    def _decisao(self, caminho, pontuacao, paragrafos=None):
+        with self.lock:
+            self.contagem[caminho] += 1
+        return {"caminho": caminho, "pontuacao": pontuacao, "paragrafos": paragrafos or []}
+
+
+class PoliticaRefinamentoPorSinais(PoliticaRefinamento):
+    """
+    Pontua a necessidade de refino com sinais baratos da saída do Argos:
+    proporção de tamanho, inglês remanescente, tamanho médio das frases,
+    tamanho da página e densidade de código.
+    """
+
+    RE_FRASES = re.compile(r'[.!?]+(?:\s|$)')
+    RE_LINHA_CODIGO = re.compile(r'[{};=<>]|\b(?:def|return|class|import|function|var|const)\b|^\s{4,}\S')
+
+    def __init__(self, orcamento_gpu_segundos=None, limiar_refino=0.35, limiar_paragrafo=0.35,
+                 fracao_maxima_parcial=0.5, min_caracteres=200, densidade_codigo_maxima=0.3):
+        super().__init__(orcamento_gpu_segundos)
+        self.limiar_refino = limiar_refino
+        self.limiar_paragrafo = limiar_paragrafo
+        # Acima desta fração de parágrafos ruins, refinar a página inteira sai mais barato que por partes
+        self.fracao_maxima_parcial = fracao_maxima_parcial
+        self.min_caracteres = min_caracteres
+        self.densidade_codigo_maxima = densidade_codigo_maxima
+        self._paginas_refinadas = 0
+
+    def registrar_gasto(self, caminho, segundos):
+        super().registrar_gasto(caminho, segundos)
+        with self.lock:
+            self._paginas_refinadas += 1
+
+    def pontuar(self, original, traducao):
+        """Necessidade de refino entre 0 (Argos já serve) e 1 (refino indispensável)."""
+        if not original.strip() or not traducao.strip():
+            return 0.0
+
+        # 1. Proporção de tamanho: o Argos raramente foge muito de ~1.1x
+        proporcao = len(traducao) / len(original)
+        sinal_tamanho = min(1.0, abs(math.log(proporcao / 1.1)) / math.log(1.6))
+
+        # 2. Palavras funcionais do inglês que sobraram na tradução
+        palavras = traducao.lower().split()
+        ingles = sum(1 for p in palavras if p in MonitorDegeneracao.PALAVRAS_INGLES)
+        sinal_ingles = min(1.0, ingles / max(1, len(palavras)) / 0.05)
+
+        # 3. Frases longas são onde a tradução por frase mais erra a concordância
+        frases = max(1, len(self.RE_FRASES.findall(original)))
+        palavras_por_frase = len(original.split()) / frases
+        sinal_frases = min(1.0, max(0.0, (palavras_por_frase - 15) / 25))
+
+        return max(sinal_tamanho, sinal_ingles, 0.6 * sinal_frases)
+
+    def densidade_codigo(self, texto):
+        linhas = [linha for linha in texto.split("\n") if linha.strip()]
+        if not linhas:
+            return 0.0
+        return sum(1 for linha in linhas if self.RE_LINHA_CODIGO.search(linha)) / len(linhas)
+
+    def decidir(self, original, traducao, paginas_restantes=None):
+        if self._orcamento_esgotado():
+            return self._decisao("orcamento", 0.0)
+
+        # Páginas curtas (títulos, legendas) e com muito código não compensam a GPU
+        if len(original) < self.min_caracteres or self.densidade_codigo(original) > self.densidade_codigo_maxima:
+            return self._decisao("ignorar", 0.0)
+
+        pontuacao = self.pontuar(original, traducao)
+        if pontuacao < self._limiar_efetivo(paginas_restantes):
+            return self._decisao("ignorar", pontuacao)
+
+        # Refino parcial só quando os parágrafos estão alinhados (mesma contagem)
+        paragrafos_original = original.split("\n\n")
+        paragrafos_traducao = traducao.split("\n\n")
+        if len(paragrafos_original) > 1 and len(paragrafos_original) == len(paragrafos_traducao):
+            ruins = [
+                i for i, (o, t) in enumerate(zip(paragrafos_original, paragrafos_traducao))
+                if o.strip() and self.pontuar(o, t) >= self.limiar_paragrafo
+            ]
+            if ruins and len(ruins) <= self.fracao_maxima_parcial * len(paragrafos_original):
+                return self._decisao("parcial", pontuacao, ruins)
+
+        return self._decisao("completo", pontuacao)
+
+    def _limiar_efetivo(self, paginas_restantes):
+        """
+        Com teto de GPU e total conhecido, sobe o limiar quando o ritmo de gasto
+        projetado para as páginas restantes estoura o orçamento.
+        """
+        if self.orcamento_gpu_segundos is None or not paginas_restantes:
+            return self.limiar_refino
+        with self.lock:
+            if not self._paginas_refinadas:
+                return self.limiar_refino
+            custo_medio = self.gasto_gpu_segundos / self._paginas_refinadas
+            restante = self.orcamento_gpu_segundos - self.gasto_gpu_segundos
+        paginas_pagaveis = restante / max(custo_medio, 1e-9)
+        if paginas_pagaveis >= paginas_restantes:
+            return self.limiar_refino
+        # Só as páginas mais necessitadas cabem: limiar proporcional ao aperto
+        aperto = 1.0 - paginas_pagaveis / paginas_restantes
+        return self.limiar_refino + (1.0 - self.limiar_refino) * aperto
@@ -2,34 +2,80 @@ import re
 
 class TextCleaner:
 
+    # Padrões compilados uma única vez, na importação do módulo
+    _RE_NUMERO_PAGINA = re.compile(r'\n\s*\d+\s*\n')
+    # Equivale a (\w+)-\s*\n\s*(\w+): a parte esquerda só define o início do match,
+    # então basta um caractere (evita o backtracking quadrático em palavras longas)
+    _RE_HIFEN_QUEBRA = re.compile(r'(\w)-\s*\n\s*(\w+)')
+    # Parágrafo (\n\n com espaços no meio) ou quebra simples, numa única passada
+    _RE_QUEBRAS = re.compile(r'\n\s*\n|\n')
+    # Só substitui o que muda algo: sequências de 2+ brancos ou tabulações isoladas
+    _RE_ESPACOS_TAB = re.compile(r'[ \t]{2,}|\t')
+    _RE_CONTROLE = re.compile(r'[\x00-\x08\x0b\x0c\x0e-\x1f\x7f]')
+
+    # 1. Regex de URL mais abrangente (pega links entre parênteses e no final de frases)
+    # Remove http, https, www e links que terminam em .com, .net, .org, etc.
+    _RE_URL = re.compile(r'(https?://\S+|www\.\S+|\b\S+\.(?:com|net|org|edu|gov|io|me)\b(/\S*)?)', re.IGNORECASE)
+    # Condição necessária para _RE_URL casar: evita a regex cara em páginas sem links
+    _RE_URL_INDICIO = re.compile(r'https?://|www\.|\.(?:com|net|org|edu|gov|io|me)\b', re.IGNORECASE)
+
+    # 2. Lista de "Stop Words" de propaganda (Call to Action)
+    # Adicionei termos comuns em PDFs de bibliotecas digitais e sites de download
+    PADROES_SUJEIRA = [
+        r'click here', r'buy now', r'visit our website',
+        r'available at', r'downloaded from', r'all rights reserved',
+        r'copyright ©', r'free ebook', r'subscribe to',
+        r'scan this qr', r'get more books'
+    ]
+    # O \b garante que ele pegue a frase inteira, não partes de palavras
+    # O lookahead com as iniciais das frases descarta rapidamente as posições que não podem casar
+    _RE_SUJEIRA_UNICA = re.compile(
+        r'(?=[' + ''.join(sorted({p[0] for p in PADROES_SUJEIRA})) + r'])\b(?:' + '|'.join(PADROES_SUJEIRA) + r')\b',
+        re.IGNORECASE
+    )
+    _RE_SUJEIRA_SEQUENCIAL = [re.compile(rf'\b{padrao}\b', re.IGNORECASE) for padrao in PADROES_SUJEIRA]
+
+    _RE_ESPACOS = re.compile(r'  +')
+    _RE_LINHAS_VAZIAS = re.compile(r'\n\s*\n')
+
     @staticmethod
-    def limpar_extração_pdf(texto: str) -> str:
+    def limpar_extração_pdf(texto: str, remover_cabecalho=True) -> str:
         if not texto: return ""
         
-        linhas = texto.split('\n')
-        if len(linhas) > 1 and len(linhas[0].strip()) < 50:
+        linhas = texto.split('\n', 2)
+        # Com o detector de boilerplate, o cabeçalho já saiu e a primeira linha pode ser um título real
+        if remover_cabecalho and len(linhas) > 1 and len(linhas[0].strip()) < 50:
             # Se a primeira linha parece um título de cabeçalho, removemos
-            linhas.pop(0)
-            texto = '\n'.join(linhas)
+            texto = texto[len(linhas[0]) + 1:]
 
         # 1. Remove números de página isolados (ex: "\n 42 \n")
-        texto = re.sub(r'\n\s*\d+\s*\n', '\n', texto)
+        texto = TextCleaner._RE_NUMERO_PAGINA.sub('\n', texto)
         
         # 2. Remove hifens de quebra de linha (soft- \n ware -> software)
-        texto = re.sub(r'(\w+)-\s*\n\s*(\w+)', r'\1\2', texto)
+        texto = TextCleaner._RE_HIFEN_QUEBRA.sub(r'\1\2', texto)
         
         # 3. Transforma quebras de linha simples em espaços, mas PRESERVA parágrafos
-        # Técnica: substitui \n\n por um token temporário, limpa \n simples, e volta o token
-        texto = re.sub(r'\n\s*\n', '[[PARAGRAPH]]', texto)
-        texto = re.sub(r'(?<!\n)\n(?!\n)', ' ', texto)
-        texto = texto.replace('[[PARAGRAPH]]', '\n\n')
+        if '[[PARAGRAPH]]' in texto:
+            # Texto contém o marcador usado pela técnica antiga: mantém o caminho original
+            texto = TextCleaner._RE_LINHAS_VAZIAS.sub('[[PARAGRAPH]]', texto)
+            texto = texto.replace('\n', ' ').replace('[[PARAGRAPH]]', '\n\n')
+        else:
+            texto = TextCleaner._RE_QUEBRAS.sub(lambda m: ' ' if len(m.group()) == 1 else '\n\n', texto)
         
         # 4. Remove múltiplos espaços e caracteres especiais de controle
-        texto = re.sub(r'[ \t]+', ' ', texto)
-        texto = re.sub(r'[\x00-\x08\x0b\x0c\x0e-\x1f\x7f]', '', texto)
+        texto = TextCleaner._RE_ESPACOS_TAB.sub(' ', texto)
+        texto = TextCleaner._RE_CONTROLE.sub('', texto)
         
         return texto.strip()
 
+    @staticmethod
+    def limpar_pagina(texto: str, remover_cabecalho=True) -> str:
+        """
+        Higienização completa de uma página, em uma única passada por etapa:
+        sujeira digital (links e marketing) seguida da limpeza de extração do PDF.
+        """
+        return TextCleaner.limpar_extração_pdf(TextCleaner.limpar_sujeira_digital(texto), remover_cabecalho)
+
     @staticmethod
     def identificar_tipo_conteudo(texto: str) -> str:
         """
@@ -56,27 +102,20 @@ class TextCleaner:
         if not texto:
             return ""
         
-        # 1. Regex de URL mais abrangente (pega links entre parênteses e no final de frases)
-        # Remove http, https, www e links que terminam em .com, .net, .org, etc.
-        padrao_url = r'(https?://\S+|www\.\S+|\b\S+\.(?:com|net|org|edu|gov|io|me)\b(/\S*)?)'
-        texto = re.sub(padrao_url, '', texto, flags=re.IGNORECASE)
-
-        # 2. Lista de "Stop Words" de propaganda (Call to Action)
-        # Adicionei termos comuns em PDFs de bibliotecas digitais e sites de download
-        padroes_sujeira = [
-            r'click here', r'buy now', r'visit our website', 
-            r'available at', r'downloaded from', r'all rights reserved',
-            r'copyright ©', r'free ebook', r'subscribe to',
-            r'scan this qr', r'get more books'
-        ]
-        
-        for padrao in padroes_sujeira:
-            # O \b garante que ele pegue a frase inteira, não partes de palavras
-            texto = re.sub(rf'\b{padrao}\b', '', texto, flags=re.IGNORECASE)
+        if TextCleaner._RE_URL_INDICIO.search(texto):
+            texto = TextCleaner._RE_URL.sub('', texto)
+
+        if '©' in texto:
+            # A remoção de uma frase pode formar "copyright ©" + palavra adjacente;
+            # nesse caso raro, aplica os padrões um a um para manter o resultado idêntico
+            for padrao in TextCleaner._RE_SUJEIRA_SEQUENCIAL:
+                texto = padrao.sub('', texto)
+        else:
+            texto = TextCleaner._RE_SUJEIRA_UNICA.sub('', texto)
 
         # 3. Limpeza Final: Remove espaços múltiplos e linhas vazias que sobraram
-        texto = re.sub(r' +', ' ', texto) # Remove espaços duplos
-        texto = re.sub(r'\n\s*\n', '\n\n', texto) # Remove múltiplas quebras de linha
+        texto = TextCleaner._RE_ESPACOS.sub(' ', texto) # Remove espaços duplos
+        texto = TextCleaner._RE_LINHAS_VAZIAS.sub('\n\n', texto) # Remove múltiplas quebras de linha
 
         return texto.strip()
 